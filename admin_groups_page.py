@@ -0,0 +1,163 @@
+import logging
+from datetime import datetime
+
+import streamlit as st
+
+from bulk_import import MAX_MEMBERS, MIN_MEMBERS, import_key, read_groups_file, validate_groups
+from group_formation import BALANCE_OPTIONS, form_groups, ungrouped_students
+from membership import split_members
+from reservations import DuplicateGroupName, MembersAlreadyGrouped, idempotency_key
+
+
+def group_rows(groups, created_by):
+    """Validated / formed groups → ``groups`` sheet rows, all with the same timestamp."""
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return [
+        [timestamp, g.group_name, g.faculty, g.department, g.course, g.members, g.member_names, created_by]
+        for g in groups.itertuples(index=False)
+    ]
+
+
+def commit_groups(key, groups, rows, roster, storage, sheet_id, reservations):
+    """
+    Writes ``rows`` with a single ``append_rows`` under the reservations'
+    bulk commit.  Returns ``(written, created)``; raises on conflicts.
+    """
+    def append_groups():
+        from roster import GROUP_COLUMNS
+        rows_to_write = rows if roster.groups_sync.header else [GROUP_COLUMNS] + rows
+        storage.append_rows(sheet_id, "groups", rows_to_write)
+        for row in rows:
+            roster.add_group(row)
+        return rows
+
+    return reservations.commit_bulk(
+        key,
+        [(g.course, g.group_name, split_members(g.members)) for g in groups.itertuples(index=False)],
+        roster, append_groups,
+    )
+
+
+def _commit_and_report(key, groups, roster, storage, sheet_id, reservations, done_key):
+    """Shared button handler; stores the outcome for the next run. Returns False on failure."""
+    try:
+        written, created = commit_groups(
+            key, groups, group_rows(groups, st.session_state.user_email),
+            roster, storage, sheet_id, reservations,
+        )
+    except DuplicateGroupName as e:
+        st.error(f"Group name(s) created meanwhile: {e}. Check again before writing.")
+        return False
+    except MembersAlreadyGrouped as e:
+        st.error("🚫 Some students were grouped meanwhile:\n" + "\n".join(f"- {e}" for e in e.emails))
+        return False
+    except Exception as e:
+        logging.exception("Bulk group write failed.")
+        st.error(f"❌ Failed to write groups: {e}")
+        return False
+    st.session_state[done_key] = (
+        f"✅ Created {len(written)} group(s)." if created
+        else "These groups were already written – nothing was written again."
+    )
+    return True
+
+
+def _catch_up(roster):
+    try:
+        roster.sync_groups(max_age=60)
+    except Exception:
+        logging.exception("Error while fetching data from Google Sheets.")
+
+
+# ========== Bulk import ==========
+def bulk_import_section(roster, storage, sheet_id, reservations):
+    st.caption(
+        "Upload a CSV or XLSX with the columns **group_name**, **course** and **members** "
+        "(comma-separated student emails). **faculty** and **department** are optional and "
+        f"default to the first member's. Groups must have {MIN_MEMBERS}–{MAX_MEMBERS} members."
+    )
+    if "bulk_import_done" in st.session_state:
+        st.success(st.session_state.pop("bulk_import_done"))
+    # A new key after each import clears the uploader
+    import_round = st.session_state.get("bulk_import_round", 0)
+    uploaded_groups = st.file_uploader("Groups file", type=["csv", "xlsx"], key=f"bulk_groups_file_{import_round}")
+    if uploaded_groups is None:
+        return
+
+    _catch_up(roster)
+    try:
+        groups_file = read_groups_file(uploaded_groups)
+    except ImportError:
+        st.error("❌ Reading .xlsx files needs the `openpyxl` package – upload a CSV instead.")
+        return
+    except Exception as e:
+        st.error(f"❌ Could not read the file: {e}")
+        return
+
+    new_groups, errors = validate_groups(groups_file, roster)
+    if not errors.empty:
+        st.error(f"❌ Found {len(errors)} problem(s) in {len(groups_file)} group(s) – nothing was imported. Fix them and upload again.")
+        st.dataframe(errors, hide_index=True, use_container_width=True)
+        return
+    if new_groups.empty:
+        st.warning("The file has no groups.")
+        return
+
+    st.success(f"✅ {len(new_groups)} group(s) passed validation.")
+    st.dataframe(new_groups, hide_index=True, use_container_width=True)
+
+    if st.button(f"📥 Import {len(new_groups)} group(s)"):
+        key = import_key(st.session_state.user_email, uploaded_groups)
+        if _commit_and_report(key, new_groups, roster, storage, sheet_id, reservations, "bulk_import_done"):
+            st.session_state.bulk_import_round = import_round + 1
+            st.rerun()
+
+
+# ========== Automatic formation ==========
+def auto_groups_section(roster, storage, sheet_id, reservations):
+    st.caption(
+        "Places every student without a group for the course into new groups "
+        f"of {MIN_MEMBERS}–{MAX_MEMBERS}. Preview first – nothing is written until you confirm."
+    )
+    if "auto_groups_done" in st.session_state:
+        st.success(st.session_state.pop("auto_groups_done"))
+
+    course = st.selectbox("Course", roster.course_list, key="auto_groups_course")
+    target_size = st.slider("Target group size", MIN_MEMBERS, MAX_MEMBERS, 5, key="auto_groups_size")
+    balance = st.radio("Balance groups by", list(BALANCE_OPTIONS), horizontal=True, key="auto_groups_balance")
+    prefix = st.text_input("Group name prefix", value=f"{course} Auto ", key=f"auto_groups_prefix_{course}")
+    params = (course, target_size, balance, prefix)
+
+    if st.button("🔍 Preview groups (dry run)"):
+        _catch_up(roster)
+        students = ungrouped_students(roster, course)
+        groups, _ = form_groups(
+            students, course, target_size=target_size, balance_by=BALANCE_OPTIONS[balance],
+            name_prefix=prefix, taken=roster.groups_index.has_group_name,
+        )
+        st.session_state.auto_groups_plan = (params, groups, len(students))
+
+    plan = st.session_state.get("auto_groups_plan")
+    if plan is None or plan[0] != params:
+        return
+    _, groups, n_students = plan
+
+    if groups.empty:
+        if n_students:
+            st.warning(f"Only {n_students} ungrouped student(s) – too few for a group of {MIN_MEMBERS}.")
+        else:
+            st.info("🎉 Every student already has a group for this course.")
+        return
+
+    sizes = groups["members"].str.count(",") + 1
+    st.success(
+        f"{n_students} ungrouped student(s) → {len(groups)} group(s) "
+        f"of {sizes.min()}–{sizes.max()} members."
+    )
+    st.dataframe(groups, hide_index=True, use_container_width=True)
+
+    if st.button(f"✅ Create {len(groups)} group(s)"):
+        key = idempotency_key(st.session_state.user_email, course, f"auto:{prefix}", groups["members"].tolist())
+        if _commit_and_report(key, groups, roster, storage, sheet_id, reservations, "auto_groups_done"):
+            st.session_state.pop("auto_groups_plan", None)
+            st.rerun()
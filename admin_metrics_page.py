@@ -0,0 +1,71 @@
+import json
+
+import pandas as pd
+import streamlit as st
+
+import tracing
+
+CALL_COLUMNS = ["kind", "op", "calls", "errors", "ms", "max_ms", "bytes"]
+
+
+def _calls_table(rows):
+    df = pd.DataFrame(rows, columns=CALL_COLUMNS)
+    df["avg_ms"] = (df["ms"] / df["calls"].where(df["calls"] > 0)).round(2)
+    df["KB"] = (df["bytes"] / 1024).round(1)
+    return df[["kind", "op", "calls", "errors", "ms", "avg_ms", "max_ms", "KB"]]
+
+
+def _runs_table(runs):
+    return pd.DataFrame([
+        {
+            "started": run["started"],
+            "session": run["session"][:8],
+            "ms": run["ms"],
+            "external calls": sum(c["calls"] for c in run["calls"]),
+            "external ms": round(sum(c["ms"] for c in run["calls"]), 2),
+            "sections": " · ".join(f"{s['name']} {s['ms']:.0f}" for s in run["sections"]),
+        }
+        for run in runs
+    ])
+
+
+def metrics_section(session_id):
+    tracer = tracing.tracer
+    if not tracing.enabled():
+        st.info("Tracing is off. Set `tracing_enabled = true` in the `google_service_account` "
+                "secrets to record Sheets / Drive / SMTP calls and page sections.")
+        return
+
+    st.caption(
+        f"Sheets, Drive and SMTP calls plus page sections, counted per run, per session and for this "
+        f"process ({tracer.session_count()} session(s) seen). Bytes are estimated from the values sent and received."
+    )
+
+    run = tracing.current_run()
+    if run is not None:
+        st.markdown("#### ⏱️ This run so far")
+        current = tracer.snapshot(run)
+        st.dataframe(_calls_table(current["calls"]), hide_index=True, use_container_width=True)
+
+    st.markdown("#### 👤 This session")
+    st.dataframe(_calls_table(tracer.session_totals(session_id)), hide_index=True, use_container_width=True)
+
+    st.markdown("#### 🕑 Recent runs (all sessions)")
+    runs = tracer.recent_runs()
+    if runs:
+        st.dataframe(_runs_table(runs), hide_index=True, use_container_width=True)
+    else:
+        st.write("No finished runs yet.")
+
+    st.markdown("#### 🖥️ Process totals")
+    st.dataframe(_calls_table([r for r in tracer.totals() if r["kind"] != "section"]),
+                 hide_index=True, use_container_width=True)
+    with st.expander("Page sections"):
+        st.dataframe(_calls_table([r for r in tracer.totals() if r["kind"] == "section"]),
+                     hide_index=True, use_container_width=True)
+
+    col1, col2 = st.columns(2)
+    col1.download_button("⬇️ Prometheus metrics", tracer.prometheus_text(),
+                         file_name="metrics.prom", mime="text/plain")
+    col2.download_button("⬇️ Recent runs (JSON lines)", "\n".join(json.dumps(r) for r in runs),
+                         file_name="runs.jsonl", mime="application/json")
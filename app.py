@@ -1,23 +1,24 @@
-import streamlit as st
-import pandas as pd
-import gspread
-from datetime import datetime
-from oauth2client.service_account import ServiceAccountCredentials
-from google.oauth2.service_account import Credentials
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from google.auth.exceptions import TransportError
-import socket
-import json
-import time
-from googleapiclient.discovery import build
-import requests
-from io import BytesIO
+from timing import RunTimer
+
+timer = RunTimer()
+
 import logging
-from datetime import timedelta
-from googleapiclient.http import MediaIoBaseUpload, MediaIoBaseDownload
-from google.auth.transport.requests import Request
+import uuid
+from datetime import datetime
+
+import streamlit as st
+
+import tracing
+from reservations import DuplicateGroupName, GroupReservations, MembersAlreadyGrouped, idempotency_key
+
+# gspread, pandas, the Google auth/Drive stacks and smtplib are imported
+# inside the functions that need them, so the login form paints before any
+# of them load and before any client is built.
+
+# Tracing (off unless tracing_enabled is set) – the run is timed from the first line
+tracing.configure_from_secrets(st.secrets["google_service_account"])
+tracing.begin_run(st.session_state.setdefault("trace_session_id", uuid.uuid4().hex), started=timer.started)
+timer.mark("imports")
 
 
 st.set_page_config(
@@ -25,98 +26,146 @@ st.set_page_config(
     page_icon="favicon_io/favicon-16x16.png",
 )
 
-try:
-    @st.cache_resource
-    def get_gspread_client():
-        return gspread.service_account_from_dict(st.secrets["google_service_account"])
-    
-    # Usage
-    gc = get_gspread_client()
-    client = gc
-
-    creds = Credentials.from_service_account_info(
-    st.secrets["google_service_account"],
-    scopes=[
-        "https://www.googleapis.com/auth/drive",
-        "https://www.googleapis.com/auth/spreadsheets",
+# ========== Clients (built on first use) ==========
+@st.cache_resource
+def get_gspread_client():
+    import gspread
+    return gspread.service_account_from_dict(st.secrets["google_service_account"])
+
+@st.cache_resource
+def get_credentials():
+    from google.oauth2.service_account import Credentials
+    return Credentials.from_service_account_info(
+        st.secrets["google_service_account"],
+        scopes=[
+            "https://www.googleapis.com/auth/drive",
+            "https://www.googleapis.com/auth/spreadsheets",
         ]
     )
-    
-    # ---- 2. grab the sheet ids once, keep them in session_state -------
-    if "student_sheet_id" not in st.session_state:
-        ss = st.secrets["google_service_account"]
-        st.session_state.student_sheet_id   = ss["student_sheet_id"]
-        st.session_state.group_log_sheet_id = ss["group_log_sheet_id"]
-        st.session_state.dev_email          = ss["developer_email"]
-        st.session_state.dev_password       = ss["developer_password"]
-
-    student_sheet_id   = st.session_state.student_sheet_id
-    group_log_sheet_id = st.session_state.group_log_sheet_id
-    developer_email = st.session_state.dev_email
-    developer_password = st.session_state.dev_password
-
-    # ---- 3. cached loaders (10 min) -----------------------------------
-    @st.cache_data(ttl=600)
-    def load_df(key: str, worksheet: str) -> pd.DataFrame:
-        """Generic helper – returns an empty DF if worksheet is empty."""
-        ws   = gc.open_by_key(key).worksheet(worksheet)
-        data = ws.get_all_values()
-        if len(data) <= 1:      # header row only
-            return pd.DataFrame()
-        df = pd.DataFrame(data[1:], columns=[c.strip() for c in data[0]])
-        return df
-
-    @st.cache_data(ttl=600)
-    def load_groups_ws_and_df():
-        sht  = gc.open_by_key(group_log_sheet_id)
-        try:
-            ws = sht.worksheet("groups")
-        except gspread.exceptions.WorksheetNotFound:
-            ws = sht.add_worksheet("groups", rows=1000, cols=12)
-        df = load_df(group_log_sheet_id, "groups")
-        return ws, df
-
-    # ---- 4. put every table you need into session_state ---------------
-    if "students_df" not in st.session_state:
-        df = load_df(student_sheet_id, "Enrolled Students")
-        if not df.empty:
-            df["email"]      = df["email"].str.strip().str.lower()
-            df["student_id"] = df["student_id"].astype(str).str.strip()
-        st.session_state.students_df = df
-
-    if "login_df" not in st.session_state:
-        df = load_df(group_log_sheet_id, "Login_details")
-        if not df.empty:
-            df["Email"]    = df["Email"].str.strip().str.lower()
-            df["Password"] = df["Password"].astype(str).str.strip()
-        st.session_state.login_df = df
-
-    if "groups_ws" not in st.session_state or "groups_df" not in st.session_state:
-        ws, df = load_groups_ws_and_df()
-        st.session_state.groups_ws  = ws
-        st.session_state.groups_df  = df
-
-    if "course_list" not in st.session_state:
-        course_df = load_df(group_log_sheet_id, "course_list")
-        st.session_state.course_list = sorted(course_df.iloc[:, 0].dropna().unique())
-
-except (gspread.exceptions.APIError,
-        socket.gaierror,
-        TransportError,
-        Exception) as e:
-    st.error(
-        f"""
+
+@st.cache_resource
+def get_storage():
+    # sheets (default) | sqlite | mirror – see storage.py
+    from storage import storage_from_secrets
+    return storage_from_secrets(get_gspread_client(), st.secrets["google_service_account"])
+
+@st.cache_resource
+def get_notifier():
+    from config import secret_flag
+    from notifications import NotificationQueue
+    ss = st.secrets["google_service_account"]
+    return NotificationQueue(
+        host=ss.get("smtp_host", "smtp.gmail.com"),
+        port=int(ss.get("smtp_port", 587)),
+        username=ss["developer_email"],
+        password=ss["developer_password"],
+        starttls=secret_flag(ss, "smtp_starttls", True),
+    )
+
+def show_notification_status():
+    """
+    Delivery status of the e-mails this session queued (they are sent in the
+    background, so outcomes show up on later reruns).  Sent and failed jobs
+    are reported once and then dropped; queued ones are kept for the next run.
+    """
+    from notifications import QUEUED, SENT
+    jobs = st.session_state.get("notification_jobs", [])
+    if not jobs:
+        return
+    notifier = get_notifier()
+    pending, sent = [], 0
+    for job in jobs:
+        state = notifier.status(job["id"])
+        if state is None:
+            continue            # forgotten by the queue
+        status, detail = state
+        if status == QUEUED:
+            pending.append(job)
+        elif status == SENT:
+            sent += 1
+        else:
+            st.warning(f"Failed to send email to {job['email']}. Reason: {detail}")
+    if sent:
+        st.success(f"📧 {sent} notification email(s) sent.")
+    if pending:
+        st.info(f"⏳ {len(pending)} notification email(s) still sending – their status appears here on the next refresh.")
+    st.session_state["notification_jobs"] = pending
+
+# ---- grab the sheet ids once, keep them in session_state -------
+if "student_sheet_id" not in st.session_state:
+    ss = st.secrets["google_service_account"]
+    st.session_state.student_sheet_id   = ss["student_sheet_id"]
+    st.session_state.group_log_sheet_id = ss["group_log_sheet_id"]
+    st.session_state.dev_email          = ss["developer_email"]
+    st.session_state.dev_password       = ss["developer_password"]
+
+student_sheet_id   = st.session_state.student_sheet_id
+group_log_sheet_id = st.session_state.group_log_sheet_id
+developer_email = st.session_state.dev_email
+developer_password = st.session_state.dev_password
+
+# ---- bootstrap: every startup worksheet in one read per spreadsheet ----
+def bootstrap_plan():
+    plan = {}
+    plan.setdefault(student_sheet_id, []).append("Enrolled Students")
+    plan.setdefault(group_log_sheet_id, []).extend(["Login_details", "groups", "course_list"])
+    return plan
+
+def load_bootstrap():
+    """Raw values of the bootstrap worksheets – cached through the roster below, not on its own."""
+    from bootstrap import fetch_tables
+    storage = get_storage()
+    # A batched read fails if any range is missing; groups is created on first use
+    storage.ensure_table(group_log_sheet_id, "groups", rows=1000, cols=12)
+    return fetch_tables(storage, bootstrap_plan())
+
+# ---- one read-only roster per refresh, shared by every session ---
+@st.cache_resource(ttl=600)
+def get_roster():
+    from bootstrap import typed_frames
+    from roster import Roster
+    from sync import IncrementalTable
+    tables = load_bootstrap()
+    frames = typed_frames(tables)
+    groups_sync = IncrementalTable(get_storage(), group_log_sheet_id, "groups")
+    groups_sync.seed(tables[(group_log_sheet_id, "groups")])
+    course_df = frames["course_list"]
+    # Labs are not in the batch – the lab catalog loads them on first use, so a missing tab can't block logins
+    return Roster(
+        frames["Enrolled Students"], frames["Login_details"], groups_sync.frame(),
+        sorted(course_df.iloc[:, 0].dropna().unique()) if not course_df.empty else [],
+        groups_sync=groups_sync,
+    )
+
+# Process-wide, outlives roster refreshes so idempotency keys survive them
+@st.cache_resource
+def get_reservations():
+    return GroupReservations()
+
+def connect():
+    """Storage + shared roster; on failure shows the connection error and stops the run."""
+    try:
+        storage = get_storage()
+        roster = get_roster()
+    except Exception as e:
+        logging.exception("Error while connecting to Google Sheets.")
+        st.error(
+            f"""
 🚫 **Connection Error**
 
-We couldn't connect to Google Sheets / Drive.  
+We couldn't connect to Google Sheets / Drive.  
 Please check your internet connection or try again later.
 
 **Details:** `{e}`
 
 If the issue persists, contact the app administrator.
 """
-    )
-    st.stop()
+        )
+        st.stop()
+    # References, not copies – session_state only holds per-user state
+    st.session_state.storage = storage
+    st.session_state.roster = roster
+    return storage, roster
 
 # ========== Session Defaults ==========
 if "authenticated" not in st.session_state:
@@ -127,23 +176,18 @@ if "authenticated" not in st.session_state:
 # ========== Authentication ==========
 def authenticate(email, password):
     email = email.strip().lower()
-    password = str(password).strip()
-    student_match = st.session_state.students_df[
-        (st.session_state.students_df["email"] == email) &
-        (st.session_state.students_df["student_id"] == password)
-    ]
-    admin_match = st.session_state.login_df[
-        (st.session_state.login_df["Email"] == email) &
-        (st.session_state.login_df["Password"] == password)
-    ]
-
-    if not student_match.empty:
+    match = roster.credentials.lookup(email, password)
+    if match is None:
+        return False
+    role, record = match
+
+    if role == "student":
         st.session_state.authenticated = True
         st.session_state.user_email = email
         st.session_state.user_role = "student"
-        st.session_state.current_student = student_match.iloc[0]
+        st.session_state.current_student = record
         return True
-    elif not admin_match.empty:
+    elif role == "admin":
         st.session_state.authenticated = True
         st.session_state.user_email = email
         st.session_state.user_role = "admin"
@@ -160,16 +204,35 @@ with col2:
             email = st.text_input("Email")
             password = st.text_input("Password (Student ID for students)", type="password")
             submitted = st.form_submit_button("Login")
+        timer.mark("login form")
         if submitted:
+            storage, roster = connect()
+            timer.mark("roster")
             if authenticate(email, password):
                 st.success("Login successful!")
                 st.rerun()
             else:
                 st.error("Invalid credentials")
+        timer.report("login page")
         st.stop()
 
+storage, roster = connect()
+creds = get_credentials()
+timer.mark("roster")
+
 # ========== Logout Button ==========
 st.sidebar.markdown(f"👤 Logged in as: **{st.session_state.user_email}**")
+if st.session_state.user_role == "admin":
+    from roster import session_memory_bytes
+    st.sidebar.caption(
+        f"🧠 Memory – this session: {session_memory_bytes(st.session_state) / 1024:.1f} KB · "
+        f"shared roster: {roster.memory_bytes() / 1024 ** 2:.1f} MB"
+    )
+    st.sidebar.caption(f"⏱️ This run so far: {timer.summary()}")
+    if st.sidebar.button("🔄 Reload labs"):
+        from labs import get_lab_catalog
+        # After labs are added to the Labs sheet
+        get_lab_catalog(storage, group_log_sheet_id).invalidate()
 if st.sidebar.button("🚪 Logout"):
     for key in ["authenticated", "user_email", "user_role", "current_student"]:
         st.session_state.pop(key, None)
@@ -179,76 +242,58 @@ if st.session_state.user_role == "student":
     col1, col2, col3 = st.columns([1, 5, 1])
     with col2:
         st.subheader("🎓 Student Group Creator")
+        show_notification_status()
 
-        df = st.session_state.students_df.copy()
-        df['faculty'] = df['faculty'].str.strip().str.title()
-        df['program'] = df['program'].str.strip().str.title()
-        df["email"] = df["email"].astype(str).str.strip().str.lower()
-        df["fullname"] = df["first_name"].str.strip().str.title() + " " + df["last_name"].str.strip().str.title()
-
-        faculty = st.selectbox("Select Faculty", sorted(df['faculty'].dropna().unique()))
-        department = st.selectbox("Select Department", sorted(df[df['faculty'] == faculty]['program'].dropna().unique()))
-        selected_course = st.selectbox("Select Course", st.session_state.course_list)
+        # Normalised once per refresh in Roster – the selectboxes are plain lookups
+        faculty = st.selectbox("Select Faculty", roster.faculties)
+        department = st.selectbox("Select Department", roster.programs_by_faculty.get(faculty, []))
+        selected_course = st.selectbox("Select Course", roster.course_list)
 
         current_email = st.session_state.user_email.strip().lower()
 
-        # Check if student has already created a group for the course
-        existing = st.session_state.groups_df[
-            (st.session_state.groups_df["created_by"].str.lower() == current_email) &
-            (st.session_state.groups_df["course"].str.lower() == selected_course.lower())
-        ] if not st.session_state.groups_df.empty else pd.DataFrame()
+        groups_index = roster.groups_index
 
-        if not existing.empty:
+        # Check if student has already created a group for the course
+        if groups_index.created_by(selected_course, current_email) is not None:
             st.warning("🚫 You have already created a group for this course.")
             # 🔍 Find your group info
-            group_row = st.session_state.groups_df[
-                (st.session_state.groups_df["course"].str.lower() == selected_course.lower()) &
-                (st.session_state.groups_df["members"].str.lower().str.contains(current_email))
-            ]
+            group_row = groups_index.group_for(selected_course, current_email)
         
-            if not group_row.empty:
-                group_info = group_row.iloc[0].to_dict()
+            if group_row is not None:
+                group_info = dict(group_row)
         
                 from student_submission_page import student_submission_page
 
-                student_submission_page(group_info, selected_course, current_email, client, group_log_sheet_id, creds)
+                student_submission_page(group_info, selected_course, current_email, storage, group_log_sheet_id, creds)
         
                 st.stop()
             else:
                 st.warning("You are grouped, but group info couldn't be found.")
                 st.stop()
 
-        # Get all already grouped students
-        already_grouped = []
-        for _, row in st.session_state.groups_df.iterrows():
-            if row["course"].strip().lower() == selected_course.strip().lower():
-                already_grouped.extend([e.strip().lower() for e in row["members"].split(",")])
-
-        if current_email in already_grouped:
+        if groups_index.is_grouped(selected_course, current_email):
             st.success("🎉 You are already in a group for this course.")
     
             # 🔍 Find your group info
-            group_row = st.session_state.groups_df[
-                (st.session_state.groups_df["course"].str.lower() == selected_course.lower()) &
-                (st.session_state.groups_df["members"].str.lower().str.contains(current_email))
-            ]
+            group_row = groups_index.group_for(selected_course, current_email)
         
-            if not group_row.empty:
-                group_info = group_row.iloc[0].to_dict()
+            if group_row is not None:
+                group_info = dict(group_row)
         
                 from student_submission_page import student_submission_page
-                student_submission_page(group_info, selected_course, current_email, client, group_log_sheet_id, creds)
+                student_submission_page(group_info, selected_course, current_email, storage, group_log_sheet_id, creds)
         
                 st.stop()
             else:
                 st.warning("You are grouped, but group info couldn't be found.")
                 st.stop()
 
-        # Filter eligible students
-        eligible_df = df[~df["email"].isin(already_grouped) | (df["email"] == current_email)].copy()
-        eligible_emails_set = set(eligible_df["email"])
-        current_fullname = eligible_df[eligible_df["email"] == current_email]["fullname"].values[0]
-        
+        # Eligible = enrolled and not yet grouped for this course (you always are)
+        def is_eligible(email):
+            return email in roster.fullname_by_email and (
+                email == current_email or not groups_index.is_grouped(selected_course, email)
+            )
+
         st.write(f"Your email `{current_email}` has been added automatically.")
 
         # Let the user input a comma-separated list of emails
@@ -263,20 +308,17 @@ if st.session_state.user_role == "student":
             input_emails.append(current_email)
 
         # Split valid and invalid emails
-        valid_emails = [email for email in input_emails if email in eligible_emails_set]
-        invalid_emails = [email for email in input_emails if email not in eligible_emails_set]
+        valid_emails = [email for email in input_emails if is_eligible(email)]
+        invalid_emails = [email for email in input_emails if not is_eligible(email)]
         
         # Inform user about invalid emails
         if invalid_emails:
             st.warning(f"The following emails are invalid or are members of another group in the selected course: {', '.join(invalid_emails)}")
             # st.info(f"Valid emails so far: {', '.join(valid_emails)}")
 
-        # Filter eligible_df to only those in valid_emails
-        valid_df = eligible_df[eligible_df["email"].isin(valid_emails)].copy()
-        
-        # Get selected names and emails
-        selected_names = valid_df["fullname"].tolist()
-        selected_emails = valid_df["email"].tolist()
+        # Get selected names and emails (in roster order, as before)
+        selected_emails = roster.in_roster_order(valid_emails)
+        selected_names = [roster.fullname_by_email[email] for email in selected_emails]
 
         st.info(f"Kindly confirm the valid emails below: {', '.join(selected_emails)}")
         st.info(f"Kindly confirm the full names of all the valid emails below: {', '.join(selected_names)}")
@@ -298,19 +340,12 @@ if st.session_state.user_role == "student":
                 st.warning("Please provide a group name.")
                 st.stop()
 
-            def safe_get_all_values(ws, retries=3, delay=2):
-                for attempt in range(retries):
-                    try:
-                        return ws.get_all_values()
-                    except Exception as e:
-                        if attempt < retries - 1:
-                            time.sleep(delay)
-                        else:
-                            raise e
-            # Reload latest group data before final validation
+            # Catch up with groups written elsewhere (other processes, manual edits) –
+            # at most one ranged read a minute; in-process commits are already indexed
             try:
-                latest_data = st.session_state.groups_ws.get_all_values()
+                roster.sync_groups(max_age=60)
             except Exception as e:
+                # The storage layer already retried with backoff; the quota is still exhausted
                 # st.error("An unexpected error occurred.")
                 # st.text(str(e))  # Optional: debug output for dev
                 # logging.exception("Error while fetching data from Google Sheets.")
@@ -318,25 +353,6 @@ if st.session_state.user_role == "student":
                 logging.exception("Error while fetching data from Google Sheets.")
                 st.error("We’re experiencing high activity right now. Please try again in a few minutes as multiple users are making requests at the same time.")
                 st.stop()
-            st.session_state.groups_df = pd.DataFrame(latest_data[1:], columns=latest_data[0]) if len(latest_data) > 1 else pd.DataFrame(columns=latest_data[0])
-            existing_group_names = st.session_state.groups_df["group_name"].str.lower().tolist()
-
-            if group_name.strip().lower() in existing_group_names:
-                st.error("Group name already exists.")
-                st.stop()
-
-
-            # Recheck grouped members to ensure selected_emails are not in
-            already_grouped = []
-            for _, row in st.session_state.groups_df.iterrows():
-                if row["course"].strip().lower() == selected_course.strip().lower():
-                    already_grouped.extend([e.strip().lower() for e in row["members"].split(",")])
-
-            duplicate_students = [email for email in selected_emails if email.lower() in already_grouped]
-            if duplicate_students:
-                st.error("🚫 One or more selected students are already in a group:\n" + "\n".join(f"- {e}" for e in duplicate_students))
-                st.stop()
-
             # === Save group ===
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             new_row = [
@@ -344,13 +360,33 @@ if st.session_state.user_role == "student":
                 ", ".join(selected_emails), ", ".join(selected_names), st.session_state.user_email
             ]
 
-            if not latest_data:
-                st.session_state.groups_ws.append_row(["timestamp", "group_name", "faculty", "department", "course", "members", "member_names", "created_by"])
+            def append_group():
+                from roster import GROUP_COLUMNS
+                if not roster.groups_sync.header:
+                    storage.append_row(group_log_sheet_id, "groups", GROUP_COLUMNS)
+                storage.append_row(group_log_sheet_id, "groups", new_row)
+                roster.add_group(new_row)
+                return new_row
+
+            # Name/member checks and the append run under one per-course reservation
+            try:
+                _, created = get_reservations().commit(
+                    idempotency_key(current_email, selected_course, group_name, selected_emails),
+                    selected_course, group_name, selected_emails, roster, append_group,
+                )
+            except DuplicateGroupName:
+                st.error("Group name already exists.")
+                st.stop()
+            except MembersAlreadyGrouped as e:
+                st.error("🚫 One or more selected students are already in a group:\n" + "\n".join(f"- {e}" for e in e.emails))
+                st.stop()
 
-            st.session_state.groups_ws.append_row(new_row)
+            if not created:
+                st.info(f"Group '{group_name}' was already created – showing it below.")
     
-            # Email each member
-            for email, name in zip(selected_emails, selected_names):
+            # Email each member (only once – a replayed submission sends nothing)
+            recipients = zip(selected_emails, selected_names) if created else []
+            for email, name in recipients:
                 subject = f"[{selected_course}] You've been added to '{group_name}'"
                 body = f"""
             Dear {name},
@@ -368,22 +404,24 @@ if st.session_state.user_role == "student":
             School of Computing,
             Miva Open University
             """
+                from email.mime.multipart import MIMEMultipart
+                from email.mime.text import MIMEText
                 msg = MIMEMultipart()
                 msg['From'] = "Group Formation Support"
                 msg['To'] = email
                 msg['Subject'] = subject
                 msg.attach(MIMEText(body, 'plain'))
 
+                # Sent in the background over one pooled SMTP connection; show_notification_status reports the outcome
                 try:
-                    server = smtplib.SMTP('smtp.gmail.com', 587)
-                    server.starttls()
-                    server.login(developer_email, developer_password)
-                    server.send_message(msg)
-                    server.quit()
+                    job_id = get_notifier().submit(msg)
+                    st.session_state.setdefault("notification_jobs", []).append({"id": job_id, "email": email})
                 except Exception as e:
-                    st.warning(f"Failed to send email to {email}. Reason: {e}")
+                    st.warning(f"Failed to queue email to {email}. Reason: {e}")
 
-            st.success(f"✅ Group '{group_name}' created and notifications sent!")
+            if created:
+                st.success(f"✅ Group '{group_name}' created.")
+                show_notification_status()
 
             # 🔁 Load the latest group info for submission
             group_info = {
@@ -394,13 +432,25 @@ if st.session_state.user_role == "student":
             
             # ✅ Call the submission page
             from student_submission_page import student_submission_page
-            student_submission_page(group_info, selected_course, current_email, client, group_log_sheet_id, creds)
+            student_submission_page(group_info, selected_course, current_email, storage, group_log_sheet_id, creds)
             
             st.stop()
 
 # ========== Admin Panel ==========
 elif st.session_state.user_role == "admin":
-    st.subheader("🛠 Admin Group Creation (Fast Mode)")
+    st.subheader("🛠 Admin Group Creation")
+
+    from admin_groups_page import auto_groups_section, bulk_import_section
+
+    import_tab, auto_tab, metrics_tab = st.tabs(["📄 Bulk import", "🤖 Auto-form groups", "📈 Metrics"])
+    with import_tab:
+        bulk_import_section(roster, storage, group_log_sheet_id, get_reservations())
+    with auto_tab:
+        auto_groups_section(roster, storage, group_log_sheet_id, get_reservations())
+    timer.mark("admin page")
+    with metrics_tab:
+        from admin_metrics_page import metrics_section
+        metrics_section(st.session_state.trace_session_id)
 
     # if "groups_data_cache" not in st.session_state:
     #     # Load groups only once
@@ -0,0 +1,241 @@
+"""
+In-memory stand-ins for the gspread client and the Drive service.
+
+Every API-shaped call sleeps ``latency`` seconds and is counted in
+``calls``; on the Sheets client ``error_rate`` makes that fraction of
+calls fail with a 429 ``APIError`` so the scheduler's retry path is
+exercised too.  Worksheets are plain lists of string rows.
+"""
+
+import hashlib
+import random
+import re
+import threading
+import time
+
+import gspread
+import requests
+from gspread.utils import a1_range_to_grid_range, fill_gaps
+
+
+class FakeAPI:
+    """Latency, failure injection and call counting shared by all fakes of one client."""
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.calls = 0
+        self.by_method = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def hit(self, method):
+        with self._lock:
+            self.calls += 1
+            self.by_method[method] = self.by_method.get(method, 0) + 1
+            fail = self.error_rate and self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if fail:
+            response = requests.Response()
+            response.status_code = 429
+            response._content = b'{"error": {"code": 429, "message": "Quota exceeded", "status": "RESOURCE_EXHAUSTED"}}'
+            raise gspread.exceptions.APIError(response)
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self.by_method = {}
+
+
+# ========== gspread ==========
+class FakeWorksheet:
+    def __init__(self, api, title, values=None):
+        self.api = api
+        self.title = title
+        self.values = [list(map(str, r)) for r in values or []]
+        self.last_value_input_option = None
+        self._lock = threading.Lock()
+
+    def _grid(self, a1):
+        grid = a1_range_to_grid_range(a1)
+        rows = self.values[grid.get("startRowIndex", 0):grid.get("endRowIndex")]
+        return [r[grid.get("startColumnIndex", 0):grid.get("endColumnIndex")] for r in rows]
+
+    def get_all_values(self):
+        self.api.hit("get_all_values")
+        with self._lock:
+            return fill_gaps([list(r) for r in self.values]) if self.values else []
+
+    def get_values(self, a1):
+        self.api.hit("get_values")
+        with self._lock:
+            rows = self._grid(a1)
+        return fill_gaps(rows) if rows else []
+
+    def append_row(self, row):
+        self.api.hit("append_row")
+        with self._lock:
+            self.values.append(list(map(str, row)))
+
+    def append_rows(self, rows):
+        self.api.hit("append_rows")
+        with self._lock:
+            self.values.extend([list(map(str, r)) for r in rows])
+
+    def _set(self, row, col, value):
+        while len(self.values) < row:
+            self.values.append([])
+        cells = self.values[row - 1]
+        cells.extend([""] * (col - len(cells)))
+        cells[col - 1] = str(value)
+
+    def update_cell(self, row, col, value):
+        self.api.hit("update_cell")
+        with self._lock:
+            self._set(row, col, value)
+
+    def batch_update(self, data):
+        self.api.hit("batch_update")
+        with self._lock:
+            for update in data:
+                grid = a1_range_to_grid_range(update["range"])
+                for r, row in enumerate(update["values"]):
+                    for c, value in enumerate(row):
+                        self._set(grid["startRowIndex"] + r + 1, grid["startColumnIndex"] + c + 1, value)
+
+    def update(self, range_name=None, values=None, value_input_option=None):
+        self.api.hit("update")
+        self.last_value_input_option = value_input_option
+        grid = a1_range_to_grid_range(range_name or "A1")
+        with self._lock:
+            for r, row in enumerate(values):
+                for c, value in enumerate(row):
+                    self._set(grid.get("startRowIndex", 0) + r + 1, grid.get("startColumnIndex", 0) + c + 1, value)
+
+    def batch_clear(self, ranges):
+        self.api.hit("batch_clear")
+        with self._lock:
+            for a1 in ranges:
+                grid = a1_range_to_grid_range(a1)
+                for r in range(grid.get("startRowIndex", 0), min(grid.get("endRowIndex", 0), len(self.values))):
+                    self.values[r] = []
+            # Like Sheets, later appends land after the last non-empty row
+            while self.values and not any(self.values[-1]):
+                self.values.pop()
+
+    def delete_rows(self, start, end=None):
+        self.api.hit("delete_rows")
+        with self._lock:
+            del self.values[start - 1:(end or start)]
+
+
+class FakeSpreadsheet:
+    def __init__(self, api, key):
+        self.api = api
+        self.id = key
+        self.sheets = {}
+
+    def worksheet(self, title):
+        self.api.hit("worksheet")
+        if title not in self.sheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26):
+        self.api.hit("add_worksheet")
+        self.sheets[title] = FakeWorksheet(self.api, title)
+        return self.sheets[title]
+
+    def values_batch_get(self, ranges):
+        self.api.hit("values_batch_get")
+        result = []
+        for name in ranges:
+            title = re.sub(r"^'(.*)'$", r"\1", name).replace("''", "'")
+            if title not in self.sheets:
+                raise gspread.exceptions.WorksheetNotFound(title)
+            values = self.sheets[title].values
+            result.append({"range": name, "values": [list(r) for r in values]} if values else {"range": name})
+        return {"valueRanges": result}
+
+
+class FakeGspreadClient:
+    def __init__(self, latency=0.0, error_rate=0.0, seed=0):
+        self.api = FakeAPI(latency, error_rate, seed)
+        self.spreadsheets = {}
+
+    def load(self, key, title, values):
+        """Puts a worksheet in place without counting it as an API call."""
+        spreadsheet = self.spreadsheets.setdefault(key, FakeSpreadsheet(self.api, key))
+        spreadsheet.sheets[title] = FakeWorksheet(self.api, title, values)
+
+    def open_by_key(self, key):
+        self.api.hit("open_by_key")
+        return self.spreadsheets.setdefault(key, FakeSpreadsheet(self.api, key))
+
+
+# ========== Drive ==========
+class _Response(dict):
+    def __init__(self, status, headers):
+        super().__init__(headers)
+        self.status = status
+
+
+class _FakeHttp:
+    def __init__(self, api, content):
+        self.api = api
+        self.content = content
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        self.api.hit("download_chunk")
+        start, end = map(int, re.match(r"bytes=(\d+)-(\d+)", headers["range"]).groups())
+        chunk = self.content[start:end + 1]
+        total = len(self.content)
+        if total == 0:
+            return _Response(416, {"content-range": "bytes */0"}), b""
+        return _Response(206, {"content-range": f"bytes {start}-{start + len(chunk) - 1}/{total}"}), chunk
+
+
+class _Request:
+    def __init__(self, api, uri, result=None, content=None):
+        self.api = api
+        self.uri = uri
+        self.headers = {}
+        self.http = _FakeHttp(api, content or b"")
+        self._result = result
+
+    def execute(self, num_retries=0):
+        self.api.hit("execute")
+        return self._result
+
+
+class _Files:
+    def __init__(self, service):
+        self.service = service
+
+    def get(self, fileId, fields=None, supportsAllDrives=True):
+        content = self.service.contents[fileId]
+        revision = hashlib.md5(content).hexdigest()
+        return _Request(self.service.api, f"files/{fileId}",
+                        result={"md5Checksum": revision, "modifiedTime": "2024-01-01T00:00:00Z"})
+
+    def get_media(self, fileId, supportsAllDrives=True):
+        return _Request(self.service.api, f"files/{fileId}?alt=media", content=self.service.contents[fileId])
+
+
+class FakeDriveService:
+    """
+    Just enough of ``files()`` for ``drive.fetch_revision`` and
+    ``drive.download_bytes``.  No failure injection – Drive errors are
+    retried by the client library, not the app.
+    """
+
+    def __init__(self, latency=0.0):
+        self.api = FakeAPI(latency)
+        self.contents = {}      # file id -> bytes
+
+    def put(self, file_id, content):
+        self.contents[file_id] = content
+
+    def files(self):
+        return _Files(self)
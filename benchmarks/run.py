@@ -0,0 +1,364 @@
+"""
+Times the app's data paths against synthetic data and a fake Sheets /
+Drive client, and writes the results as JSON so runs can be compared.
+
+    python -m benchmarks.run --sizes 1000 10000 200000 --latency-ms 0 50 \\
+        --output bench.json
+
+Each benchmark is repeated ``--repeat`` times on a fresh fixture.  A result
+holds min / median / p95 / mean wall time of one repetition, the number of
+operations in it (``per_op_us`` = median / ops) and the fake API calls it
+made, by method.  ``--compare old.json`` prints the median change per
+benchmark against an earlier run; ``--trace`` turns ``tracing`` on, to
+measure its overhead.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.fakes import FakeDriveService, FakeGspreadClient     # noqa: E402
+from benchmarks.synthetic import GROUP_LOG_SHEET, Dataset, student_email     # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+class Fixture:
+    """One dataset loaded into a fresh fake client, with the app's storage and roster on top."""
+
+    def __init__(self, dataset, latency, error_rate, quota):
+        from scheduler import RequestScheduler
+        from storage import SheetsStorage
+        self.data = dataset
+        self.client = FakeGspreadClient(latency, error_rate, seed=dataset.seed)
+        dataset.load_into(self.client)
+        self.scheduler = RequestScheduler(quota, quota, base_delay=0.01, max_delay=0.1)
+        self.storage = SheetsStorage(self.client, scheduler=self.scheduler)
+        self._roster = None
+
+    @property
+    def api(self):
+        return self.client.api
+
+    def roster(self):
+        if self._roster is None:
+            self._roster = build_roster(self.storage, self.data)
+            self.api.reset()
+        return self._roster
+
+
+def build_roster(storage, data):
+    """What ``app.get_roster`` does, minus Streamlit."""
+    from bootstrap import fetch_tables, typed_frames
+    from roster import Roster
+    from sync import IncrementalTable
+    tables = fetch_tables(storage, data.bootstrap_plan())
+    frames = typed_frames(tables)
+    groups_sync = IncrementalTable(storage, GROUP_LOG_SHEET, "groups")
+    groups_sync.seed(tables[(GROUP_LOG_SHEET, "groups")])
+    course_df = frames["course_list"]
+    return Roster(
+        frames["Enrolled Students"], frames["Login_details"], groups_sync.frame(),
+        sorted(course_df.iloc[:, 0].dropna().unique()), groups_sync=groups_sync,
+    )
+
+
+# ========== Benchmarks ==========
+# Each takes a Fixture and returns (setup, run): setup() is untimed and
+# returns the argument run() is timed with; run() returns its op count.
+
+@benchmark("bootstrap")
+def bench_bootstrap(fx):
+    """Cold start: batched reads of every startup worksheet + the shared roster."""
+    return lambda: None, lambda _: (build_roster(fx.storage, fx.data), 1)[1]
+
+
+@benchmark("authenticate")
+def bench_authenticate(fx, lookups=10000):
+    """``roster.credentials.lookup`` – students, admins and wrong passwords."""
+    roster = fx.roster()
+
+    def setup():
+        rng = random.Random(1)
+        attempts = []
+        for _ in range(lookups):
+            i = rng.randrange(fx.data.size)
+            kind = rng.random()
+            if kind < 0.8:
+                attempts.append((student_email(i).upper() + " ", f"MIVA/{i:06d}"))
+            elif kind < 0.9:
+                attempts.append(("admin0@bench.example.edu", "pw-0"))
+            else:
+                attempts.append((student_email(i), "wrong"))
+        return attempts
+
+    def run(attempts):
+        lookup = roster.credentials.lookup
+        for email, password in attempts:
+            lookup(email, password)
+        return len(attempts)
+
+    return setup, run
+
+
+@benchmark("membership_index")
+def bench_membership_index(fx):
+    """``MembershipIndex`` rebuilt from the groups table (roster refresh / full sync)."""
+    from membership import MembershipIndex
+    groups_df = fx.roster().groups_df
+    return lambda: groups_df, lambda df: (MembershipIndex.from_df(df), len(df))[1]
+
+
+@benchmark("eligibility")
+def bench_eligibility(fx, checks=2000, group_size=5):
+    """The student page's group check: grouped?, then eligibility + roster order of the typed emails."""
+    roster = fx.roster()
+    course = fx.data.course
+
+    def setup():
+        rng = random.Random(2)
+        return [[student_email(rng.randrange(fx.data.size)) for _ in range(group_size)] for _ in range(checks)]
+
+    def run(inputs):
+        index = roster.groups_index
+        for emails in inputs:
+            me = emails[0]
+            if index.is_grouped(course, me):
+                index.group_for(course, me)
+                continue
+            valid = [e for e in emails if e in roster.fullname_by_email
+                     and (e == me or not index.is_grouped(course, e))]
+            roster.in_roster_order(valid)
+        return len(inputs)
+
+    return setup, run
+
+
+@benchmark("validate_groups")
+def bench_validate_groups(fx, groups=500):
+    """Admin bulk import: whole-file validation against the roster (about 10% bad groups)."""
+    from bulk_import import validate_groups
+    roster = fx.roster()
+    frame = fx.data.import_file(groups)
+    return lambda: frame, lambda df: (validate_groups(df, roster), len(df))[1]
+
+
+@benchmark("form_groups")
+def bench_form_groups(fx):
+    """Admin auto-formation: ungrouped students of a course, dealt into balanced groups."""
+    from group_formation import form_groups, ungrouped_students
+    roster = fx.roster()
+
+    def run(_):
+        students = ungrouped_students(roster, fx.data.course)
+        form_groups(students, fx.data.course, balance_by=("faculty", "program"),
+                    taken=roster.groups_index.has_group_name)
+        return len(students)
+
+    return lambda: None, run
+
+
+@benchmark("submission_lookup")
+def bench_submission_lookup(fx, lookups=5000):
+    """Cold ``SubmissionsTable`` load, then "has this group submitted this lab?" lookups."""
+    from submissions import SubmissionsTable
+    data = fx.data
+
+    def setup():
+        rng = random.Random(3)
+        table = SubmissionsTable(fx.storage, GROUP_LOG_SHEET)
+        keys = [(f"Group {rng.randrange(max(1, data.group_count)) + 1}", data.course, f"Lab {rng.randrange(6) + 1}")
+                for _ in range(lookups)]
+        return table, keys
+
+    def run(args):
+        table, keys = args
+        for group_name, course, lab in keys:
+            table.find(group_name, course, lab)
+        return len(keys)
+
+    return setup, run
+
+
+@benchmark("grade_fanout")
+def bench_grade_fanout(fx, grades=20):
+    """Grading page: verified ``set_grade`` + one grade row per member, for ``grades`` submissions."""
+    from submissions import SubmissionsTable
+    roster = fx.roster()
+    data = fx.data
+    header = ["timestamp", "course", "lab", "group_name", "name", "email", "score"]
+
+    def setup():
+        table = SubmissionsTable(fx.storage, GROUP_LOG_SHEET)
+        table.frame()
+        fx.api.reset()
+        rng = random.Random(4)
+        picks = [f"Group {rng.randrange(max(1, data.group_count)) + 1}" for _ in range(min(grades, data.group_count))]
+        return table, picks
+
+    def run(args):
+        table, picks = args
+        sheet = f"{data.course}_Lab_1".replace(" ", "_")
+        for group_name in picks:
+            table.set_grade(group_name, data.course, "Lab 1", "85")
+            fx.storage.ensure_table(GROUP_LOG_SHEET, sheet, header=header)
+            fx.storage.append_rows(GROUP_LOG_SHEET, sheet, [
+                ["2024-01-01 00:00:00", data.course, "Lab 1", group_name, name, email, "85"]
+                for name, email in roster.groups_index.members_of(group_name)
+            ])
+        return len(picks)
+
+    return setup, run
+
+
+@benchmark("drive_preview")
+def bench_drive_preview(fx, files=20, size=256 * 1024):
+    """Notebook preview fetch: revision lookup + chunked download per file."""
+    from drive import download_bytes, fetch_revision
+    drive = FakeDriveService(fx.api.latency)
+    for i in range(files):
+        drive.put(f"file-{i}", os.urandom(size))
+
+    def run(_):
+        for i in range(files):
+            fetch_revision(drive, f"file-{i}")
+            download_bytes(drive, f"file-{i}")
+        return files
+
+    fx.drive = drive
+    return lambda: drive.api.reset(), run
+
+
+# ========== Runner ==========
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def run_one(name, dataset, latency, error_rate, quota, repeat):
+    timings, ops, calls = [], 0, {}
+    for _ in range(repeat):
+        fx = Fixture(dataset, latency, error_rate, quota)
+        setup, run = BENCHMARKS[name](fx)
+        arg = setup()
+        fx.api.reset()
+        started = time.perf_counter()
+        ops = run(arg)
+        timings.append(time.perf_counter() - started)
+        api = getattr(fx, "drive", fx.client).api
+        calls = dict(sorted(api.by_method.items()))
+    median = statistics.median(timings)
+    return {
+        "benchmark": name,
+        "students": dataset.size,
+        "latency_ms": latency * 1000,
+        "error_rate": error_rate,
+        "repeat": repeat,
+        "ops": ops,
+        "min_s": min(timings),
+        "median_s": median,
+        "p95_s": _percentile(timings, 0.95),
+        "mean_s": statistics.fmean(timings),
+        "per_op_us": median / ops * 1e6 if ops else None,
+        "api_calls": sum(calls.values()),
+        "api_calls_by_method": calls,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old, new):
+    """Median change of every (benchmark, students, latency) present in both runs."""
+    def keyed(results):
+        return {(r["benchmark"], r["students"], r["latency_ms"]): r for r in results["results"]}
+    before = keyed(old)
+    lines = []
+    for key, result in keyed(new).items():
+        if key in before:
+            change = result["median_s"] / before[key]["median_s"] - 1 if before[key]["median_s"] else 0.0
+            lines.append(f"{key[0]:<18} {key[1]:>7} students {key[2]:>6.0f} ms  "
+                         f"{before[key]['median_s'] * 1000:9.2f} → {result['median_s'] * 1000:9.2f} ms  {change:+.1%}")
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000],
+                        help="roster sizes to generate (students)")
+    parser.add_argument("--latency-ms", type=float, nargs="+", default=[0.0],
+                        help="fake per-call API latency(ies)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of Sheets calls failing with 429")
+    parser.add_argument("--quota", type=int, default=10 ** 9,
+                        help="reads/writes per minute for the scheduler (default: unthrottled)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--trace", action="store_true", help="run with tracing enabled (to measure its overhead)")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="benchmarks to run")
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", help="earlier results file to compare medians against")
+    args = parser.parse_args(argv)
+    if args.trace:
+        import tracing
+        tracing.set_enabled(True)
+        tracing.begin_run("benchmark")
+
+    results = []
+    for size in args.sizes:
+        dataset = Dataset(size)
+        for latency_ms in args.latency_ms:
+            for name in args.only or BENCHMARKS:
+                result = run_one(name, dataset, latency_ms / 1000, args.error_rate, args.quota, args.repeat)
+                results.append(result)
+                print(f"{name:<18} {size:>7} students {latency_ms:>6.0f} ms  median {result['median_s'] * 1000:9.2f} ms"
+                      f"  p95 {result['p95_s'] * 1000:9.2f} ms  {result['api_calls']:>4} API calls",
+                      file=sys.stderr)
+
+    report = {
+        "meta": {
+            "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            for line in compare(json.load(f), report):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
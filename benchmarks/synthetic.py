@@ -0,0 +1,120 @@
+"""
+Synthetic roster, groups, labs and submissions in the raw worksheet shape
+(header row + string rows), deterministic for a given size and seed.
+
+About ``grouped`` of the students are already in groups of
+``group_size`` for the first course; every such group has submitted
+each of its course's labs.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from roster import GROUP_COLUMNS
+from submissions import SUBMISSION_COLUMNS
+
+STUDENT_SHEET = "bench-students"
+GROUP_LOG_SHEET = "bench-group-log"
+
+FACULTIES = {
+    "Computing": ["Computer Science", "Software Engineering", "Cybersecurity", "Data Science"],
+    "Management": ["Accounting", "Business Administration", "Economics"],
+    "Health": ["Nursing", "Public Health"],
+}
+COURSES = ["CSC 101", "CSC 201", "MTH 101", "GST 105", "ACC 201"]
+LABS_PER_COURSE = 4
+ADMINS = 5
+
+
+def student_email(i):
+    return f"student{i:06d}@bench.example.edu"
+
+
+class Dataset:
+    def __init__(self, students=1000, grouped=0.5, group_size=5, seed=0):
+        self.size = students
+        self.seed = seed
+        rng = random.Random(seed)
+        programs = [(f, p) for f, ps in FACULTIES.items() for p in ps]
+
+        self.students = [["first_name", "last_name", "email", "student_id", "faculty", "program"]]
+        for i in range(students):
+            faculty, program = programs[rng.randrange(len(programs))]
+            self.students.append([f"First{i}", f"Last{i}", student_email(i), f"MIVA/{i:06d}", faculty, program])
+
+        self.logins = [["Email", "Password"]] + [[f"admin{i}@bench.example.edu", f"pw-{i}"] for i in range(ADMINS)]
+        self.courses = [["course"]] + [[c] for c in COURSES]
+        self.labs = [["Course", "Lab Name"]] + [[c, f"Lab {n}"] for c in COURSES for n in range(1, LABS_PER_COURSE + 1)]
+
+        # Grouped students, dealt into consecutive groups of group_size in a shuffled order
+        self.course = COURSES[0]
+        order = list(range(students))
+        rng.shuffle(order)
+        taken = order[:int(students * grouped) // group_size * group_size]
+        self.ungrouped = sorted(order[len(taken):])
+        start = datetime(2024, 1, 1)
+        self.groups = [list(GROUP_COLUMNS)]
+        for g in range(0, len(taken), group_size):
+            members = taken[g:g + group_size]
+            first = self.students[members[0] + 1]
+            self.groups.append([
+                (start + timedelta(minutes=g)).strftime("%Y-%m-%d %H:%M:%S"),
+                f"Group {g // group_size + 1}", first[4], first[5], self.course,
+                ", ".join(student_email(m) for m in members),
+                ", ".join(f"First{m} Last{m}" for m in members),
+                student_email(members[0]),
+            ])
+
+        self.submissions = [list(SUBMISSION_COLUMNS)]
+        for group in self.groups[1:]:
+            for n in range(1, LABS_PER_COURSE + 1):
+                file_id = f"file-{len(self.submissions)}"
+                self.submissions.append([
+                    group[0], group[1], self.course, f"Lab {n}", group[7], f"lab{n}.ipynb",
+                    f"https://drive.google.com/file/d/{file_id}/view?usp=sharing", "No", "", "",
+                ])
+
+    @property
+    def group_count(self):
+        return len(self.groups) - 1
+
+    def load_into(self, client):
+        """Puts every worksheet into a ``fakes.FakeGspreadClient`` (not counted as API calls)."""
+        client.load(STUDENT_SHEET, "Enrolled Students", self.students)
+        client.load(GROUP_LOG_SHEET, "Login_details", self.logins)
+        client.load(GROUP_LOG_SHEET, "groups", self.groups)
+        client.load(GROUP_LOG_SHEET, "course_list", self.courses)
+        client.load(GROUP_LOG_SHEET, "Labs", self.labs)
+        client.load(GROUP_LOG_SHEET, "Submissions", self.submissions)
+
+    def bootstrap_plan(self):
+        """Same worksheets as ``app.bootstrap_plan``."""
+        return {
+            STUDENT_SHEET: ["Enrolled Students"],
+            GROUP_LOG_SHEET: ["Login_details", "groups", "course_list"],
+        }
+
+    def import_file(self, groups=100, group_size=5, bad=0.1, seed=1):
+        """
+        A bulk-import DataFrame of ``groups`` groups built from ungrouped
+        students; about ``bad`` of them carry one error each (unknown
+        member, already-grouped member or a repeated name).
+        """
+        import pandas as pd
+        rng = random.Random(seed)
+        pool = list(self.ungrouped)
+        rng.shuffle(pool)
+        rows = []
+        for g in range(min(groups, len(pool) // group_size)):
+            members = [student_email(m) for m in pool[g * group_size:(g + 1) * group_size]]
+            name = f"Import {g + 1}"
+            if rng.random() < bad:
+                problem = rng.randrange(3)
+                if problem == 0:
+                    members[-1] = f"nobody{g}@bench.example.edu"
+                elif problem == 1 and self.group_count:
+                    members[-1] = self.groups[1][5].split(", ")[0]
+                else:
+                    name = "Group 1"
+            rows.append({"group_name": name, "course": self.course, "members": ", ".join(members)})
+        return pd.DataFrame(rows, columns=["group_name", "course", "members"])
@@ -0,0 +1,63 @@
+"""
+Session bootstrap: every worksheet the first page needs, fetched up front.
+
+``fetch_tables`` reads all worksheets of a spreadsheet with one batched
+call (``read_values_batch``) and the spreadsheets in parallel, so a cold
+start costs one round trip per spreadsheet instead of one per worksheet.
+``typed_frames`` turns the raw values into the DataFrames the app uses,
+with the same column clean-up the individual loaders used to apply.
+"""
+
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import table_frame
+
+
+def fetch_tables(storage, plan):
+    """
+    ``plan`` is ``{spreadsheet key: [worksheet, ...]}``; returns
+    ``{(key, worksheet): values}`` with the raw ``get_all_values()`` shape.
+    """
+    if not plan:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(plan), thread_name_prefix="bootstrap") as pool:
+        # Each read runs in a copy of the caller's context, so it is traced against the caller's run
+        futures = {key: pool.submit(contextvars.copy_context().run, storage.read_values_batch, key, worksheets)
+                   for key, worksheets in plan.items()}
+        return {
+            (key, worksheet): values
+            for key, future in futures.items()
+            for worksheet, values in future.result().items()
+        }
+
+
+def _students(df):
+    df["email"]      = df["email"].str.strip().str.lower()
+    df["student_id"] = df["student_id"].astype(str).str.strip()
+    return df
+
+
+def _login(df):
+    df["Email"]    = df["Email"].str.strip().str.lower()
+    df["Password"] = df["Password"].astype(str).str.strip()
+    return df
+
+
+# Per-worksheet clean-up applied to non-empty frames
+NORMALISERS = {
+    "Enrolled Students": _students,
+    "Login_details": _login,
+}
+
+
+def typed_frames(tables):
+    """``{(key, worksheet): values}`` → ``{worksheet: DataFrame}`` (titles are unique across the sheets)."""
+    frames = {}
+    for (_, worksheet), values in tables.items():
+        df = table_frame(values)
+        normalise = NORMALISERS.get(worksheet)
+        if normalise and not df.empty:
+            df = normalise(df)
+        frames[worksheet] = df
+    return frames
@@ -0,0 +1,155 @@
+"""
+Admin bulk import of groups from a CSV / XLSX file.
+
+The file needs ``group_name``, ``course`` and ``members`` (comma-separated
+emails) columns; ``faculty`` and ``department`` are optional and default to
+the first member's roster record.  ``validate_groups`` checks the whole
+file at once with joins against the roster (sizes, name uniqueness,
+enrolment, already-grouped members, members listed twice) and returns
+every problem together; a clean file becomes one ``append_rows`` call.
+"""
+
+import hashlib
+
+import pandas as pd
+
+from membership import explode_members
+
+REQUIRED_COLUMNS = ("group_name", "course", "members")
+MIN_MEMBERS = 3
+MAX_MEMBERS = 15
+
+
+def read_groups_file(uploaded):
+    """Streamlit ``UploadedFile`` (.csv / .xlsx) → DataFrame of strings with normalised headers."""
+    if uploaded.name.lower().endswith(".xlsx"):
+        df = pd.read_excel(uploaded, dtype=str)     # needs openpyxl
+    else:
+        df = pd.read_csv(uploaded, dtype=str, keep_default_na=False)
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    return df.fillna("")
+
+
+def import_key(created_by, uploaded):
+    """Same admin + same file bytes → same key, so a double-clicked import only runs once."""
+    digest = hashlib.sha256(created_by.strip().lower().encode("utf-8"))
+    digest.update(uploaded.getvalue())
+    return digest.hexdigest()
+
+
+def _issues(lines, message):
+    return pd.DataFrame({"line": list(lines), "error": list(message)})
+
+
+def validate_groups(df, roster):
+    """
+    Returns ``(groups, errors)``.  ``groups`` has one row per group with the
+    ``groups`` sheet columns (minus timestamp / created_by); ``errors`` has
+    ``line, group_name, error`` for every problem found (line 1 is the header).
+    """
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing:
+        return pd.DataFrame(), pd.DataFrame({
+            "line": [1], "group_name": [""], "error": [f"Missing column(s): {', '.join(missing)}"],
+        })
+
+    groups = pd.DataFrame({
+        "line": df.index + 2,
+        "group_name": df["group_name"].astype(str).str.strip(),
+        "course_input": df["course"].astype(str).str.strip(),
+        "members": df["members"].astype(str),
+    })
+    groups["name_key"] = groups["group_name"].str.lower()
+    courses = {str(c).strip().lower(): c for c in roster.course_list}
+    groups["course"] = groups["course_input"].str.lower().map(courses)
+    groups["course_key"] = groups["course"].str.strip().str.lower()
+
+    members = explode_members(groups[["line", "course_key", "members"]])
+    problems = []
+
+    # ---- per-group checks ----
+    blank = groups["group_name"] == ""
+    problems.append(_issues(groups.loc[blank, "line"], ["Group name is empty"] * blank.sum()))
+
+    unknown = groups["course"].isna()
+    problems.append(_issues(
+        groups.loc[unknown, "line"],
+        "Unknown course '" + groups.loc[unknown, "course_input"] + "'",
+    ))
+
+    repeated = ~blank & groups["name_key"].duplicated(keep=False)
+    problems.append(_issues(groups.loc[repeated, "line"], ["Group name appears more than once in the file"] * repeated.sum()))
+
+    existing = roster.groups_df
+    existing_names = (
+        existing["group_name"].astype(str).str.strip().str.lower()
+        if "group_name" in existing.columns else pd.Series(dtype=str)
+    )
+    taken_name = ~blank & groups["name_key"].isin(existing_names)
+    problems.append(_issues(groups.loc[taken_name, "line"], ["Group name already exists"] * taken_name.sum()))
+
+    sizes = members.drop_duplicates(["line", "email"]).groupby("line").size()
+    sizes = groups["line"].map(sizes).fillna(0).astype(int)
+    bad_size = (sizes < MIN_MEMBERS) | (sizes > MAX_MEMBERS)
+    problems.append(_issues(
+        groups.loc[bad_size, "line"],
+        f"Group must have between {MIN_MEMBERS} and {MAX_MEMBERS} members (has " + sizes[bad_size].astype(str) + ")",
+    ))
+
+    # ---- per-member checks, reported as one line per group ----
+    def member_issue(hits, prefix):
+        emails = hits.drop_duplicates(["line", "email"]).groupby("line")["email"].agg(", ".join)
+        problems.append(_issues(emails.index, prefix + emails.values))
+
+    member_issue(members[members.duplicated(["line", "email"])], "Listed twice: ")
+    distinct = members.drop_duplicates(["line", "email"])
+
+    students = roster.students_df
+    enrolled = students["email"] if "email" in students.columns else pd.Series(dtype=str)
+    member_issue(distinct[~distinct["email"].isin(enrolled)], "Not enrolled: ")
+
+    if {"course", "members"} <= set(existing.columns) and not existing.empty:
+        grouped = explode_members(pd.DataFrame({
+            "course_key": existing["course"].astype(str).str.strip().str.lower(),
+            "members": existing["members"].astype(str),
+        })).drop_duplicates()
+        member_issue(distinct.merge(grouped, on=["course_key", "email"]), "Already in a group for this course: ")
+
+    in_two = distinct["course_key"].notna() & distinct.duplicated(["course_key", "email"], keep=False)
+    member_issue(distinct[in_two], "In more than one group of the file: ")
+
+    errors = pd.concat(problems, ignore_index=True).astype({"line": int})
+    errors = errors.merge(groups[["line", "group_name"]], on="line", how="left")
+    errors = errors[["line", "group_name", "error"]].sort_values("line", kind="stable").reset_index(drop=True)
+    if not errors.empty:
+        return pd.DataFrame(), errors
+
+    return _build_groups(df, groups, members, students), errors
+
+
+def _build_groups(df, groups, members, students):
+    people = students.drop_duplicates("email").set_index("email")
+    members = members.drop_duplicates(["line", "email"])
+    names = members["email"].map(people["fullname"]) if "fullname" in people.columns else members["email"]
+    members = members.assign(name=names.astype(object).fillna("").astype(str))
+    lead = groups["line"].map(members.drop_duplicates("line").set_index("line")["email"])
+
+    def column(name, fallback):
+        """The file's value, or the first member's roster ``fallback`` when blank / absent."""
+        default = pd.Series("", index=groups.index)
+        if fallback in people.columns:
+            default = lead.map(people[fallback]).astype(object).fillna("").astype(str)
+        if name not in df.columns:
+            return default
+        given = df[name].astype(str).str.strip()
+        return given.where(given != "", default)
+
+    by_line = members.groupby("line", sort=False)
+    return pd.DataFrame({
+        "group_name": groups["group_name"],
+        "faculty": column("faculty", "faculty"),
+        "department": column("department", "program"),
+        "course": groups["course"],
+        "members": groups["line"].map(by_line["email"].agg(", ".join)),
+        "member_names": groups["line"].map(by_line["name"].agg(", ".join)),
+    }).reset_index(drop=True)
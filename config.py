@@ -0,0 +1,23 @@
+"""
+Typed values from the ``google_service_account`` secrets section.
+
+TOML gives real booleans for ``flag = false``, but a quoted ``"false"``
+(or a value that came in through an environment variable) is a non-empty
+string, which ``bool()`` would read as True.
+"""
+
+_TRUE = {"1", "true", "yes", "on"}
+_FALSE = {"0", "false", "no", "off", ""}
+
+
+def secret_flag(secrets, name, default=False):
+    """``secrets[name]`` as a bool; accepts booleans and true/false, yes/no, on/off, 1/0 strings."""
+    value = secrets.get(name, default)
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise ValueError(f"{name} must be true or false, not {value!r}")
+    return bool(value)
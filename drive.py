@@ -0,0 +1,153 @@
+"""
+Google Drive access.
+
+``get_drive_service`` builds one Drive client per process from the
+discovery document bundled with google-api-python-client (no discovery
+fetch), and gives every thread its own keep-alive ``AuthorizedHttp`` –
+httplib2 connections are not thread-safe – which refreshes the token
+whenever it expires.  Every Drive call in the app goes through it.
+
+Uploaded files are spooled to a temporary file as soon as Streamlit hands
+them over, so only a path sits in ``st.session_state`` across reruns.
+``upload_file`` then sends the file with a chunked, resumable upload and
+reports progress after every chunk.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from io import BytesIO
+
+import google_auth_httplib2
+import httplib2
+import streamlit as st
+from googleapiclient.discovery import build
+from googleapiclient.http import HttpRequest, MediaFileUpload, MediaIoBaseDownload
+
+import tracing
+
+SPOOL_DIR = os.path.join(tempfile.gettempdir(), "group-assignment-uploads")
+CHUNK_SIZE = 8 * 1024 * 1024        # must be a multiple of 256 KiB
+SPOOL_MAX_AGE = 24 * 60 * 60        # abandoned spools are removed after a day
+HTTP_TIMEOUT = 60
+
+
+@st.cache_resource
+def get_drive_service(_creds):
+    """One Drive client per process; ``_creds`` is only used the first time."""
+    local = threading.local()
+
+    def thread_http():
+        http = getattr(local, "http", None)
+        if http is None:
+            http = local.http = google_auth_httplib2.AuthorizedHttp(
+                _creds, http=httplib2.Http(timeout=HTTP_TIMEOUT)
+            )
+        return http
+
+    def build_request(_http, *args, **kwargs):
+        # Ignore the shared http and use the calling thread's pooled one
+        return HttpRequest(thread_http(), *args, **kwargs)
+
+    return build("drive", "v3", http=thread_http(), requestBuilder=build_request,
+                 static_discovery=True, cache_discovery=False)
+
+
+def download_bytes(service, file_id):
+    return tracing.call("drive", "download", _download, service, file_id)
+
+
+def _download(service, file_id):
+    request = service.files().get_media(fileId=file_id, supportsAllDrives=True)
+    file_buffer = BytesIO()
+    downloader = MediaIoBaseDownload(file_buffer, request)
+    done = False
+    while not done:
+        _, done = downloader.next_chunk()
+    return file_buffer.getvalue()
+
+
+def fetch_revision(service, file_id):
+    meta = tracing.call("drive", "get_metadata", service.files().get(
+        fileId=file_id, fields="md5Checksum,modifiedTime", supportsAllDrives=True
+    ).execute)
+    return meta.get("md5Checksum") or meta.get("modifiedTime") or ""
+
+
+def spool_upload(uploaded):
+    """Copies a Streamlit ``UploadedFile`` to disk in chunks; returns the path."""
+    os.makedirs(SPOOL_DIR, exist_ok=True)
+    _cleanup_spool()
+    path = os.path.join(SPOOL_DIR, uuid.uuid4().hex)
+    uploaded.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(uploaded, f, length=1024 * 1024)
+    return path
+
+
+def discard_spool(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _cleanup_spool():
+    cutoff = time.time() - SPOOL_MAX_AGE
+    for name in os.listdir(SPOOL_DIR):
+        path = os.path.join(SPOOL_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def upload_file(creds, path, filename, folder_id, progress=None, chunksize=CHUNK_SIZE):
+    """
+    Resumable upload of ``path`` into ``folder_id``; makes the file public
+    and returns its sharing link.  ``progress(fraction)`` is called after
+    every chunk.
+    """
+    service = get_drive_service(creds)
+
+    file_metadata = {
+        "name": filename,
+        "parents": [folder_id]
+    }
+    media = MediaFileUpload(path, mimetype="application/octet-stream",
+                            chunksize=chunksize, resumable=True)
+
+    request = service.files().create(
+        body=file_metadata,
+        media_body=media,
+        fields="id",
+        supportsAllDrives=True  # ✅ Allow file creation in Shared Drives
+    )
+    size, offset = os.path.getsize(path), 0
+    uploaded_file = None
+    while uploaded_file is None:
+        # next_chunk retries transient errors itself and resumes from the last acknowledged byte
+        status, uploaded_file = tracing.call("drive", "upload_chunk", request.next_chunk, num_retries=3,
+                                             sent=max(0, min(chunksize, size - offset)))
+        offset = status.resumable_progress if status else size
+        if status and progress:
+            progress(status.progress())
+    if progress:
+        progress(1.0)
+
+    file_id = uploaded_file.get("id")
+
+    # Make the file public
+    permission = {"type": "anyone", "role": "reader"}
+    tracing.call("drive", "create_permission", service.permissions().create(
+        fileId=file_id,
+        body=permission,
+        supportsAllDrives=True  # ✅ Required for Shared Drives
+    ).execute)
+
+    return f"https://drive.google.com/file/d/{file_id}/view?usp=sharing"
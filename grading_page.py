@@ -1,3 +1,15 @@
+import streamlit as st
+import pandas as pd
+from datetime import datetime
+from previews import prefetch_previews, render_preview
+from labs import get_lab_catalog
+from submissions import get_submissions_table
+from timing import RunTimer
+import uuid
+
+# Submissions rendered per page; the next page is prefetched in the background
+PAGE_SIZE = 10
+
 # import streamlit as st
 # import pandas as pd
 # from datetime import datetime
@@ -130,32 +142,36 @@
 #                 st.error(f"❌ Failed to grade: {e}")
 
 def grading_page():
+    timer = RunTimer(prefix="grading/")
     st.subheader("📝 Grade Lab Submissions")
 
     # Access preloaded session data
-    groups_df = st.session_state.get("groups_df", pd.DataFrame())
-    submissions_df = st.session_state.get("submissions_df", pd.DataFrame())
-    labs_df = st.session_state.get("labs_df", pd.DataFrame())
-    client = st.session_state.get("client")
+    roster = st.session_state.get("roster")
+    storage = st.session_state.get("storage")
     creds = st.session_state.get("creds")
-    sheet_id = st.session_state.get("student_sheet_id")
+    # Submissions, Labs and the grade sheets live in the group log spreadsheet – the one the student page writes to
+    sheet_id = st.session_state.get("group_log_sheet_id")
+    submissions = get_submissions_table(storage, sheet_id) if storage is not None else None
+    submissions_df = submissions.frame() if submissions is not None else pd.DataFrame()
+    timer.mark("submissions")
+
+    labs = get_lab_catalog(storage, sheet_id) if storage is not None else None
 
-    if labs_df.empty:
+    course_options = labs.courses() if labs is not None else []
+    if not course_options:
         st.warning("⚠️ No lab records found in the Labs sheet.")
         return
 
-    course_options = sorted(labs_df["Course"].dropna().unique())
     selected_course = st.selectbox("Select Course", course_options, key="grade_course")
 
-    lab_options = sorted(
-        labs_df[labs_df["Course"].str.lower() == selected_course.lower()]["Lab Name"].dropna().unique()
-    )
+    lab_options = labs.labs_for(selected_course)
 
     if not lab_options:
         st.warning("No labs found for selected course.")
         return
 
     selected_lab = st.selectbox("Select Lab to Grade", lab_options, key="grade_lab")
+    timer.mark("labs")
 
     if submissions_df.empty:
         st.info("No submissions found yet.")
@@ -170,86 +186,70 @@ def grading_page():
         st.info("No submissions found for this course and lab.")
         return
 
-    # Access the worksheet for updating grades
-    try:
-        submissions_ws = st.session_state.get("submissions_ws")
-        if not submissions_ws:
-            submissions_ws = client.open_by_key(sheet_id).worksheet("Submissions")
-    except Exception as e:
-        st.error(f"❌ Could not access Submissions worksheet: {e}")
+    if storage is None:
+        st.error("❌ Could not access Submissions worksheet: storage backend not initialised.")
         return
 
-    for idx, row in filtered.iterrows():
+    def group_members(group_name):
+        # The groups sheet stores comma-separated members/member_names, not name/email columns
+        return roster.groups_index.members_of(group_name) if roster is not None else []
+
+    # ========== Paging + background prefetch ==========
+    page_count = (len(filtered) + PAGE_SIZE - 1) // PAGE_SIZE
+    page = 1
+    if page_count > 1:
+        page = int(st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, key="grade_page"))
+    start = (page - 1) * PAGE_SIZE
+    current = filtered.iloc[start:start + PAGE_SIZE]
+    upcoming = filtered.iloc[start:start + 2 * PAGE_SIZE]
+
+    # A new course/lab/page cancels this session's queued prefetches
+    session_id = st.session_state.setdefault("prefetch_session_id", uuid.uuid4().hex)
+    prefetch_previews(
+        session_id, (selected_course, selected_lab, page),
+        list(zip(upcoming["file_name"], upcoming["file_link"])), creds,
+    )
+    timer.mark("filter + prefetch")
+
+    for idx, row in current.iterrows():
         st.markdown("---")
         st.markdown(f"### 👥 Group: **{row['group_name']}**")
         st.markdown(f"👤 Submitted by: {row['submitted_by']}")
         st.markdown(f"📎 File: [{row['file_name']}]({row['file_link']})")
 
-        file_ext = row['file_name'].split('.')[-1].lower()
-        file_link = row['file_link']
-
         with st.expander("🔍 Preview File"):
             try:
-                if file_ext == "pdf":
-                    st.components.v1.iframe(file_link.replace("/view?usp=sharing", "/preview"), height=600)
-                elif file_ext in ["doc", "docx", "ppt", "pptx", "xls", "xlsx"]:
-                    file_id = file_link.split("/d/")[1].split("/")[0]
-                    st.components.v1.iframe(f"https://drive.google.com/file/d/{file_id}/preview", height=600)
-                elif file_ext == "ipynb":
-                    file_id = file_link.split("/d/")[1].split("/")[0]
-                    drive_service = build("drive", "v3", credentials=creds)
-                    request = drive_service.files().get_media(fileId=file_id, supportsAllDrives=True)
-                    file_buffer = BytesIO()
-                    downloader = MediaIoBaseDownload(file_buffer, request)
-                    done = False
-                    while not done:
-                        _, done = downloader.next_chunk()
-                    notebook = json.load(BytesIO(file_buffer.getvalue()))
-                    for cell in notebook.get("cells", []):
-                        if cell["cell_type"] == "markdown":
-                            st.markdown("".join(cell["source"]), unsafe_allow_html=True)
-                        elif cell["cell_type"] == "code":
-                            st.code("".join(cell["source"]), language="python")
-                elif file_ext == "py":
-                    file_id = file_link.split("/d/")[1].split("/")[0]
-                    download_url = f"https://www.googleapis.com/drive/v3/files/{file_id}?alt=media"
-                    headers = {"Authorization": f"Bearer {creds.token}"}
-                    response = requests.get(download_url, headers=headers)
-                    if response.ok:
-                        st.code(response.text, language="python")
-                    else:
-                        st.warning("Could not preview .py file")
-                elif file_ext in ["png", "jpg", "jpeg", "gif"]:
-                    st.image(file_link, use_column_width=True)
-                else:
-                    st.info("⚠️ File preview not supported.")
+                render_preview(row['file_name'], row['file_link'], creds, show_outputs=False)
             except Exception as e:
                 st.error(f"Preview error: {e}")
 
         score = st.text_input(f"Enter grade for {row['group_name']}", key=f"score_{idx}")
         if st.button(f"✅ Submit Grade for {row['group_name']}", key=f"submit_{idx}"):
             try:
-                row_idx = submissions_df.index.get_loc(idx) + 2  # +2 for header and 1-based index
-                submissions_ws.update_cell(row_idx, submissions_df.columns.get_loc("graded") + 1, "Yes")
-                submissions_ws.update_cell(row_idx, submissions_df.columns.get_loc("grade") + 1, score)
+                # Located by key and checked against the sheet first, so a row
+                # that moved since this page was drawn is never graded by mistake
+                if not submissions.set_grade(row['group_name'], row['course'], row['lab'], score):
+                    st.warning(f"The submission for {row['group_name']} no longer exists.")
+                    st.stop()
 
                 grade_sheet_name = f"{selected_course}_{selected_lab}".replace(" ", "_")
-                try:
-                    grade_ws = client.open_by_key(sheet_id).worksheet(grade_sheet_name)
-                except:
-                    grade_ws = client.open_by_key(sheet_id).add_worksheet(grade_sheet_name, rows="1000", cols="10")
-                    grade_ws.append_row(["timestamp", "course", "lab", "group_name", "name", "email", "score"])
-
-                group_students = groups_df[groups_df["group_name"] == row["group_name"]]
-                for _, student in group_students.iterrows():
-                    grade_ws.append_row([
-                        datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                        selected_course, selected_lab,
-                        row['group_name'], student['name'], student['email'], score
-                    ])
+                storage.ensure_table(
+                    sheet_id, grade_sheet_name, rows="1000", cols="10",
+                    header=["timestamp", "course", "lab", "group_name", "name", "email", "score"],
+                )
+
+                # One row per member from the precomputed group roster, in one append_rows
+                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                storage.append_rows(sheet_id, grade_sheet_name, [
+                    [timestamp, selected_course, selected_lab, row['group_name'], name, email, score]
+                    for name, email in group_members(row["group_name"])
+                ])
+                timer.mark("grade")
 
                 st.success(f"✅ Grade saved for {row['group_name']}")
                 st.rerun()
 
             except Exception as e:
                 st.error(f"❌ Failed to grade: {e}")
+
+    timer.mark("render")
@@ -0,0 +1,98 @@
+"""
+Automatic groups for the students of a course nobody placed.
+
+``ungrouped_students`` is the roster minus everyone already in a group for
+the course.  ``form_groups`` picks how many groups are needed so every
+size stays within the 3–15 rule and as close to the target as possible,
+then deals the students out round-robin: after a seeded shuffle, and
+sorted by faculty / program first when balancing, so each group gets a
+proportional share of every faculty.  Everything is a sort plus a few
+vectorised passes, so 50k students take well under a second.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from bulk_import import MAX_MEMBERS, MIN_MEMBERS
+from membership import explode_members
+
+BALANCE_OPTIONS = {
+    "No balancing": (),
+    "Faculty": ("faculty",),
+    "Faculty and program": ("faculty", "program"),
+}
+
+
+def ungrouped_students(roster, course):
+    """Roster rows (first per email) of students not yet in a group for ``course``."""
+    students = roster.students_df
+    if students.empty:
+        return students
+    groups = roster.groups_df
+    grouped = pd.Series(dtype=str)
+    if {"course", "members"} <= set(groups.columns) and not groups.empty:
+        in_course = groups[groups["course"].astype(str).str.strip().str.lower() == str(course).strip().lower()]
+        grouped = explode_members(in_course[["members"]])["email"]
+    return students[~students["email"].isin(grouped)].drop_duplicates("email")
+
+
+def group_count(n, target_size, min_size=MIN_MEMBERS, max_size=MAX_MEMBERS):
+    """
+    How many groups ``n`` students make: the count closest to ``n / target_size``
+    for which even sizes (differing by at most one) stay in ``[min_size, max_size]``.
+    """
+    if n < min_size:
+        return 0
+    k = max(round(n / target_size), math.ceil(n / max_size), 1)
+    return min(k, n // min_size)
+
+
+def _free_names(prefix, count, taken):
+    names, number = [], 1
+    width = max(3, len(str(count)))
+    while len(names) < count:
+        name = f"{prefix}{number:0{width}d}"
+        if not taken(name):
+            names.append(name)
+        number += 1
+    return names
+
+
+def form_groups(students, course, target_size=5, balance_by=(), seed=0, name_prefix=None, taken=lambda name: False):
+    """
+    Partitions ``students`` into groups.  Returns ``(groups, leftover)``:
+    ``groups`` has the ``groups`` sheet columns (minus timestamp /
+    created_by) – faculty and department are the first member's – and
+    ``leftover`` the students that could not be placed (fewer than the
+    minimum group size).  ``taken(name)`` says whether a group name is in use.
+    """
+    count = group_count(len(students), target_size)
+    if count == 0:
+        return pd.DataFrame(), students
+
+    order = students.sample(frac=1, random_state=seed)
+    balance_by = [c for c in balance_by if c in order.columns]
+    if balance_by:
+        order = order.sort_values(balance_by, kind="stable")
+    order = order.assign(_group=np.arange(len(order)) % count)
+
+    names = _free_names(name_prefix or f"{course} Auto ", count, taken)
+    if "fullname" not in order.columns:
+        order = order.assign(fullname="")
+    for col in ("faculty", "program"):
+        if col not in order.columns:
+            order = order.assign(**{col: ""})
+
+    order = order.astype({"faculty": str, "program": str, "fullname": str})
+    by_group = order.groupby("_group", sort=True)
+    groups = pd.DataFrame({
+        "group_name": names,
+        "faculty": by_group["faculty"].first().to_numpy(),
+        "department": by_group["program"].first().to_numpy(),
+        "course": course,
+        "members": by_group["email"].agg(", ".join).to_numpy(),
+        "member_names": by_group["fullname"].agg(", ".join).to_numpy(),
+    })
+    return groups, students.iloc[0:0]
@@ -0,0 +1,89 @@
+"""
+The ``Labs`` sheet as a course → sorted lab names index.
+
+One ``LabCatalog`` per spreadsheet is shared by the student and grading
+pages.  It is read on first use – not in the login bootstrap batch, so
+a missing ``Labs`` tab or a renamed column only gives an empty catalog
+(and a warning in the log) – re-read at most once per ``ttl`` seconds,
+and ``invalidate`` forces a re-read on next use (after labs are added to
+the sheet).
+"""
+
+import logging
+import threading
+import time
+
+import gspread
+import streamlit as st
+
+log = logging.getLogger(__name__)
+
+
+def _key(value):
+    return str(value or "").strip().lower()
+
+
+class LabCatalog:
+    def __init__(self, storage, key, worksheet="Labs", ttl=600):
+        self.storage = storage
+        self.key = key
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._courses = []      # course names as written in the sheet, sorted
+        self._labs = {}         # lower-cased course -> sorted lab names
+        self._loaded_at = None
+
+    def seed(self, values):
+        """Builds the index from raw ``get_all_values()`` output (header first)."""
+        courses, labs = {}, {}
+        if values:
+            header = [c.strip() for c in values[0]]
+            if "Course" in header and "Lab Name" in header:
+                course_col, lab_col = header.index("Course"), header.index("Lab Name")
+            else:
+                log.warning("%s sheet has no 'Course' / 'Lab Name' columns (header: %s); no labs listed.",
+                            self.worksheet, header)
+                values = []
+            for row in values[1:]:
+                if max(course_col, lab_col) >= len(row):
+                    continue
+                course, lab = row[course_col].strip(), row[lab_col].strip()
+                if course and lab:
+                    courses.setdefault(_key(course), course)
+                    labs.setdefault(_key(course), set()).add(lab)
+        with self._lock:
+            self._courses = sorted(courses.values())
+            self._labs = {course: sorted(names) for course, names in labs.items()}
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _fresh(self):
+        with self._lock:
+            loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.ttl:
+            try:
+                values = self.storage.read_values(self.key, self.worksheet)
+            except gspread.exceptions.WorksheetNotFound:
+                log.warning("No %s sheet in spreadsheet %s; no labs listed.", self.worksheet, self.key)
+                values = []
+            self.seed(values)
+
+    def courses(self):
+        """Every course that has at least one lab."""
+        self._fresh()
+        return list(self._courses)
+
+    def labs_for(self, course):
+        """Sorted lab names for ``course`` (case-insensitive)."""
+        self._fresh()
+        return list(self._labs.get(_key(course), []))
+
+
+@st.cache_resource
+def get_lab_catalog(_storage, sheet_id):
+    ss = st.secrets["google_service_account"]
+    return LabCatalog(_storage, sheet_id, ttl=int(ss.get("labs_ttl", 600)))
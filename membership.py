@@ -0,0 +1,86 @@
+"""
+Course → email → group lookup built from the ``groups`` worksheet.
+
+Built once per groups refresh and updated with ``add`` whenever a group is
+appended, so "am I grouped / which group am I in" is a dict lookup instead
+of an ``iterrows`` / ``str.contains`` scan over every group.
+"""
+
+import re
+
+# Members are separated by commas, semicolons and/or whitespace – the one
+# rule for the groups sheet, bulk-import files and auto-formed groups
+MEMBER_SEPARATORS = r"[,;\s]+"
+_separators = re.compile(MEMBER_SEPARATORS)
+
+
+def _key(value):
+    return str(value or "").strip().lower()
+
+
+def split_members(members):
+    """``"a@x.com, B@x.com; c@x.com"`` → ``["a@x.com", "b@x.com", "c@x.com"]``"""
+    return [e for e in _separators.split(str(members or "").lower()) if e]
+
+
+def explode_members(frame, column="members"):
+    """
+    Vectorised ``split_members`` over a DataFrame: one row per (row, email),
+    emails lower-cased, blanks dropped, order kept.
+    """
+    emails = frame[column].astype(str).str.lower().str.split(MEMBER_SEPARATORS, regex=True)
+    exploded = frame.drop(columns=[column]).assign(email=emails).explode("email")
+    return exploded[exploded["email"].notna() & (exploded["email"] != "")]
+
+
+class MembershipIndex:
+    def __init__(self):
+        self._members = {}      # course -> {email: group row}
+        self._creators = {}     # course -> {created_by: group row}
+        self._names = set()     # lower-cased group names (unique across courses)
+        self._rosters = {}      # group name -> [(member name, email)]
+
+    @classmethod
+    def from_df(cls, groups_df):
+        index = cls()
+        if groups_df is None or groups_df.empty:
+            return index
+        for row in groups_df.to_dict("records"):
+            index.add(row)
+        return index
+
+    def add(self, row):
+        """Registers one group row (a dict with the ``groups`` sheet columns)."""
+        course = _key(row.get("course"))
+        members = self._members.setdefault(course, {})
+        for email in split_members(row.get("members")):
+            # First group wins, matching the old ``iloc[0]`` lookup
+            members.setdefault(email, row)
+        creator = _key(row.get("created_by"))
+        if creator:
+            self._creators.setdefault(course, {}).setdefault(creator, row)
+        name = _key(row.get("group_name"))
+        if name:
+            self._names.add(name)
+            emails = split_members(row.get("members"))
+            names = [n.strip() for n in str(row.get("member_names") or "").split(",")]
+            names += [""] * (len(emails) - len(names))
+            self._rosters.setdefault(name, list(zip(names, emails)))
+
+    def group_for(self, course, email):
+        """The group row ``email`` belongs to in ``course``, or ``None``."""
+        return self._members.get(_key(course), {}).get(_key(email))
+
+    def is_grouped(self, course, email):
+        return _key(email) in self._members.get(_key(course), {})
+
+    def created_by(self, course, email):
+        """The group ``email`` created in ``course``, or ``None``."""
+        return self._creators.get(_key(course), {}).get(_key(email))
+
+    def has_group_name(self, name):
+        return _key(name) in self._names
+
+    def members_of(self, group_name):
+        """``[(member name, email), ...]`` for a group, in sheet order."""
+        return self._rosters.get(_key(group_name), [])
@@ -0,0 +1,185 @@
+"""
+Notebook preview engine.
+
+The notebook JSON is read one cell at a time with
+``JSONDecoder.raw_decode`` instead of ``json.load``-ing the whole
+document, and only as far as the page being shown: ``cells_start`` finds
+the ``cells`` array, ``read_page`` summarises the next ``CELLS_PER_PAGE``
+cells from a given offset (outputs truncated, base64 images moved out to
+a separate store) and returns where the following page starts.  Time to
+the first page therefore does not depend on how long the notebook is.
+``render_notebook`` draws one page of cells, loading an image only when
+the reader asks for it.
+"""
+
+import base64
+import json
+
+import streamlit as st
+
+CELLS_PER_PAGE = 20
+MAX_SOURCE_CHARS = 20_000
+MAX_OUTPUT_CHARS = 5_000
+MAX_OUTPUTS_PER_CELL = 20
+IMAGE_MIMES = ("image/png", "image/jpeg", "image/gif")
+
+_decoder = json.JSONDecoder()
+
+
+def _skip_ws(text, i):
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return i
+
+
+def _expect(text, i, char):
+    i = _skip_ws(text, i)
+    if i >= len(text) or text[i] != char:
+        raise ValueError(f"Malformed notebook: expected {char!r} at offset {i}")
+    return i + 1
+
+
+def cells_start(text):
+    """Offset just inside the ``cells`` array, or ``None`` if the notebook has no cells."""
+    i = _expect(text, 0, "{")
+    while True:
+        i = _skip_ws(text, i)
+        if i >= len(text) or text[i] == "}":
+            return None
+        key, i = _decoder.raw_decode(text, i)
+        i = _expect(text, i, ":")
+        if key == "cells":
+            i = _expect(text, i, "[")
+            return i if _has_cell(text, i) else None
+        _, i = _decoder.raw_decode(text, _skip_ws(text, i))     # metadata etc. – decoded and dropped
+        i = _skip_ws(text, i)
+        if i < len(text) and text[i] == ",":
+            i += 1
+
+
+def _next_cell(text, i):
+    """Offset of the next cell at or after ``i`` (just inside ``[`` or just after a cell), or ``None``."""
+    i = _skip_ws(text, i)
+    if i < len(text) and text[i] == ",":
+        i = _skip_ws(text, i + 1)
+    return None if i >= len(text) or text[i] == "]" else i
+
+
+def _has_cell(text, i):
+    return _next_cell(text, i) is not None
+
+
+def iter_cells(text, offset=None):
+    """Yields ``(cell, end offset)`` from ``offset`` (default: the first cell) without decoding the rest."""
+    i = cells_start(text) if offset is None else offset
+    while i is not None:
+        i = _next_cell(text, i)
+        if i is None:
+            return
+        cell, i = _decoder.raw_decode(text, i)
+        yield cell, i
+
+
+def _joined(value):
+    return "".join(value) if isinstance(value, list) else str(value or "")
+
+
+def _clip(text, limit):
+    if len(text) <= limit:
+        return {"text": text, "truncated": 0}
+    return {"text": text[:limit], "truncated": len(text) - limit}
+
+
+def _summary(c, cell, store_image):
+    """Bounded, JSON-able summary of cell ``c``; ``store_image(ref, mime, b64)`` keeps its images."""
+    outputs = []
+    all_outputs = cell.get("outputs", [])
+    for o, output in enumerate(all_outputs[:MAX_OUTPUTS_PER_CELL]):
+        kind = output.get("output_type")
+        if kind == "stream":
+            outputs.append({"kind": "text", **_clip(_joined(output.get("text", "")), MAX_OUTPUT_CHARS)})
+        elif kind in ("execute_result", "display_data"):
+            data = output.get("data", {})
+            mime = next((m for m in IMAGE_MIMES if m in data), None)
+            if mime:
+                b64 = _joined(data[mime]).replace("\n", "")
+                ref = f"{c}.{o}"
+                store_image(ref, mime, b64)
+                outputs.append({"kind": "image", "ref": ref, "mime": mime, "bytes": len(b64) * 3 // 4})
+            elif "text/plain" in data:
+                outputs.append({"kind": "text", **_clip(_joined(data["text/plain"]), MAX_OUTPUT_CHARS)})
+        elif kind == "error":
+            outputs.append({"kind": "text", **_clip(f"{output.get('ename')}: {output.get('evalue')}", MAX_OUTPUT_CHARS)})
+    return {
+        "cell_type": cell.get("cell_type"),
+        "source": _clip(_joined(cell.get("source", "")), MAX_SOURCE_CHARS),
+        "outputs": outputs,
+        "hidden_outputs": max(0, len(all_outputs) - MAX_OUTPUTS_PER_CELL),
+    }
+
+
+def read_page(text, offset, page, store_image):
+    """
+    Summaries of the ``CELLS_PER_PAGE`` cells of 1-based ``page``, which
+    starts at ``offset``.  Returns ``(cells, next_offset)``; ``next_offset``
+    is ``None`` on the last page.  Image refs are ``"<cell>.<output>"``
+    with the cell's index in the whole notebook.
+    """
+    first = (page - 1) * CELLS_PER_PAGE
+    cells, end = [], offset
+    for cell, end in iter_cells(text, offset):
+        cells.append(_summary(first + len(cells), cell, store_image))
+        if len(cells) == CELLS_PER_PAGE:
+            break
+    return cells, (end if len(cells) == CELLS_PER_PAGE and _has_cell(text, end) else None)
+
+
+def render_notebook(preview, key, load_page, load_image, show_outputs=True):
+    """
+    Draws one page of cells.  ``preview["pages"]`` is the number of pages
+    found so far and ``preview["done"]`` whether that is all of them;
+    ``load_page(page)`` returns a page's cells (parsing it on first use).
+    ``key`` must be unique per preview on the page (the Drive file id
+    works); ``load_image(ref)`` returns ``(mime, b64)``.
+    """
+    pages = preview["pages"]
+    if not pages:
+        st.caption("This notebook has no cells.")
+        return
+    page = 1
+    if pages > 1 or not preview["done"]:
+        found = f"{pages}" if preview["done"] else f"{pages}+"
+        page = int(st.number_input(
+            f"Cells page (of {found})", min_value=1, max_value=pages, value=1, key=f"nb_page_{key}",
+        ))
+    cells = load_page(page)
+    start = (page - 1) * CELLS_PER_PAGE
+
+    for c, cell in enumerate(cells, start=start):
+        source = cell["source"]
+        if cell["cell_type"] == "markdown":
+            st.markdown(source["text"], unsafe_allow_html=True)
+        elif cell["cell_type"] == "code":
+            st.code(source["text"], language="python")
+        else:
+            continue
+        if source["truncated"]:
+            st.caption(f"… {source['truncated']:,} more characters not shown")
+
+        if not show_outputs or cell["cell_type"] != "code":
+            continue
+        for output in cell["outputs"]:
+            if output["kind"] == "text":
+                st.text(output["text"])
+                if output["truncated"]:
+                    st.caption(f"… output truncated ({output['truncated']:,} more characters)")
+            elif output["kind"] == "image":
+                toggle = f"nb_img_{key}_{output['ref']}"
+                if st.session_state.get(toggle):
+                    mime, b64 = load_image(output["ref"])
+                    st.image(base64.b64decode(b64))
+                elif st.button(f"🖼️ Show image ({output['bytes'] / 1024:.0f} KB)", key=f"{toggle}_btn"):
+                    st.session_state[toggle] = True
+                    st.rerun()
+        if cell["hidden_outputs"]:
+            st.caption(f"… {cell['hidden_outputs']} more outputs not shown")
@@ -0,0 +1,160 @@
+"""
+Background e-mail notifications.
+
+``NotificationQueue`` owns one daemon worker thread.  ``submit`` drops a
+message on a bounded queue and returns a job id immediately; the worker
+drains up to ``batch_size`` messages at a time over a single authenticated
+SMTP connection, retrying failed sends with exponential backoff, and keeps
+the outcome of every job for ``status``.
+
+Point ``host`` / ``port`` at a local debug server (e.g.
+``python -m aiosmtpd -n -l localhost:8025``) with ``starttls=False`` and no
+credentials to try it without touching Gmail.
+"""
+
+import logging
+import queue
+import smtplib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import tracing
+
+log = logging.getLogger(__name__)
+
+QUEUED, SENT, FAILED = "queued", "sent", "failed"
+
+
+class NotificationQueue:
+    def __init__(self, host="smtp.gmail.com", port=587, username=None, password=None,
+                 starttls=True, max_queue=1000, batch_size=50, max_retries=3,
+                 backoff=2.0, timeout=30, keep_statuses=5000):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.starttls = starttls
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.keep_statuses = keep_statuses
+
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._statuses = OrderedDict()      # job id -> (status, detail)
+        self._lock = threading.Lock()
+        self._worker = threading.Thread(target=self._run, name="smtp-notifications", daemon=True)
+        self._worker.start()
+
+    # ---------- producer side ----------
+    def submit(self, msg):
+        """
+        Queues an ``email.message.Message`` and returns its job id.
+        Raises ``queue.Full`` when the worker is too far behind.
+        """
+        job_id = uuid.uuid4().hex
+        self._set_status(job_id, QUEUED, msg["To"])
+        try:
+            # The send is traced against the run that queued it
+            self._queue.put_nowait((job_id, msg, tracing.current_run()))
+        except queue.Full:
+            self._set_status(job_id, FAILED, "notification queue is full")
+            raise
+        return job_id
+
+    def status(self, job_id):
+        """``(status, detail)`` for a job, or ``None`` if it has been forgotten."""
+        with self._lock:
+            return self._statuses.get(job_id)
+
+    def pending(self):
+        return self._queue.qsize()
+
+    def _set_status(self, job_id, status, detail=""):
+        with self._lock:
+            self._statuses[job_id] = (status, detail)
+            self._statuses.move_to_end(job_id)
+            while len(self._statuses) > self.keep_statuses:
+                self._statuses.popitem(last=False)
+
+    # ---------- worker side ----------
+    def _connect(self):
+        return tracing.call("smtp", "connect", self._open)
+
+    def _open(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.starttls:
+            server.starttls()
+        if self.username:
+            server.login(self.username, self.password)
+        return server
+
+    @staticmethod
+    def _close(server):
+        if server is None:
+            return
+        try:
+            server.quit()
+        except smtplib.SMTPException:
+            server.close()
+        except OSError:
+            pass
+
+    def _next_batch(self):
+        batch = [self._queue.get()]     # block for the first one
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            server = None
+            try:
+                for job_id, msg, run in batch:
+                    try:
+                        with tracing.attach(run):
+                            server = self._send(server, job_id, msg)
+                    except Exception as e:
+                        # Never let one bad message kill the worker thread
+                        log.exception("Notification %s crashed", job_id)
+                        self._set_status(job_id, FAILED, str(e))
+                        self._close(server)
+                        server = None
+            finally:
+                self._close(server)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _send(self, server, job_id, msg):
+        """Sends one message, reconnecting/retrying as needed; returns the live connection."""
+        for attempt in range(self.max_retries + 1):
+            try:
+                if server is None:
+                    server = self._connect()
+                tracing.call("smtp", "send_message", server.send_message, msg, sent=msg)
+                self._set_status(job_id, SENT, msg["To"])
+                return server
+            except smtplib.SMTPRecipientsRefused as e:
+                # The server is fine, the address is not – retrying won't help
+                self._set_status(job_id, FAILED, str(e))
+                return server
+            except (smtplib.SMTPException, OSError) as e:
+                log.warning("Notification to %s failed (attempt %d): %s", msg["To"], attempt + 1, e)
+                # Drop the connection – it may be the thing that is broken
+                self._close(server)
+                server = None
+                if attempt < self.max_retries:
+                    time.sleep(self.backoff * (2 ** attempt))
+                else:
+                    self._set_status(job_id, FAILED, str(e))
+        return server
+
+    def join(self):
+        """Blocks until everything queued so far has been attempted."""
+        self._queue.join()
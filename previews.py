@@ -0,0 +1,398 @@
+"""
+Submission previews shared by the student and grading pages.
+
+Downloaded Drive files are parsed once into a small JSON-able preview
+(notebook pages / source text) and kept in ``PreviewCache``: an in-memory
+LRU in front of an on-disk tier, both size-capped, keyed by Drive file id
++ revision (md5 checksum, falling back to modifiedTime).  Re-rendering an
+expander on a rerun is then a cache hit instead of a re-download.
+
+A notebook is parsed a page at a time.  The cold load parses only the
+first page; its cache entry records where each page found so far starts
+in the notebook text, which is kept on disk so later pages (and evicted
+images) are parsed from there on demand.
+
+``Prefetcher`` warms that cache ahead of the grader on a small shared
+thread pool; a render that reaches a file still being fetched waits for
+that fetch instead of starting another one.
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import streamlit as st
+
+from drive import download_bytes, fetch_revision, get_drive_service
+from notebook_preview import CELLS_PER_PAGE, cells_start, read_page, render_notebook
+
+
+def drive_file_id(file_link):
+    """``https://drive.google.com/file/d/<id>/view?...`` → ``<id>``"""
+    return file_link.split("/d/")[1].split("/")[0]
+
+
+class PreviewCache:
+    # Bumped when the shape of cached previews changes, so old entries are never read back
+    FORMAT = 2
+
+    def __init__(self, directory, memory_bytes=64 * 1024 ** 2, disk_bytes=512 * 1024 ** 2,
+                 revision_ttl=300):
+        self.directory = directory
+        self.memory_bytes = memory_bytes
+        self.disk_bytes = disk_bytes
+        self.revision_ttl = revision_ttl
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()        # cache key -> (size, preview)
+        self._memory_used = 0
+        self._revisions = {}                # file id -> (expires, revision)
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def cache_key(file_id, revision):
+        return hashlib.sha256(f"{file_id}@{revision}@v{PreviewCache.FORMAT}".encode("utf-8")).hexdigest()
+
+    # ---------- revision lookup ----------
+    def revision(self, file_id, fetch):
+        """Drive revision for ``file_id``, re-asked at most every ``revision_ttl`` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            hit = self._revisions.get(file_id)
+            if hit and hit[0] > now:
+                return hit[1]
+        revision = fetch(file_id)
+        with self._lock:
+            self._revisions[file_id] = (now + self.revision_ttl, revision)
+        return revision
+
+    # ---------- tiers ----------
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, key, size, preview):
+        with self._lock:
+            if key in self._memory:
+                self._memory_used -= self._memory.pop(key)[0]
+            self._memory[key] = (size, preview)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes and len(self._memory) > 1:
+                self._memory_used -= self._memory.popitem(last=False)[1][0]
+
+    def get(self, key, memory=True):
+        """``memory=False`` reads a disk-only entry without promoting it to the memory tier."""
+        with self._lock:
+            hit = self._memory.get(key)
+            if hit is not None:
+                self._memory.move_to_end(key)
+                return hit[1]
+        try:
+            with open(self._path(key), "rb") as f:
+                raw = f.read()
+        except OSError:
+            return None
+        try:
+            preview = json.loads(raw)
+        except ValueError:
+            return None
+        os.utime(self._path(key))     # LRU order for the disk tier
+        if memory:
+            self._remember(key, len(raw), preview)
+        return preview
+
+    def put(self, key, preview, memory=True, trim=True):
+        """
+        ``memory=False`` writes only the disk tier (bulky, rarely read
+        entries).  ``trim=False`` skips the disk-size check, for batches
+        that call ``trim_disk`` once at the end.
+        """
+        raw = json.dumps(preview).encode("utf-8")
+        if memory:
+            self._remember(key, len(raw), preview)
+        tmp = self._path(key) + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(raw)
+            os.replace(tmp, self._path(key))
+            if trim:
+                self.trim_disk()
+        except OSError:
+            pass    # the memory tier still has it
+
+    def trim_disk(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                path = os.path.join(self.directory, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((info.st_mtime, info.st_size, path))
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if used <= self.disk_bytes:
+                break
+            try:
+                os.remove(path)
+                used -= size
+            except OSError:
+                pass
+
+    def get_or_load(self, file_id, revision, load):
+        key = self.cache_key(file_id, revision)
+        preview = self.get(key)
+        if preview is None:
+            preview = load()
+            self.put(key, preview)
+        return preview
+
+
+@st.cache_resource
+def get_preview_cache():
+    ss = st.secrets["google_service_account"]
+    return PreviewCache(
+        ss.get("preview_cache_dir", ".preview_cache"),
+        memory_bytes=int(ss.get("preview_cache_memory_mb", 64)) * 1024 ** 2,
+        disk_bytes=int(ss.get("preview_cache_disk_mb", 512)) * 1024 ** 2,
+    )
+
+
+# ========== Drive fetches ==========
+def download_text(service, file_id):
+    return download_bytes(service, file_id).decode("utf-8", errors="replace")
+
+
+PREVIEWABLE = ("ipynb", "py")
+
+
+class Prefetcher:
+    """
+    Background preview downloads.  Each session has at most one batch; a
+    new batch for a different selection (course/lab/page) cancels the
+    queued, not yet started jobs of the old one unless another session's
+    batch still needs them.
+    """
+
+    def __init__(self, max_workers=4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="preview-prefetch")
+        # Re-entrant: cancel() and add_done_callback() may run _forget on this thread
+        self._lock = threading.RLock()
+        self._inflight = {}     # file id -> Future
+        self._batches = {}      # session id -> (selection, [Future])
+
+    def prefetch(self, session_id, selection, jobs):
+        """``jobs`` is ``[(file_id, load), ...]``; ``load()`` fills the preview cache."""
+        with self._lock:
+            previous = self._batches.get(session_id)
+            if previous and previous[0] != selection:
+                still_needed = {f for sid, (_, fs) in self._batches.items() if sid != session_id for f in fs}
+                for future in previous[1]:
+                    if future not in still_needed:
+                        future.cancel()
+
+            futures = []
+            for file_id, load in jobs:
+                future = self._inflight.get(file_id)
+                if future is None or future.cancelled():
+                    # Runs in a copy of the requesting run's context, so the download is traced against it
+                    future = self._pool.submit(contextvars.copy_context().run, load)
+                    self._inflight[file_id] = future
+                    future.add_done_callback(lambda f, fid=file_id: self._forget(fid, f))
+                futures.append(future)
+            self._batches[session_id] = (selection, futures)
+
+    def _forget(self, file_id, future):
+        with self._lock:
+            if self._inflight.get(file_id) is future:
+                del self._inflight[file_id]
+
+    def pending(self, file_id):
+        """The running/queued fetch for ``file_id``, if any."""
+        with self._lock:
+            future = self._inflight.get(file_id)
+        return future if future is not None and not future.cancelled() else None
+
+
+@st.cache_resource
+def get_prefetcher():
+    ss = st.secrets["google_service_account"]
+    return Prefetcher(max_workers=int(ss.get("preview_prefetch_workers", 4)))
+
+
+def prefetch_previews(session_id, selection, rows, creds):
+    """Queues ``(file_name, file_link)`` rows whose previews need a download."""
+    cache = get_preview_cache()
+    service = get_drive_service(creds)
+    jobs = []
+    for file_name, file_link in rows:
+        file_ext = file_name.lower().split('.')[-1]
+        if file_ext not in PREVIEWABLE:
+            continue
+        try:
+            file_id = drive_file_id(file_link)
+        except IndexError:
+            continue
+        jobs.append((file_id, lambda fid=file_id, ext=file_ext: _load_preview(service, fid, ext, cache)))
+    get_prefetcher().prefetch(session_id, selection, jobs)
+
+
+def load_preview(creds, file_id, file_ext):
+    """Cached, parsed preview for a Drive file (``ipynb`` / ``py``)."""
+    pending = get_prefetcher().pending(file_id)
+    if pending is not None:
+        try:
+            return pending.result(timeout=120)
+        except Exception:
+            pass    # fall through and fetch it here, surfacing the real error
+    return _load_preview(get_drive_service(creds), file_id, file_ext, get_preview_cache())
+
+
+def _image_key(cache, file_id, revision, ref):
+    return cache.cache_key(file_id, f"{revision}#{ref}")
+
+
+def _page_key(cache, file_id, revision, page):
+    return cache.cache_key(file_id, f"{revision}#page{page}")
+
+
+def _text_key(cache, file_id, revision):
+    return cache.cache_key(file_id, f"{revision}#text")
+
+
+def _open_notebook(service, file_id, revision, cache):
+    """
+    Cold load: downloads the notebook, keeps its text on disk and parses
+    only the first page.  Returns the preview – ``starts`` holds the text
+    offset of every page found so far, ``done`` whether that is all.
+    """
+    text = download_bytes(service, file_id).decode("utf-8", errors="replace")
+    cache.put(_text_key(cache, file_id, revision), text, memory=False, trim=False)
+    start = cells_start(text)
+    preview = {"kind": "notebook", "revision": revision, "starts": [], "pages": 0, "done": start is None}
+    if start is not None:
+        preview["starts"], preview["pages"] = [start], 1
+        preview = _parse_page(text, file_id, cache, preview, 1)[0]
+    return preview
+
+
+def _notebook_text(service, file_id, revision, cache):
+    """The notebook text from the disk tier, downloaded again if it was evicted."""
+    text = cache.get(_text_key(cache, file_id, revision), memory=False)
+    if text is None:
+        if cache.revision(file_id, lambda fid: fetch_revision(service, fid)) != revision:
+            raise RuntimeError("The notebook has changed since this page was drawn – reload the page.")
+        text = download_bytes(service, file_id).decode("utf-8", errors="replace")
+        cache.put(_text_key(cache, file_id, revision), text, memory=False)
+    return text
+
+
+def _parse_page(text, file_id, cache, preview, page):
+    """
+    Parses one page, caches it and its images (the disk tier is trimmed
+    once for the whole page) and returns ``(preview, cells, images)`` –
+    ``preview`` updated if the page was the last one found so far.
+    """
+    revision = preview["revision"]
+    images = {}
+
+    def store_image(ref, mime, b64):
+        images[ref] = {"mime": mime, "data": b64}
+        cache.put(_image_key(cache, file_id, revision, ref), images[ref], memory=False, trim=False)
+
+    cells, next_offset = read_page(text, preview["starts"][page - 1], page, store_image)
+    cache.put(_page_key(cache, file_id, revision, page), {"cells": cells}, trim=False)
+    cache.trim_disk()
+    if page == len(preview["starts"]) and not preview["done"]:
+        starts = preview["starts"] + ([] if next_offset is None else [next_offset])
+        preview = {**preview, "starts": starts, "pages": len(starts), "done": next_offset is None}
+    return preview, cells, images
+
+
+def _load_preview(service, file_id, file_ext, cache):
+    revision = cache.revision(file_id, lambda fid: fetch_revision(service, fid))
+    if file_ext == "ipynb":
+        # Later pages and images are only parsed on request (load_page / load_image)
+        return cache.get_or_load(file_id, revision, lambda: _open_notebook(service, file_id, revision, cache))
+    return cache.get_or_load(file_id, revision, lambda: {"kind": "code", "text": download_text(service, file_id)})
+
+
+def _reparse(creds, preview, file_id, page):
+    """Parses ``page`` again from the notebook text; returns its ``(cells, images)``."""
+    cache = get_preview_cache()
+    revision = preview["revision"]
+    # Another session may have found more pages since this preview was read
+    preview = cache.get(cache.cache_key(file_id, revision)) or preview
+    if page > len(preview["starts"]):
+        raise RuntimeError("No such page in the notebook.")
+    text = _notebook_text(get_drive_service(creds), file_id, revision, cache)
+    updated, cells, images = _parse_page(text, file_id, cache, preview, page)
+    if updated is not preview:
+        cache.put(cache.cache_key(file_id, revision), updated)
+    return cells, images
+
+
+def load_page(creds, preview, file_id, page):
+    """Cells of one page of a notebook preview, parsed on first use."""
+    cache = get_preview_cache()
+    entry = cache.get(_page_key(cache, file_id, preview["revision"], page))
+    if entry is not None:
+        return entry["cells"]
+    return _reparse(creds, preview, file_id, page)[0]
+
+
+def load_image(creds, preview, file_id, ref):
+    """
+    ``(mime, b64)`` of an image in a notebook preview.  If the disk tier
+    has evicted it, the page it is on is parsed again.
+    """
+    cache = get_preview_cache()
+    entry = cache.get(_image_key(cache, file_id, preview["revision"], ref), memory=False)
+    if entry is None:
+        page = int(ref.split(".")[0]) // CELLS_PER_PAGE + 1
+        entry = _reparse(creds, preview, file_id, page)[1].get(ref)
+        if entry is None:
+            raise RuntimeError("Image not found in the notebook.")
+    return entry["mime"], entry["data"]
+
+
+# ========== Rendering ==========
+def render_preview(file_name, file_link, creds, show_outputs=True):
+    file_ext = file_name.lower().split('.')[-1]
+
+    if file_ext == "pdf":
+        st.components.v1.iframe(file_link.replace("/view?usp=sharing", "/preview"), height=600)
+
+    elif file_ext in ["doc", "docx", "ppt", "pptx", "xls", "xlsx"]:
+        try:
+            st.components.v1.iframe(f"https://drive.google.com/file/d/{drive_file_id(file_link)}/preview", height=600)
+        except Exception as e:
+            st.warning(f"⚠️ Unable to preview the document: {e}")
+
+    elif file_ext == "ipynb":
+        try:
+            file_id = drive_file_id(file_link)
+            preview = load_preview(creds, file_id, "ipynb")
+            st.markdown("#### 📘 Notebook Preview")
+            render_notebook(preview, file_id,
+                            lambda page: load_page(creds, preview, file_id, page),
+                            lambda ref: load_image(creds, preview, file_id, ref),
+                            show_outputs=show_outputs)
+        except Exception as e:
+            st.error(f"⚠️ Notebook preview failed: {e}")
+
+    elif file_ext == "py":
+        try:
+            st.code(load_preview(creds, drive_file_id(file_link), "py")["text"], language="python")
+        except Exception as e:
+            st.error(f"⚠️ Error displaying .py file: {e}")
+
+    elif file_ext in ["png", "jpg", "jpeg", "gif"]:
+        st.image(file_link, caption=file_name, use_column_width=True)
+
+    else:
+        st.info("⚠️ Preview not supported for this file type.")
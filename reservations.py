@@ -0,0 +1,117 @@
+"""
+Atomic, idempotent group creation.
+
+All sessions of the process share one ``GroupReservations``.  ``commit``
+serialises writes per course, checks the case-folded group name and member
+sets against the shared membership index (plus names still being written
+by other courses), and remembers each submission's idempotency key so a
+double-click or retry returns the first result instead of appending twice.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+class DuplicateGroupName(Exception):
+    pass
+
+
+class MembersAlreadyGrouped(Exception):
+    def __init__(self, emails):
+        super().__init__(", ".join(emails))
+        self.emails = emails
+
+
+def idempotency_key(created_by, course, group_name, members):
+    """Same creator + course + name + member set → same key, whichever session sends it."""
+    parts = [
+        created_by.strip().lower(),
+        course.strip().lower(),
+        group_name.strip().lower(),
+        ",".join(sorted(e.strip().lower() for e in members)),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class GroupReservations:
+    def __init__(self, keep_keys=10000):
+        self.keep_keys = keep_keys
+        self._guard = threading.Lock()
+        self._course_locks = {}
+        self._names_in_flight = set()
+        self._committed = OrderedDict()     # idempotency key -> committed row
+
+    def _course_lock(self, course):
+        with self._guard:
+            return self._course_locks.setdefault(course.strip().lower(), threading.Lock())
+
+    def commit(self, key, course, group_name, members, roster, write):
+        """
+        Runs ``write()`` (which must append the group, register it in
+        ``roster`` and return its row) at most once per ``key``.
+        ``roster.groups_index`` is the source of truth for names and
+        members.  Returns ``(row, created)``; raises
+        ``DuplicateGroupName`` / ``MembersAlreadyGrouped`` on conflicts.
+        """
+        name = group_name.strip().lower()
+        with self._course_lock(course):
+            with self._guard:
+                if key in self._committed:
+                    return self._committed[key], False
+                # Names are unique across courses, so other courses' in-flight
+                # commits have to be visible here too
+                if name in self._names_in_flight or roster.groups_index.has_group_name(name):
+                    raise DuplicateGroupName(group_name)
+                self._names_in_flight.add(name)
+            try:
+                taken = [e for e in members if roster.groups_index.is_grouped(course, e)]
+                if taken:
+                    raise MembersAlreadyGrouped(taken)
+                row = write()
+            finally:
+                with self._guard:
+                    self._names_in_flight.discard(name)
+            with self._guard:
+                self._committed[key] = row
+                while len(self._committed) > self.keep_keys:
+                    self._committed.popitem(last=False)
+            return row, True
+
+    def commit_bulk(self, key, groups, roster, write):
+        """
+        ``commit`` for many groups at once (admin import).  ``groups`` is
+        ``[(course, group_name, members), ...]``; ``write()`` must append
+        them all in one call, register them in ``roster`` and return the
+        rows.  Every involved course lock is held, in sorted order, while
+        the whole set is re-checked and written.
+        """
+        names = [name.strip().lower() for _, name, _ in groups]
+        locks = [self._course_lock(c) for c in sorted({c.strip().lower() for c, _, _ in groups})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            with self._guard:
+                if key in self._committed:
+                    return self._committed[key], False
+                clashes = [n for n in names if n in self._names_in_flight or roster.groups_index.has_group_name(n)]
+                if clashes:
+                    raise DuplicateGroupName(", ".join(clashes))
+                self._names_in_flight.update(names)
+            try:
+                taken = [e for course, _, members in groups for e in members
+                         if roster.groups_index.is_grouped(course, e)]
+                if taken:
+                    raise MembersAlreadyGrouped(taken)
+                rows = write()
+            finally:
+                with self._guard:
+                    self._names_in_flight.difference_update(names)
+            with self._guard:
+                self._committed[key] = rows
+                while len(self._committed) > self.keep_keys:
+                    self._committed.popitem(last=False)
+            return rows, True
+        finally:
+            for lock in reversed(locks):
+                lock.release()
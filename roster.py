@@ -0,0 +1,244 @@
+"""
+Roster lookups built once per data refresh and shared by every session.
+"""
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from membership import MembershipIndex
+from sync import TAIL_WINDOW, row_key
+
+GROUP_COLUMNS = ["timestamp", "group_name", "faculty", "department", "course", "members", "member_names", "created_by"]
+
+# Session keys that only point at process-wide objects
+SHARED_SESSION_KEYS = {"roster", "storage"}
+
+
+def _norm(value):
+    return str(value or "").strip().lower()
+
+
+class CredentialIndex:
+    """
+    Normalised email → credentials for students (password = student_id) and
+    admins (``Login_details``), so ``authenticate`` is a dict lookup.
+    """
+
+    def __init__(self, students_df, login_df):
+        self._students = {}     # email -> {student_id: student record}
+        self._admins = {}       # email -> {password, ...}
+
+        if students_df is not None and not students_df.empty:
+            for record in students_df.to_dict("records"):
+                by_id = self._students.setdefault(_norm(record.get("email")), {})
+                # First row wins, as ``student_match.iloc[0]`` did
+                by_id.setdefault(str(record.get("student_id", "")).strip(), record)
+
+        if login_df is not None and not login_df.empty:
+            for email, password in zip(login_df["Email"], login_df["Password"]):
+                self._admins.setdefault(_norm(email), set()).add(str(password).strip())
+
+    def lookup(self, email, password):
+        """
+        ``("student", record)``, ``("admin", None)`` or ``None``.
+        Students are checked first, as before.
+        """
+        email = _norm(email)
+        password = str(password).strip()
+        record = self._students.get(email, {}).get(password)
+        if record is not None:
+            return "student", record
+        if password in self._admins.get(email, ()):
+            return "admin", None
+        return None
+
+    def __len__(self):
+        return len(self._students) + len(self._admins)
+
+
+def compact_students(df):
+    """
+    One normalised, compactly typed copy of ``Enrolled Students``:
+    interned emails (shared with the credential index keys), categorical
+    faculty/program and a precomputed ``fullname``.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame() if df is None else df
+    df = df.copy()
+    df["email"] = [sys.intern(e) for e in df["email"].astype(str).str.strip().str.lower()]
+    df["student_id"] = df["student_id"].astype(str).str.strip()
+    for col in ("faculty", "program"):
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().str.title().astype("category")
+    if "first_name" in df.columns and "last_name" in df.columns:
+        df["fullname"] = df["first_name"].str.strip().str.title() + " " + df["last_name"].str.strip().str.title()
+    return df
+
+
+def _compact_groups(df):
+    if df is None or df.empty:
+        return pd.DataFrame(columns=GROUP_COLUMNS) if df is None else df
+    df = df.copy()
+    for col in ("faculty", "department", "course"):
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    return df
+
+
+class Roster:
+    """
+    Process-wide, read-only view of the roster tables.  One instance is
+    shared by every session (``st.cache_resource``); sessions keep only
+    their own user state.  Groups are the one table that changes at
+    runtime, so ``add_group`` / ``replace_groups`` update it in place
+    under a lock for everyone.
+    """
+
+    def __init__(self, students_df, login_df, groups_df, course_list, groups_sync=None):
+        self.students_df = compact_students(students_df)
+        self.login_df = login_df
+        self.course_list = tuple(course_list)
+        self.credentials = CredentialIndex(self.students_df, login_df)
+        self._build_student_view()
+
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()     # one groups fetch at a time; readers never wait on it
+        self.groups_sync = groups_sync     # sync.IncrementalTable over the groups sheet
+        self._groups_synced_at = time.monotonic()
+        self._groups_df = _compact_groups(groups_df)
+        self._pending_groups = []       # rows appended since the frame was last built
+        self.groups_index = MembershipIndex.from_df(self._groups_df)
+        self._recent = self._tail_keys(groups_df)
+
+    def _build_student_view(self):
+        """Faculty → programs and email → fullname lookups for the student page."""
+        self.faculties = []
+        self.programs_by_faculty = {}
+        self.fullname_by_email = {}
+        self._email_order = {}
+        df = self.students_df
+        if df.empty:
+            return
+        self.faculties = sorted(df["faculty"].dropna().unique())
+        self.programs_by_faculty = {
+            faculty: sorted(programs.dropna().unique())
+            for faculty, programs in df.groupby("faculty", observed=True)["program"]
+        }
+        for position, (email, fullname) in enumerate(zip(df["email"], df["fullname"])):
+            if email not in self.fullname_by_email:      # first row wins
+                self.fullname_by_email[email] = fullname
+                self._email_order[email] = position
+
+    def in_roster_order(self, emails):
+        """``emails`` that are enrolled, ordered as in the roster sheet."""
+        return sorted((e for e in emails if e in self._email_order), key=self._email_order.__getitem__)
+
+    @property
+    def groups_df(self):
+        with self._lock:
+            if self._pending_groups:
+                extra = pd.DataFrame(self._pending_groups)
+                self._groups_df = _compact_groups(
+                    pd.concat([self._groups_df.astype(object), extra.astype(object)], ignore_index=True)
+                )
+                self._pending_groups = []
+            return self._groups_df
+
+    @staticmethod
+    def _tail_keys(groups_df):
+        """``row_key``s of the last rows of a groups table, oldest first."""
+        if groups_df is None or groups_df.empty:
+            return OrderedDict()
+        tail = groups_df.tail(TAIL_WINDOW).astype(str).values.tolist()
+        return OrderedDict((row_key(values), None) for values in tail)
+
+    def _apply_locked(self, row, values):
+        """
+        Adds one group row unless it is among the last rows already applied –
+        ``add_group`` and a concurrent ``sync_groups`` can both see the same
+        freshly appended row.
+        """
+        key = row_key(values)
+        if key in self._recent:
+            return
+        self._recent[key] = None
+        while len(self._recent) > TAIL_WINDOW:
+            self._recent.popitem(last=False)
+        self._pending_groups.append(row)
+        self.groups_index.add(row)
+
+    def replace_groups(self, groups_df):
+        """Swaps in a freshly read groups table (and rebuilds the index)."""
+        recent = self._tail_keys(groups_df)
+        groups_df = _compact_groups(groups_df)
+        index = MembershipIndex.from_df(groups_df)
+        with self._lock:
+            self._groups_df, self._pending_groups, self.groups_index = groups_df, [], index
+            self._recent = recent
+
+    def add_group(self, row):
+        """Records a group that was just appended to the sheet."""
+        values = list(row.values()) if isinstance(row, dict) else list(row)
+        if not isinstance(row, dict):
+            row = dict(zip(GROUP_COLUMNS, row))
+        with self._lock:
+            self._apply_locked(row, values)
+        # Outside self._lock – the table's own lock is held while a sync fetches
+        if self.groups_sync is not None:
+            self.groups_sync.note_appended(values)
+
+    def sync_groups(self, max_age=0):
+        """
+        Pulls only the groups appended since the last sync (one ranged
+        read); falls back to a full reload when the sheet was edited.
+        Skipped when the last sync is less than ``max_age`` seconds old.
+        The read happens outside ``self._lock`` so other sessions' lookups
+        don't wait on the network; only applying the rows takes it.
+        """
+        if self.groups_sync is None:
+            return
+        with self._sync_lock:
+            if time.monotonic() - self._groups_synced_at < max_age:
+                return
+            new_rows, full = self.groups_sync.sync()
+            self._groups_synced_at = time.monotonic()
+            if full:
+                self.replace_groups(self.groups_sync.frame())
+                return
+            header = [c.strip() for c in self.groups_sync.header]
+            with self._lock:
+                for values in new_rows:
+                    self._apply_locked(dict(zip(header, values)), values)
+
+    def memory_bytes(self):
+        """Deep size of the shared tables (counted once per process, not per session)."""
+        return sum(
+            int(df.memory_usage(deep=True).sum())
+            for df in (self.students_df, self.login_df, self.groups_df)
+            if df is not None
+        )
+
+
+def session_memory_bytes(session_state):
+    """
+    Rough deep size of what one session holds itself.  Shared objects
+    (the roster, storage, clients) are only referenced, so they are skipped.
+    """
+    total = 0
+    for key in list(session_state.keys()):
+        value = session_state[key]
+        if key in SHARED_SESSION_KEYS or isinstance(value, Roster):
+            continue
+        if isinstance(value, pd.DataFrame):
+            total += int(value.memory_usage(deep=True).sum())
+        elif isinstance(value, (bytes, str)):
+            total += sys.getsizeof(value)
+        elif isinstance(value, (list, tuple, set, dict)):
+            total += sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value)
+        else:
+            total += sys.getsizeof(value)
+    return total
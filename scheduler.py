@@ -0,0 +1,136 @@
+"""
+Quota-aware scheduling for Google Sheets calls.
+
+Every gspread call made by ``storage.SheetsStorage`` goes through one
+process-wide ``RequestScheduler``:
+
+* a token bucket per kind (read / write) matching the Sheets per-minute quota,
+* exponential backoff with full jitter on 429 / 5xx / connection errors,
+* single-flight coalescing – concurrent identical reads share one API call.
+
+``clock`` and ``sleep`` are injectable so a fake client can exercise
+latency and 429s without real waiting.
+"""
+
+import random
+import socket
+import threading
+import time
+
+import gspread
+from google.auth.exceptions import TransportError
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def status_code(error):
+    """HTTP status of a gspread ``APIError`` across gspread versions."""
+    code = getattr(error, "code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(error, idempotent=True):
+    """
+    429 means the request was rejected before doing anything, so it is
+    always safe to resend.  A 5xx or dropped connection may hide a write
+    that went through, so non-idempotent calls (appends, deletes) stop there.
+    """
+    if isinstance(error, gspread.exceptions.APIError):
+        code = status_code(error)
+        return code == 429 or (idempotent and code in RETRYABLE_STATUS)
+    return idempotent and isinstance(error, (TransportError, socket.timeout, ConnectionError))
+
+
+class TokenBucket:
+    def __init__(self, per_minute, burst=None, clock=time.monotonic, sleep=time.sleep):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst if burst is not None else max(1, per_minute // 6))
+        self.tokens = self.capacity
+        self.clock = clock
+        self.sleep = sleep
+        self._stamp = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self._stamp) * self.rate)
+                self._stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            self.sleep(wait)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class RequestScheduler:
+    def __init__(self, reads_per_minute=60, writes_per_minute=60, max_retries=5,
+                 base_delay=1.0, max_delay=32.0, clock=time.monotonic, sleep=time.sleep):
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute, clock=clock, sleep=sleep),
+            "write": TokenBucket(writes_per_minute, clock=clock, sleep=sleep),
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self._lock = threading.Lock()
+        self._flights = {}
+        self.calls = 0          # API calls actually issued (incl. retries)
+        self.coalesced = 0      # callers served by someone else's call
+
+    def _run(self, kind, fn, idempotent):
+        for attempt in range(self.max_retries + 1):
+            self.buckets[kind].acquire()
+            with self._lock:
+                self.calls += 1
+            try:
+                return fn()
+            except Exception as e:
+                if attempt >= self.max_retries or not is_retryable(e, idempotent):
+                    raise
+                delay = min(self.max_delay, self.base_delay * (2 ** attempt))
+                self.sleep(random.uniform(0, delay))
+
+    def call(self, kind, fn, coalesce_key=None, idempotent=True):
+        """
+        Runs ``fn()`` under the ``kind`` ("read"/"write") quota with retries.
+        Calls sharing a ``coalesce_key`` while one is in flight get its result.
+        """
+        if coalesce_key is None:
+            return self._run(kind, fn, idempotent)
+
+        with self._lock:
+            flight = self._flights.get(coalesce_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[coalesce_key] = _Flight()
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._run(kind, fn, idempotent)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[coalesce_key]
+            flight.done.set()
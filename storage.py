@@ -0,0 +1,629 @@
+"""
+Storage backends for the app's tables.
+
+Every table is addressed the same way the Google Sheet is: by
+(spreadsheet key, worksheet title).  Three backends share one interface:
+
+* ``SheetsStorage``   – reads and writes straight through gspread (the old behaviour)
+* ``SQLiteStorage``   – a local SQLite file (WAL mode) with real indexes on the
+                        email / course / group_name style columns; as the
+                        primary backend it imports each table from Sheets
+                        the first time it is used
+* ``MirroredStorage`` – reads from SQLite, writes through to Sheets *and* SQLite,
+                        and reseeds a table from Sheets once its copy is older
+                        than ``max_age`` seconds
+
+Pick one with ``storage_backend = "sheets" | "sqlite" | "mirror"`` in the
+``google_service_account`` secrets section (see ``storage_from_secrets``).
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+import gspread
+import pandas as pd
+
+import tracing
+from scheduler import RequestScheduler, status_code
+
+
+# Header names (lower-cased) that get a real SQLite index
+INDEXED_COLUMNS = {"email", "course", "group_name", "created_by"}
+
+
+def _frame(header, rows):
+    """Turns a header + list of rows into the DataFrame shape ``load_df`` always returned."""
+    if not header:
+        return pd.DataFrame()
+    width = len(header)
+    rows = [list(r[:width]) + [""] * (width - len(r)) for r in rows]
+    return pd.DataFrame(rows, columns=[c.strip() for c in header])
+
+
+def table_frame(values):
+    """Raw ``get_all_values()`` output (header first) → DataFrame; empty if there is no data row."""
+    if len(values) <= 1:      # header row only
+        return pd.DataFrame()
+    return _frame(values[0], values[1:])
+
+
+class HandleCache:
+    """
+    Spreadsheet / worksheet handles keyed by (spreadsheet id, worksheet
+    title), kept for ``ttl`` seconds.  ``open_by_key`` and ``worksheet()``
+    are each a metadata round trip, so reusing handles saves one or two
+    calls on nearly every read or write.
+    """
+
+    def __init__(self, client, ttl=600):
+        self.client = client
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._spreadsheets = {}     # key -> (expires, Spreadsheet)
+        self._worksheets = {}       # (key, title) -> (expires, Worksheet)
+
+    def _get(self, cache, cache_key, load):
+        now = time.monotonic()
+        with self._lock:
+            hit = cache.get(cache_key)
+            if hit and hit[0] > now:
+                return hit[1]
+        value = load()
+        with self._lock:
+            cache[cache_key] = (now + self.ttl, value)
+        return value
+
+    def spreadsheet(self, key):
+        return self._get(self._spreadsheets, key,
+                         lambda: tracing.call("sheets", "open_by_key", self.client.open_by_key, key))
+
+    def worksheet(self, key, title):
+        try:
+            return self._get(self._worksheets, (key, title),
+                             lambda: tracing.call("sheets", "worksheet", self.spreadsheet(key).worksheet, title))
+        except gspread.exceptions.WorksheetNotFound:
+            # The spreadsheet's cached tab list may be what's stale
+            self.invalidate(key)
+            raise
+
+    def put(self, key, title, ws):
+        with self._lock:
+            self._worksheets[(key, title)] = (time.monotonic() + self.ttl, ws)
+
+    def invalidate(self, key, title=None):
+        with self._lock:
+            if title is None:
+                self._spreadsheets.pop(key, None)
+                for cache_key in [k for k in self._worksheets if k[0] == key]:
+                    del self._worksheets[cache_key]
+            else:
+                self._worksheets.pop((key, title), None)
+
+
+class SheetsStorage:
+    """
+    Plain gspread access – every call is an API round trip (handles are
+    cached), paced and retried by a ``RequestScheduler``.
+    """
+
+    def __init__(self, client, handle_ttl=600, scheduler=None):
+        self.client = client
+        self.handles = HandleCache(client, ttl=handle_ttl)
+        self.scheduler = scheduler or RequestScheduler()
+
+    def worksheet(self, key, worksheet):
+        return self.handles.worksheet(key, worksheet)
+
+    def _call(self, key, worksheet, op, fn, kind="write", coalesce=None, idempotent=True, sent=None):
+        """
+        Runs ``fn(ws)`` through the scheduler; a 404 drops the handle so the
+        retry (or the next call) gets a fresh one – 429s and 5xx keep it, so
+        backoff retries don't add metadata calls.  Reads pass a
+        ``coalesce`` tag so identical concurrent reads share one request.
+        Every attempt is traced as ``op`` with ``sent`` as its request payload.
+        """
+        def run():
+            ws = self.worksheet(key, worksheet)
+            try:
+                return tracing.call("sheets", op, fn, ws, sent=sent)
+            except gspread.exceptions.APIError as e:
+                if status_code(e) == 404:
+                    self.handles.invalidate(key, worksheet)
+                raise
+
+        coalesce_key = (key, worksheet) + coalesce if coalesce else None
+        return self.scheduler.call(kind, run, coalesce_key=coalesce_key, idempotent=idempotent)
+
+    def read_values(self, key, worksheet):
+        return self._call(key, worksheet, "get_all_values", lambda ws: ws.get_all_values(),
+                          kind="read", coalesce=("all",))
+
+    def read_table(self, key, worksheet):
+        return table_frame(self.read_values(key, worksheet))
+
+    def read_values_batch(self, key, worksheets):
+        """
+        ``{worksheet: values}`` for several worksheets of one spreadsheet in a
+        single ``values_batch_get`` call.  Every worksheet must exist.
+        """
+        worksheets = list(worksheets)
+
+        def fetch():
+            try:
+                return tracing.call("sheets", "values_batch_get", self.handles.spreadsheet(key).values_batch_get,
+                                    [gspread.utils.absolute_range_name(ws) for ws in worksheets])
+            except gspread.exceptions.APIError as e:
+                if status_code(e) == 404:
+                    self.handles.invalidate(key)
+                raise
+
+        response = self.scheduler.call("read", fetch, coalesce_key=(key, "batch") + tuple(worksheets))
+        ranges = response.get("valueRanges", [])
+        # Same shape as get_all_values(): rows padded to the widest one
+        return {
+            ws: gspread.utils.fill_gaps(r["values"]) if r.get("values") else []
+            for ws, r in zip(worksheets, ranges)
+        }
+
+    def read_values_from(self, key, worksheet, start_row, width, end_row=None):
+        """Ranged read of rows ``start_row``..``end_row`` (default: the end), columns A..``width``."""
+        last_col = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, max(width, 1)))
+        a1 = f"A{start_row}:{last_col}{end_row or ''}"
+        return self._call(key, worksheet, "get_values", lambda ws: ws.get_values(a1),
+                          kind="read", coalesce=("from", a1))
+
+    def find_rows(self, key, worksheet, **criteria):
+        """Case-insensitive equality filter (done client-side for Sheets)."""
+        df = self.read_table(key, worksheet)
+        for col, value in criteria.items():
+            if df.empty or col not in df.columns:
+                return pd.DataFrame(columns=df.columns)
+            df = df[df[col].astype(str).str.strip().str.lower() == str(value).strip().lower()]
+        return df
+
+    def append_row(self, key, worksheet, row):
+        self._call(key, worksheet, "append_row", lambda ws: ws.append_row(row), idempotent=False, sent=row)
+
+    def append_rows(self, key, worksheet, rows):
+        if rows:
+            self._call(key, worksheet, "append_rows", lambda ws: ws.append_rows(rows), idempotent=False, sent=rows)
+
+    def update_cell(self, key, worksheet, row, col, value):
+        self._call(key, worksheet, "update_cell", lambda ws: ws.update_cell(row, col, value), sent=str(value))
+
+    def update_cells(self, key, worksheet, updates):
+        """``[(row, col, value), ...]`` in a single ``batch_update`` call."""
+        if updates:
+            self._call(key, worksheet, "batch_update", lambda ws: ws.batch_update([
+                {"range": gspread.utils.rowcol_to_a1(row, col), "values": [[value]]}
+                for row, col, value in updates
+            ]), sent=[str(value) for _, _, value in updates])
+
+    def delete_row(self, key, worksheet, row):
+        self._call(key, worksheet, "delete_rows", lambda ws: ws.delete_rows(row), idempotent=False)
+
+    def replace_values(self, key, worksheet, values, old_rows=0, start_row=1, width=None):
+        """
+        Rewrites the sheet from row ``start_row`` with ``values`` (header
+        first when ``start_row`` is 1) and blanks the rows after them, up to
+        ``old_rows``; nothing above ``start_row`` or below ``old_rows`` is
+        touched.  Values go in as ``USER_ENTERED``, so dates and numbers read
+        back as formatted text are stored as dates and numbers again.  Row
+        numbers stay put; no rows are inserted or deleted.
+        """
+        width = width or max((len(r) for r in values), default=1)
+        last_col = re.sub(r"\d", "", gspread.utils.rowcol_to_a1(1, max(width, 1)))
+        end = start_row + len(values)
+
+        def rewrite(ws):
+            if values:
+                ws.update(range_name=f"A{start_row}", values=values, value_input_option="USER_ENTERED")
+            if old_rows >= end:
+                ws.batch_clear([f"A{end}:{last_col}{old_rows}"])
+
+        self._call(key, worksheet, "update", rewrite, sent=values)
+
+    def ensure_table(self, key, worksheet, header=None, rows=1000, cols=10):
+        """Creates the worksheet (and its header row) if it does not exist yet."""
+        try:
+            return self.scheduler.call("read", lambda: self.worksheet(key, worksheet))
+        except gspread.exceptions.WorksheetNotFound:
+            ws = self.scheduler.call("write", lambda: tracing.call(
+                "sheets", "add_worksheet", self.handles.spreadsheet(key).add_worksheet,
+                title=worksheet, rows=rows, cols=cols), idempotent=False)
+            self.handles.put(key, worksheet, ws)
+            if header:
+                self.scheduler.call("write", lambda: tracing.call("sheets", "append_row", ws.append_row, header,
+                                                                   sent=header), idempotent=False)
+            return ws
+
+
+class SQLiteStorage:
+    """
+    Local SQLite store.  Each worksheet becomes one table with positional
+    ``c0..cN`` text columns plus ``_row`` (the 1-based sheet row number, the
+    header being row 1), so sheet-style ``update_cell`` calls map directly.
+    The real header is kept in ``_tables`` so odd or duplicate sheet headers
+    never break the schema.
+
+    With a ``seed`` backend (a ``SheetsStorage``), a table that is not in the
+    file yet is imported from it on first use, so switching an existing
+    deployment to SQLite keeps its roster, logins and groups.  After that
+    SQLite is the only copy – writes never go back to ``seed``.
+    """
+
+    def __init__(self, path, seed=None):
+        self.path = path
+        self.seed = seed
+        self._seeded = set()    # (key, worksheet) already imported (or missing) in seed
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS _tables ("
+            " sheet_key TEXT NOT NULL, worksheet TEXT NOT NULL,"
+            " table_name TEXT NOT NULL, header TEXT NOT NULL, synced_at REAL,"
+            " PRIMARY KEY (sheet_key, worksheet))"
+        )
+
+    # ---------- schema helpers ----------
+    @staticmethod
+    def _table_name(key, worksheet):
+        digest = hashlib.sha1(f"{key}\x00{worksheet}".encode("utf-8")).hexdigest()[:16]
+        return f"t_{digest}"
+
+    def _lookup(self, key, worksheet):
+        cur = self._conn.execute(
+            "SELECT table_name, header, synced_at FROM _tables WHERE sheet_key = ? AND worksheet = ?",
+            (key, worksheet),
+        )
+        found = cur.fetchone()
+        if found is None:
+            return None
+        return found[0], json.loads(found[1]), found[2]
+
+    def _meta(self, key, worksheet):
+        meta = self._lookup(key, worksheet)
+        if meta is None and self.seed is not None and (key, worksheet) not in self._seeded:
+            if self._import(key, worksheet):
+                meta = self._lookup(key, worksheet)
+        return meta
+
+    def _import(self, key, worksheet):
+        """
+        Copies one worksheet from ``seed``; False when it doesn't exist there
+        either.  Any other read error propagates and the import is retried on
+        next use – never fall back to an empty local table that would hide
+        the Sheets data for good.
+        """
+        try:
+            values = self.seed.read_values(key, worksheet)
+        except gspread.exceptions.WorksheetNotFound:
+            self._seeded.add((key, worksheet))
+            return False
+        header = [str(c) for c in values[0]] if values else []
+        # May run inside a caller's transaction (update_cells), which then covers it
+        own = not self._conn.in_transaction
+        if own:
+            self._conn.execute("BEGIN")
+        try:
+            table = self._create(key, worksheet, header)
+            self._insert(table, header, values[1:], first_row=2)
+            if own:
+                self._conn.execute("COMMIT")
+        except Exception:
+            if own:
+                self._conn.execute("ROLLBACK")
+            raise
+        self._seeded.add((key, worksheet))
+        return True
+
+    def has_table(self, key, worksheet):
+        with self._lock:
+            return self._meta(key, worksheet) is not None
+
+    def synced_at(self, key, worksheet):
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            return meta[2] if meta else None
+
+    def _create(self, key, worksheet, header):
+        table = self._table_name(key, worksheet)
+        cols = ", ".join(f"c{i} TEXT" for i in range(len(header)))
+        self._conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+        self._conn.execute(f'CREATE TABLE "{table}" (_row INTEGER PRIMARY KEY{", " + cols if cols else ""})')
+        for i, name in enumerate(header):
+            if name.strip().lower() in INDEXED_COLUMNS:
+                self._conn.execute(
+                    f'CREATE INDEX "{table}_c{i}" ON "{table}" (lower(trim(c{i})))'
+                )
+        self._conn.execute(
+            "INSERT OR REPLACE INTO _tables (sheet_key, worksheet, table_name, header, synced_at)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (key, worksheet, table, json.dumps(header), time.time()),
+        )
+        return table
+
+    def _insert(self, table, header, rows, first_row):
+        width = len(header)
+        if not width or not rows:
+            return
+        placeholders = ", ".join("?" for _ in range(width + 1))
+        cols = ", ".join(f"c{i}" for i in range(width))
+        self._conn.executemany(
+            f'INSERT INTO "{table}" (_row, {cols}) VALUES ({placeholders})',
+            (
+                [first_row + n] + [str(v) for v in (list(r[:width]) + [""] * (width - len(r)))]
+                for n, r in enumerate(rows)
+            ),
+        )
+
+    # ---------- public interface ----------
+    def replace_table(self, key, worksheet, values):
+        """Replaces a whole table with raw ``get_all_values()`` output (header first)."""
+        header = [str(c) for c in values[0]] if values else []
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                table = self._create(key, worksheet, header)
+                self._insert(table, header, values[1:], first_row=2)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def read_values(self, key, worksheet):
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            if meta is None:
+                return []
+            table, header, _ = meta
+            if not header:
+                return []
+            cols = ", ".join(f"c{i}" for i in range(len(header)))
+            rows = self._conn.execute(f'SELECT {cols} FROM "{table}" ORDER BY _row').fetchall()
+        return [header] + [list(r) for r in rows]
+
+    def read_table(self, key, worksheet):
+        return table_frame(self.read_values(key, worksheet))
+
+    def read_values_batch(self, key, worksheets):
+        return {ws: self.read_values(key, ws) for ws in worksheets}
+
+    def read_values_from(self, key, worksheet, start_row, width, end_row=None):
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            if meta is None or not meta[1]:
+                return []
+            table, header, _ = meta
+            if start_row <= 1:
+                values = self.read_values(key, worksheet)
+                return values[:end_row] if end_row else values
+            cols = ", ".join(f"c{i}" for i in range(min(width, len(header)) or len(header)))
+            rows = self._conn.execute(
+                f'SELECT {cols} FROM "{table}" WHERE _row >= ? AND _row <= ? ORDER BY _row',
+                (start_row, end_row or 2 ** 62),
+            ).fetchall()
+        return [list(r) for r in rows]
+
+    def find_rows(self, key, worksheet, **criteria):
+        """Case-insensitive equality lookup; uses the indexes on email/course/group_name columns."""
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            if meta is None:
+                return pd.DataFrame()
+            table, header, _ = meta
+            positions = {name.strip(): i for i, name in enumerate(header)}
+            where, params = [], []
+            for col, value in criteria.items():
+                if col not in positions:
+                    return pd.DataFrame(columns=[c.strip() for c in header])
+                where.append(f"lower(trim(c{positions[col]})) = ?")
+                params.append(str(value).strip().lower())
+            cols = ", ".join(f"c{i}" for i in range(len(header)))
+            sql = f'SELECT {cols} FROM "{table}"'
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            rows = self._conn.execute(sql + " ORDER BY _row", params).fetchall()
+        return _frame(header, [list(r) for r in rows])
+
+    def append_rows(self, key, worksheet, rows):
+        if not rows:
+            return
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            if meta is None or not meta[1]:
+                # First write to an empty sheet is its header row
+                header, rows = [str(c) for c in rows[0]], rows[1:]
+                table = self._create(key, worksheet, header)
+            else:
+                table, header, _ = meta
+            last = self._conn.execute(f'SELECT COALESCE(MAX(_row), 1) FROM "{table}"').fetchone()[0]
+            self._insert(table, header, rows, first_row=last + 1)
+
+    def append_row(self, key, worksheet, row):
+        self.append_rows(key, worksheet, [row])
+
+    def _widen(self, key, worksheet, table, header, width):
+        """Adds ``c{n}`` columns (blank header cells) so the table is ``width`` wide."""
+        for i in range(len(header), width):
+            self._conn.execute(f'ALTER TABLE "{table}" ADD COLUMN c{i} TEXT DEFAULT \'\'')
+        header = header + [""] * (width - len(header))
+        self._conn.execute(
+            "UPDATE _tables SET header = ? WHERE sheet_key = ? AND worksheet = ?",
+            (json.dumps(header), key, worksheet),
+        )
+        return header
+
+    def update_cell(self, key, worksheet, row, col, value):
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            if meta is None or col < 1:
+                return
+            table, header, _ = meta
+            if col > len(header):
+                header = self._widen(key, worksheet, table, header, col)
+            if row == 1:
+                # Row 1 is the header, which lives in _tables
+                header[col - 1] = str(value)
+                self._conn.execute(
+                    "UPDATE _tables SET header = ? WHERE sheet_key = ? AND worksheet = ?",
+                    (json.dumps(header), key, worksheet),
+                )
+                return
+            self._conn.execute(
+                f'UPDATE "{table}" SET c{col - 1} = ? WHERE _row = ?', (str(value), row)
+            )
+
+    def update_cells(self, key, worksheet, updates):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                for row, col, value in updates:
+                    self.update_cell(key, worksheet, row, col, value)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete_row(self, key, worksheet, row):
+        """Deletes one sheet row and shifts later rows up, like ``delete_rows`` does."""
+        with self._lock:
+            meta = self._meta(key, worksheet)
+            if meta is None:
+                return
+            table = meta[0]
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(f'DELETE FROM "{table}" WHERE _row = ?', (row,))
+                # Two steps so the primary key never collides mid-update
+                self._conn.execute(f'UPDATE "{table}" SET _row = -(_row - 1) WHERE _row > ?', (row,))
+                self._conn.execute(f'UPDATE "{table}" SET _row = -_row WHERE _row < 0')
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def replace_values(self, key, worksheet, values, old_rows=0, start_row=1, width=None):
+        if start_row > 1:
+            values = self.read_values(key, worksheet)[:start_row - 1] + [list(r) for r in values]
+        self.replace_table(key, worksheet, values)
+
+    def ensure_table(self, key, worksheet, header=None, rows=1000, cols=10):
+        with self._lock:
+            if self._meta(key, worksheet) is None:
+                self._create(key, worksheet, [str(c) for c in header or []])
+
+
+class MirroredStorage:
+    """
+    SQLite as a write-through mirror of the Sheets.  Reads are served from
+    SQLite; a table is (re)seeded from Sheets when it is missing or older
+    than ``max_age`` seconds.  Writes hit Sheets first (the source of truth)
+    and are then applied to the mirror.
+    """
+
+    def __init__(self, sheets, sqlite, max_age=600):
+        self.sheets = sheets
+        self.sqlite = sqlite
+        self.max_age = max_age
+
+    def worksheet(self, key, worksheet):
+        return self.sheets.worksheet(key, worksheet)
+
+    def ensure_table(self, key, worksheet, header=None, rows=1000, cols=10):
+        ws = self.sheets.ensure_table(key, worksheet, header=header, rows=rows, cols=cols)
+        if not self.sqlite.has_table(key, worksheet):
+            self.refresh(key, worksheet)
+        return ws
+
+    def refresh(self, key, worksheet):
+        self.sqlite.replace_table(key, worksheet, self.sheets.read_values(key, worksheet))
+
+    def _is_stale(self, key, worksheet):
+        synced = self.sqlite.synced_at(key, worksheet)
+        return synced is None or time.time() - synced > self.max_age
+
+    def _ensure_fresh(self, key, worksheet):
+        if self._is_stale(key, worksheet):
+            self.refresh(key, worksheet)
+
+    def read_values(self, key, worksheet):
+        self._ensure_fresh(key, worksheet)
+        return self.sqlite.read_values(key, worksheet)
+
+    def read_table(self, key, worksheet):
+        self._ensure_fresh(key, worksheet)
+        return self.sqlite.read_table(key, worksheet)
+
+    def read_values_batch(self, key, worksheets):
+        """Stale tables are reseeded together with one batched Sheets read."""
+        stale = [ws for ws in worksheets if self._is_stale(key, ws)]
+        if stale:
+            for ws, values in self.sheets.read_values_batch(key, stale).items():
+                self.sqlite.replace_table(key, ws, values)
+        return self.sqlite.read_values_batch(key, worksheets)
+
+    def read_values_from(self, key, worksheet, start_row, width, end_row=None):
+        self._ensure_fresh(key, worksheet)
+        return self.sqlite.read_values_from(key, worksheet, start_row, width, end_row=end_row)
+
+    def find_rows(self, key, worksheet, **criteria):
+        self._ensure_fresh(key, worksheet)
+        return self.sqlite.find_rows(key, worksheet, **criteria)
+
+    def append_row(self, key, worksheet, row):
+        self.append_rows(key, worksheet, [row])
+
+    def append_rows(self, key, worksheet, rows):
+        self._ensure_fresh(key, worksheet)
+        self.sheets.append_rows(key, worksheet, rows)
+        self.sqlite.append_rows(key, worksheet, rows)
+
+    def update_cell(self, key, worksheet, row, col, value):
+        self._ensure_fresh(key, worksheet)
+        self.sheets.update_cell(key, worksheet, row, col, value)
+        self.sqlite.update_cell(key, worksheet, row, col, value)
+
+    def update_cells(self, key, worksheet, updates):
+        self._ensure_fresh(key, worksheet)
+        self.sheets.update_cells(key, worksheet, updates)
+        self.sqlite.update_cells(key, worksheet, updates)
+
+    def delete_row(self, key, worksheet, row):
+        self._ensure_fresh(key, worksheet)
+        self.sheets.delete_row(key, worksheet, row)
+        self.sqlite.delete_row(key, worksheet, row)
+
+    def replace_values(self, key, worksheet, values, old_rows=0, start_row=1, width=None):
+        self.sheets.replace_values(key, worksheet, values, old_rows=old_rows, start_row=start_row, width=width)
+        self.sqlite.replace_values(key, worksheet, values, start_row=start_row)
+
+
+def storage_from_secrets(client, secrets):
+    """
+    Builds the configured backend.  ``secrets`` is the ``google_service_account``
+    section; ``storage_backend`` defaults to ``"sheets"``.
+    """
+    backend = str(secrets.get("storage_backend", "sheets")).strip().lower()
+    scheduler = RequestScheduler(
+        reads_per_minute=int(secrets.get("sheets_reads_per_minute", 60)),
+        writes_per_minute=int(secrets.get("sheets_writes_per_minute", 60)),
+    )
+    if backend == "sheets":
+        return SheetsStorage(client, scheduler=scheduler)
+
+    path = secrets.get("sqlite_path", "group_assignment.sqlite3")
+    if backend == "sqlite":
+        # Tables missing from the file are imported from the Sheets on first use
+        return SQLiteStorage(path, seed=SheetsStorage(client, scheduler=scheduler))
+    sqlite = SQLiteStorage(path)
+    if backend == "mirror":
+        return MirroredStorage(SheetsStorage(client, scheduler=scheduler), sqlite,
+                               max_age=int(secrets.get("mirror_max_age", 600)))
+    raise ValueError(f"Unknown storage_backend: {backend!r}")
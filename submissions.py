@@ -0,0 +1,251 @@
+"""
+Shared, cached copy of the ``Submissions`` worksheet.
+
+One ``SubmissionsTable`` per spreadsheet is shared by every session.  It
+is read once per ``ttl`` seconds and indexed by (group, course, lab), so
+"has this group already submitted this lab?" is a dict lookup instead of
+a full-sheet download plus three string comparisons per row.  Submits,
+deletes and grades made through the table update the copy in place.
+
+The index doubles as a key → sheet-row locator.  Deleting a submission
+writes a ``deleted_at`` tombstone into its row (one targeted write)
+instead of ``delete_rows``, so no other row moves and a grader's row
+numbers stay valid.  Before writing to a located row, that single row is
+read back and its key checked; a mismatch forces a reload.  Once
+``compact_after`` tombstones pile up, ``compact`` rewrites the sheet
+from the first tombstone down without them, in one call.  ``soft_delete=False`` deletes rows outright.
+"""
+
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import streamlit as st
+
+from config import secret_flag
+
+SUBMISSION_COLUMNS = ["timestamp", "group_name", "course", "lab", "submitted_by",
+                      "file_name", "file_link", "graded", "grade", "deleted_at"]
+
+
+def submission_key(group_name, course, lab):
+    return (str(group_name).strip().lower(), str(course).strip().lower(), str(lab).strip().lower())
+
+
+class SubmissionsTable:
+    def __init__(self, storage, key, worksheet="Submissions", ttl=300, soft_delete=True, compact_after=100):
+        self.storage = storage
+        self.key = key
+        self.worksheet = worksheet
+        self.ttl = ttl
+        self.soft_delete = soft_delete
+        self.compact_after = compact_after
+        self._lock = threading.RLock()          # the in-memory copy
+        self._write_lock = threading.Lock()     # sheet writes – compaction moves rows, so they take turns
+        self._header = list(SUBMISSION_COLUMNS)
+        self._rows = []         # data rows in sheet order (sheet row = position + 2), tombstones included
+        self._index = {}        # (group, course, lab) -> position of the first live matching row
+        self._tombstones = 0
+        self._loaded_at = None
+
+    # ---------- loading ----------
+    def _load_locked(self):
+        # Only creates the worksheet if it truly does not exist
+        self.storage.ensure_table(self.key, self.worksheet, rows="1000", cols="10", header=SUBMISSION_COLUMNS)
+        values = self.storage.read_values(self.key, self.worksheet)
+        self._header = [c.strip() for c in values[0]] if values else list(SUBMISSION_COLUMNS)
+        width = len(self._header)
+        self._rows = [list(r[:width]) + [""] * (width - len(r)) for r in values[1:]]
+        self._reindex_locked()
+        self._loaded_at = time.monotonic()
+
+    def _key_of(self, row):
+        col = self._header.index
+        return submission_key(row[col("group_name")], row[col("course")], row[col("lab")])
+
+    def _is_live(self, row):
+        if not any(str(v).strip() for v in row):
+            return False
+        if "deleted_at" in self._header:
+            return str(row[self._header.index("deleted_at")]).strip() == ""
+        return True
+
+    def _reindex_locked(self):
+        self._index = {}
+        self._tombstones = 0
+        for position, row in enumerate(self._rows):
+            if not self._is_live(row):
+                self._tombstones += 1
+                continue
+            self._index.setdefault(self._key_of(row), position)
+
+    def _fresh_locked(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.ttl:
+            self._load_locked()
+
+    def refresh(self):
+        with self._lock:
+            self._load_locked()
+
+    # ---------- reads ----------
+    def find(self, group_name, course, lab):
+        """The submission for this group/course/lab as a dict, or ``None``."""
+        with self._lock:
+            self._fresh_locked()
+            position = self._index.get(submission_key(group_name, course, lab))
+            if position is None:
+                return None
+            return dict(zip(self._header, self._rows[position]))
+
+    def locate(self, group_name, course, lab):
+        """Sheet row number of this group/course/lab's submission, or ``None``."""
+        with self._lock:
+            self._fresh_locked()
+            position = self._index.get(submission_key(group_name, course, lab))
+            return None if position is None else position + 2
+
+    def frame(self):
+        """Live submissions; the index is each row's sheet row number."""
+        with self._lock:
+            self._fresh_locked()
+            positions = sorted(self._index.values())
+            return pd.DataFrame(
+                [list(self._rows[p]) for p in positions], columns=self._header,
+                index=pd.Index([p + 2 for p in positions], name="sheet_row"),
+            )
+
+    # ---------- writes (hold _write_lock) ----------
+    def _verified_position(self, key):
+        """
+        Position of ``key``'s row, after reading that one sheet row back to
+        check it is still there; reloads once if it has moved.
+        """
+        with self._lock:
+            self._fresh_locked()
+            position = self._index.get(key)
+            width = len(self._header)
+        if position is None:
+            return None
+        fetched = self.storage.read_values_from(self.key, self.worksheet, position + 2, width,
+                                                end_row=position + 2)
+        if fetched:
+            row = list(fetched[0][:width]) + [""] * (width - len(fetched[0]))
+            if self._is_live(row) and self._key_of(row) == key:
+                return position
+        with self._lock:
+            self._load_locked()
+            return self._index.get(key)
+
+    def _column(self, name):
+        """1-based column of ``name``; adds it to the header row if the sheet predates it."""
+        with self._lock:
+            if name in self._header:
+                return self._header.index(name) + 1
+            col = len(self._header) + 1
+        self.storage.update_cell(self.key, self.worksheet, 1, col, name)
+        with self._lock:
+            self._header.append(name)
+            for row in self._rows:
+                row.append("")
+        return col
+
+    def add(self, row):
+        """Appends a submission row (in ``SUBMISSION_COLUMNS`` order) to the sheet and the copy."""
+        with self._write_lock:
+            with self._lock:
+                self._fresh_locked()
+                loaded_at = self._loaded_at
+            # The API call runs outside _lock so lookups don't queue behind it
+            self.storage.append_row(self.key, self.worksheet, row)
+            values = dict(zip(SUBMISSION_COLUMNS, row))
+            with self._lock:
+                if self._loaded_at != loaded_at:
+                    # Reloaded meanwhile – that copy may or may not have the row, so read again next time
+                    self._loaded_at = None
+                    return
+                self._rows.append([values.get(c, "") for c in self._header])
+                self._index.setdefault(self._key_of(self._rows[-1]), len(self._rows) - 1)
+
+    def set_grade(self, group_name, course, lab, grade):
+        """Marks the submission graded – both cells in one write to its verified row."""
+        with self._write_lock:
+            position = self._verified_position(submission_key(group_name, course, lab))
+            if position is None:
+                return False
+            graded_col, grade_col = self._column("graded"), self._column("grade")
+            self.storage.update_cells(self.key, self.worksheet, [
+                (position + 2, graded_col, "Yes"),
+                (position + 2, grade_col, grade),
+            ])
+            with self._lock:
+                self._rows[position][graded_col - 1] = "Yes"
+                self._rows[position][grade_col - 1] = str(grade)
+            return True
+
+    def delete(self, group_name, course, lab):
+        """
+        Removes this group/course/lab's submission – a tombstone in
+        soft-delete mode, ``delete_row`` otherwise.  Returns ``False`` if
+        there is none.
+        """
+        with self._write_lock:
+            position = self._verified_position(submission_key(group_name, course, lab))
+            if position is None:
+                return False
+            if not self.soft_delete:
+                self.storage.delete_row(self.key, self.worksheet, position + 2)
+                with self._lock:
+                    del self._rows[position]
+                    self._reindex_locked()
+                return True
+
+            col = self._column("deleted_at")
+            stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            self.storage.update_cell(self.key, self.worksheet, position + 2, col, stamp)
+            with self._lock:
+                self._rows[position][col - 1] = stamp
+                self._reindex_locked()      # a later row with the same key may now be the live one
+                due = self._tombstones >= self.compact_after
+        if due:
+            self.compact()
+        return True
+
+    def compact(self, attempts=3):
+        """
+        Rewrites the sheet without tombstoned rows, from the first tombstone
+        down, in one call.  Rows after it move up, so writes wait and the
+        locator is rebuilt from a fresh read.  If another process appended
+        a row since that read, the read is redone (up to ``attempts``
+        times) rather than risk writing over it.  Returns the number of
+        rows removed.
+        """
+        with self._write_lock, self._lock:
+            for _ in range(attempts):
+                self._load_locked()
+                first = next((p for p, row in enumerate(self._rows) if not self._is_live(row)), None)
+                if first is None:
+                    return 0
+                live = [r for r in self._rows[first:] if self._is_live(r)]
+                last_row = len(self._rows) + 1
+                width = len(self._header)
+                if self.storage.read_values_from(self.key, self.worksheet, last_row + 1, width):
+                    continue
+                self.storage.replace_values(self.key, self.worksheet, live, old_rows=last_row,
+                                            start_row=first + 2, width=width)
+                removed = len(self._rows) - first - len(live)
+                self._rows = self._rows[:first] + live
+                self._reindex_locked()
+                return removed
+            return 0
+
+
+@st.cache_resource
+def get_submissions_table(_storage, sheet_id):
+    ss = st.secrets["google_service_account"]
+    return SubmissionsTable(
+        _storage, sheet_id,
+        ttl=int(ss.get("submissions_ttl", 300)),
+        soft_delete=secret_flag(ss, "submissions_soft_delete", True),
+        compact_after=int(ss.get("submissions_compact_after", 100)),
+    )
@@ -0,0 +1,113 @@
+"""
+Incremental sync of append-only worksheets (the ``groups`` log).
+
+``IncrementalTable`` remembers how many rows it has seen.  Each ``sync``
+does one ranged read starting at the last known row: that row is the
+anchor, and everything after it is new.  If the anchor no longer matches
+(rows were edited, deleted or re-sorted) it falls back to a full re-read.
+Edits above the anchor are only picked up by the periodic full reload of
+whatever owns the table (the shared roster's TTL).
+
+A row this process appends may be fetched by a ``sync`` before
+``note_appended`` records it; ``note_appended`` then finds it among the
+last ``TAIL_WINDOW`` rows and doesn't add it twice.
+"""
+
+import threading
+
+import pandas as pd
+
+# How far back from the end note_appended looks for a row a sync already fetched
+TAIL_WINDOW = 50
+
+
+def _trim(row):
+    """Sheets drops trailing empty cells, so compare rows without them."""
+    row = [str(v) for v in row]
+    while row and row[-1] == "":
+        row.pop()
+    return row
+
+
+def row_key(row):
+    """Hashable form of a sheet row, equal for a row as written and as read back."""
+    return tuple(_trim(row))
+
+
+class IncrementalTable:
+    def __init__(self, storage, key, worksheet):
+        self.storage = storage
+        self.key = key
+        self.worksheet = worksheet
+        self.values = []        # header + rows, exactly as read
+        self._lock = threading.Lock()
+
+    @property
+    def header(self):
+        return self.values[0] if self.values else []
+
+    @property
+    def rows(self):
+        return self.values[1:]
+
+    def full_sync(self):
+        with self._lock:
+            return self._full_locked()
+
+    def seed(self, values):
+        """Starts from values already fetched elsewhere (e.g. a batched bootstrap read)."""
+        with self._lock:
+            self.values = [list(r) for r in values]
+            return self.rows
+
+    def frame(self, rows=None):
+        """DataFrame of ``rows`` (default: all rows) under the sheet header."""
+        header = [c.strip() for c in self.header]
+        if not header:
+            return pd.DataFrame()
+        rows = self.rows if rows is None else rows
+        width = len(header)
+        return pd.DataFrame(
+            [list(r[:width]) + [""] * (width - len(r)) for r in rows], columns=header
+        )
+
+    def sync(self):
+        """
+        Brings the copy up to date.  Returns ``(new_rows, full)``: the rows
+        appended since the last sync, or every row with ``full=True`` when
+        a full resync was needed.
+        """
+        with self._lock:
+            if not self.values:
+                return self._full_locked(), True
+
+            anchor_row = len(self.values)       # 1-based sheet row of our last row
+            fetched = self.storage.read_values_from(
+                self.key, self.worksheet, anchor_row, len(self.header)
+            )
+            if not fetched or _trim(fetched[0]) != _trim(self.values[-1]):
+                return self._full_locked(), True
+
+            new_rows = [list(r) for r in fetched[1:]]
+            self.values.extend(new_rows)
+            return new_rows, False
+
+    def _full_locked(self):
+        self.values = [list(r) for r in self.storage.read_values(self.key, self.worksheet)]
+        return self.rows
+
+    def note_appended(self, row):
+        """
+        Records a row this process just appended, saving a read.  Returns
+        False when a ``sync`` already brought it in.  If some other writer
+        got in first the next ``sync`` sees an anchor mismatch and resyncs
+        fully.
+        """
+        key = _trim(row)
+        with self._lock:
+            if not self.values:
+                return False
+            if any(_trim(r) == key for r in self.values[-TAIL_WINDOW:]):
+                return False
+            self.values.append([str(v) for v in row])
+            return True
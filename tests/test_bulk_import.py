@@ -0,0 +1,91 @@
+import pandas as pd
+
+from bulk_import import MAX_MEMBERS, MIN_MEMBERS, validate_groups
+from roster import GROUP_COLUMNS, Roster
+
+
+def _student(i):
+    return {"email": f"s{i}@x.edu", "student_id": str(1000 + i), "first_name": f"first{i}",
+            "last_name": "student", "faculty": "science" if i % 2 else "arts", "program": "general"}
+
+
+def _roster(groups=()):
+    students = pd.DataFrame([_student(i) for i in range(40)])
+    return Roster(students, pd.DataFrame(columns=["Email", "Password"]),
+                  pd.DataFrame(list(groups), columns=GROUP_COLUMNS), ["CSC 101", "CSC 102"])
+
+
+def _members(*numbers):
+    return ", ".join(f"s{i}@x.edu" for i in numbers)
+
+
+def _file(*rows):
+    return pd.DataFrame([{"group_name": n, "course": c, "members": m} for n, c, m in rows])
+
+
+def _errors(df, roster=None):
+    groups, errors = validate_groups(df, roster or _roster())
+    assert groups.empty
+    return dict(zip(errors["group_name"], errors["error"]))
+
+
+def test_clean_file_becomes_groups_with_roster_defaults():
+    groups, errors = validate_groups(_file(("Team A", "csc 101", _members(1, 2, 3))), _roster())
+    assert errors.empty
+    row = groups.iloc[0]
+    assert (row["course"], row["faculty"], row["department"]) == ("CSC 101", "Science", "General")
+    assert row["members"] == _members(1, 2, 3)
+    assert row["member_names"] == "First1 Student, First2 Student, First3 Student"
+
+
+def test_unknown_members_and_unknown_course():
+    errors = _errors(_file(("Team A", "CSC 101", _members(1, 2) + ", ghost@x.edu"),
+                           ("Team B", "CSC 999", _members(4, 5, 6))))
+    assert errors["Team A"] == "Not enrolled: ghost@x.edu"
+    assert errors["Team B"] == "Unknown course 'CSC 999'"
+
+
+def test_members_already_grouped_for_the_course_only():
+    existing = ["2024-01-01", "Old", "Science", "General", "CSC 101", _members(1, 9), "", "a@x.edu"]
+    roster = _roster([existing])
+    errors = _errors(_file(("Team A", "CSC 101", _members(1, 2, 3))), roster)
+    assert errors["Team A"] == "Already in a group for this course: s1@x.edu"
+
+    # The same students are free in another course
+    groups, errors = validate_groups(_file(("Team A", "CSC 102", _members(1, 2, 3))), roster)
+    assert errors.empty and len(groups) == 1
+
+
+def test_duplicate_and_existing_group_names():
+    existing = ["2024-01-01", "Old Team", "Science", "General", "CSC 101", _members(30, 31, 32), "", "a@x.edu"]
+    _, errors = validate_groups(_file(("Team A", "CSC 101", _members(1, 2, 3)),
+                                      ("team a ", "CSC 102", _members(4, 5, 6)),
+                                      ("OLD TEAM", "CSC 102", _members(7, 8, 9))), _roster([existing]))
+    assert errors["line"].tolist() == [2, 3, 4]
+    assert set(errors["error"][:2]) == {"Group name appears more than once in the file"}
+    assert errors["error"][2] == "Group name already exists"
+
+
+def test_members_listed_twice_or_in_two_groups_of_the_file():
+    _, errors = validate_groups(_file(("Team A", "CSC 101", _members(1, 2, 3, 1)),
+                                      ("Team B", "CSC 101", _members(3, 4, 5))), _roster())
+    assert errors[["group_name", "error"]].values.tolist() == [
+        ["Team A", "Listed twice: s1@x.edu"],
+        ["Team A", "In more than one group of the file: s3@x.edu"],
+        ["Team B", "In more than one group of the file: s3@x.edu"],
+    ]
+
+
+def test_group_size_bounds():
+    too_big = range(MAX_MEMBERS + 1)
+    _, errors = validate_groups(_file(("Small", "CSC 101", _members(*range(MIN_MEMBERS - 1))),
+                                      ("Big", "CSC 102", _members(*too_big)),
+                                      ("Max", "CSC 101", _members(*range(20, 20 + MAX_MEMBERS)))), _roster())
+    assert errors["group_name"].tolist() == ["Small", "Big"]
+    assert errors["error"][0].endswith(f"(has {MIN_MEMBERS - 1})")
+    assert errors["error"][1].endswith(f"(has {MAX_MEMBERS + 1})")
+
+
+def test_missing_columns_are_reported_on_the_header_line():
+    _, errors = validate_groups(pd.DataFrame({"group_name": ["Team A"]}), _roster())
+    assert errors.to_dict("records") == [{"line": 1, "group_name": "", "error": "Missing column(s): course, members"}]
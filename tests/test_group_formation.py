@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from bulk_import import MAX_MEMBERS, MIN_MEMBERS
+from group_formation import form_groups, group_count, ungrouped_students
+from membership import split_members
+from roster import GROUP_COLUMNS, Roster
+
+
+def _students(n, faculties=("Arts", "Science")):
+    return pd.DataFrame([{
+        "email": f"s{i}@x.edu", "student_id": str(1000 + i), "first_name": f"first{i}", "last_name": "student",
+        "faculty": faculties[i % len(faculties)], "program": "General",
+    } for i in range(n)])
+
+
+@pytest.mark.parametrize("n, target, expected", [
+    (0, 5, 0), (MIN_MEMBERS - 1, 5, 0), (MIN_MEMBERS, 5, 1), (10, 5, 2), (11, 4, 3),
+    (100, 50, 7),       # 2 groups of 50 would break the maximum
+    (7, 2, 2),          # 4 groups of 2 would break the minimum
+])
+def test_group_count(n, target, expected):
+    assert group_count(n, target) == expected
+
+
+@pytest.mark.parametrize("n, target", [(3, 5), (17, 5), (31, 4), (46, 15), (200, 50), (14, 3)])
+def test_sizes_stay_within_bounds_and_differ_by_one(n, target):
+    groups, leftover = form_groups(_students(n), "CSC 101", target_size=target)
+    sizes = [len(split_members(m)) for m in groups["members"]]
+    assert leftover.empty
+    assert sum(sizes) == n
+    assert MIN_MEMBERS <= min(sizes) and max(sizes) <= MAX_MEMBERS
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_too_few_students_are_all_left_over():
+    students = _students(MIN_MEMBERS - 1)
+    groups, leftover = form_groups(students, "CSC 101")
+    assert groups.empty
+    assert leftover["email"].tolist() == students["email"].tolist()
+
+
+def test_balancing_spreads_every_faculty():
+    students = _students(40, faculties=("Arts",) * 3 + ("Science",))     # 30 Arts, 10 Science
+    groups, _ = form_groups(students, "CSC 101", target_size=4, balance_by=("faculty",), seed=3)
+    science = {e for e, f in zip(students["email"], students["faculty"]) if f == "Science"}
+    assert [sum(e in science for e in split_members(m)) for m in groups["members"]] == [1] * 10
+
+
+def test_names_skip_taken_ones_and_the_seed_is_repeatable():
+    taken = {"CSC 101 Auto 001", "CSC 101 Auto 003"}
+    groups, _ = form_groups(_students(12), "CSC 101", target_size=4, seed=7, taken=taken.__contains__)
+    assert groups["group_name"].tolist() == ["CSC 101 Auto 002", "CSC 101 Auto 004", "CSC 101 Auto 005"]
+    again, _ = form_groups(_students(12), "CSC 101", target_size=4, seed=7, taken=taken.__contains__)
+    assert again.equals(groups)
+
+
+def test_ungrouped_students_ignores_other_courses():
+    existing = pd.DataFrame([
+        ["2024-01-01", "A", "Arts", "General", "csc 101 ", "s0@x.edu, s1@x.edu, s2@x.edu", "", "a@x.edu"],
+        ["2024-01-01", "B", "Arts", "General", "CSC 102", "s3@x.edu, s4@x.edu, s5@x.edu", "", "a@x.edu"],
+    ], columns=GROUP_COLUMNS)
+    students = pd.concat([_students(8), _students(1)], ignore_index=True)      # s0 enrolled twice
+    roster = Roster(students, pd.DataFrame(columns=["Email", "Password"]), existing, ["CSC 101", "CSC 102"])
+    assert ungrouped_students(roster, "CSC 101")["email"].tolist() == [f"s{i}@x.edu" for i in range(3, 8)]
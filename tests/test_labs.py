@@ -0,0 +1,35 @@
+import logging
+
+from benchmarks.fakes import FakeGspreadClient
+from labs import LabCatalog
+from scheduler import RequestScheduler
+from storage import SheetsStorage
+
+
+def _storage(**sheets):
+    client = FakeGspreadClient()
+    for title, values in sheets.items():
+        client.load("sheet", title, values)
+    scheduler = RequestScheduler(10 ** 6, 10 ** 6, base_delay=0, max_delay=0, sleep=lambda s: None)
+    return SheetsStorage(client, scheduler=scheduler)
+
+
+def test_labs_by_course():
+    storage = _storage(Labs=[["Course", "Lab Name"], ["CSC 101", "Lab 2"], ["csc 101", "Lab 1"], ["MTH 101", ""]])
+    catalog = LabCatalog(storage, "sheet")
+    assert catalog.courses() == ["CSC 101"]
+    assert catalog.labs_for("Csc 101") == ["Lab 1", "Lab 2"]
+
+
+def test_missing_labs_tab_is_an_empty_catalog(caplog):
+    catalog = LabCatalog(_storage(groups=[["group_name"]]), "sheet")
+    with caplog.at_level(logging.WARNING, logger="labs"):
+        assert catalog.labs_for("CSC 101") == []
+    assert "No Labs sheet" in caplog.text
+
+
+def test_renamed_column_is_an_empty_catalog(caplog):
+    catalog = LabCatalog(_storage(Labs=[["Course", "Lab"], ["CSC 101", "Lab 1"]]), "sheet")
+    with caplog.at_level(logging.WARNING, logger="labs"):
+        assert catalog.courses() == []
+    assert "'Lab Name'" in caplog.text
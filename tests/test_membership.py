@@ -0,0 +1,19 @@
+import pandas as pd
+
+from membership import MembershipIndex, explode_members, split_members
+
+MEMBERS = "A@x.edu; b@x.edu  c@x.edu,d@x.edu ,"
+
+
+def test_split_and_explode_agree():
+    assert split_members(MEMBERS) == ["a@x.edu", "b@x.edu", "c@x.edu", "d@x.edu"]
+    exploded = explode_members(pd.DataFrame({"line": [2], "members": [MEMBERS]}))
+    assert exploded["email"].tolist() == split_members(MEMBERS)
+
+
+def test_index_finds_semicolon_separated_members():
+    index = MembershipIndex.from_df(pd.DataFrame([
+        {"group_name": "Team A", "course": "CSC 101", "members": MEMBERS, "member_names": "", "created_by": "a@x.edu"},
+    ]))
+    assert index.is_grouped("csc 101", "C@x.edu")
+    assert index.group_for("CSC 101", "d@x.edu")["group_name"] == "Team A"
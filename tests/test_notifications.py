@@ -0,0 +1,91 @@
+import socket
+import socketserver
+import threading
+from email.message import EmailMessage
+
+from notifications import FAILED, QUEUED, SENT, NotificationQueue
+
+
+def _closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _message(to):
+    msg = EmailMessage()
+    msg["From"] = "support@example.edu"
+    msg["To"] = to
+    msg["Subject"] = "Group created"
+    msg.set_content("hello")
+    return msg
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for ``smtplib``: no auth, no TLS, every message accepted."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 localhost test SMTP")
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == "QUIT":
+                self.reply("221 bye")
+                return
+            if command in ("EHLO", "HELO"):
+                self.reply("250 localhost")
+            elif command == "DATA":
+                self.reply("354 go ahead")
+                while self.rfile.readline().rstrip(b"\r\n") != b".":
+                    pass
+                self.server.messages += 1
+                self.reply("250 queued")
+            else:       # MAIL, RCPT, RSET, NOOP
+                self.reply("250 ok")
+
+
+class _GatedQueue(NotificationQueue):
+    """Worker waits for ``gate`` before taking its first batch."""
+
+    def __init__(self, *args, **kwargs):
+        self.gate = threading.Event()
+        super().__init__(*args, **kwargs)
+
+    def _run(self):
+        self.gate.wait(5)
+        super()._run()
+
+
+def test_batch_is_sent_over_one_connection():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPHandler)
+    server.connections = server.messages = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        notifier = _GatedQueue(host="127.0.0.1", port=server.server_address[1], starttls=False,
+                               backoff=0, timeout=5)
+        jobs = [notifier.submit(_message(f"s{i}@example.edu")) for i in range(5)]
+        assert [notifier.status(j)[0] for j in jobs] == [QUEUED] * 5
+        notifier.gate.set()
+        notifier.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert [notifier.status(j)[0] for j in jobs] == [SENT] * 5
+    assert server.messages == 5
+    assert server.connections == 1
+
+
+def test_unreachable_smtp_marks_jobs_failed():
+    notifier = NotificationQueue(host="127.0.0.1", port=_closed_port(), starttls=False,
+                                 max_retries=1, backoff=0, timeout=2)
+    job_id = notifier.submit(_message("student@example.edu"))
+    assert notifier.status(job_id)[0] in (QUEUED, FAILED)
+    notifier.join()
+    status, detail = notifier.status(job_id)
+    assert status == FAILED
+    assert detail
@@ -0,0 +1,95 @@
+import base64
+import json
+
+import notebook_preview
+import previews
+from benchmarks.fakes import FakeDriveService
+from notebook_preview import CELLS_PER_PAGE
+from previews import PreviewCache
+
+
+def _notebook(cells=3, image_every=1):
+    png = base64.b64encode(b"\x89PNG" + b"x" * 2000).decode()
+    return json.dumps({"cells": [
+        {"cell_type": "code", "source": f"plot({i})",
+         "outputs": [{"output_type": "display_data", "data": {"image/png": png}}] if i % image_every == 0 else []}
+        for i in range(cells)
+    ], "metadata": {}, "nbformat": 4}).encode()
+
+
+def _setup(tmp_path, monkeypatch, disk_bytes=10 ** 9, notebook=None):
+    cache = PreviewCache(str(tmp_path), disk_bytes=disk_bytes)
+    drive = FakeDriveService()
+    drive.put("nb", notebook or _notebook())
+    monkeypatch.setattr(previews, "get_preview_cache", lambda: cache)
+    monkeypatch.setattr(previews, "get_drive_service", lambda creds: drive)
+    return cache, drive
+
+
+def _count_summaries(monkeypatch):
+    summarised = []
+    original = notebook_preview._summary
+    monkeypatch.setattr(notebook_preview, "_summary", lambda c, *a: (summarised.append(c), original(c, *a))[1])
+    return summarised
+
+
+def test_notebook_images_are_trimmed_once_per_page(tmp_path, monkeypatch):
+    cache, drive = _setup(tmp_path, monkeypatch)
+    trims = []
+    original = cache.trim_disk
+    monkeypatch.setattr(cache, "trim_disk", lambda: (trims.append(1), original())[1])
+
+    preview = previews._load_preview(drive, "nb", "ipynb", cache)
+
+    cells = previews.load_page(None, preview, "nb", 1)
+    assert [o["kind"] for c in cells for o in c["outputs"]] == ["image"] * 3
+    # One trim for the page and its images, one for the preview itself
+    assert len(trims) == 2
+
+
+def test_cold_load_parses_only_the_first_page(tmp_path, monkeypatch):
+    cells = CELLS_PER_PAGE * 50 + 5
+    cache, drive = _setup(tmp_path, monkeypatch, notebook=_notebook(cells, image_every=7))
+    summarised = _count_summaries(monkeypatch)
+
+    preview = previews._load_preview(drive, "nb", "ipynb", cache)
+    assert summarised == list(range(CELLS_PER_PAGE))
+    assert (preview["pages"], preview["done"]) == (2, False)
+    assert [c["source"]["text"] for c in previews.load_page(None, preview, "nb", 1)][-1] == f"plot({CELLS_PER_PAGE - 1})"
+
+    # Later pages are parsed on demand, one at a time, from the text kept on disk
+    drive.api.reset()
+    for page in range(2, 52):
+        preview = cache.get(cache.cache_key("nb", preview["revision"]))
+        assert preview["pages"] == page
+        previews.load_page(None, preview, "nb", page)
+    preview = cache.get(cache.cache_key("nb", preview["revision"]))
+    assert (preview["pages"], preview["done"]) == (51, True)
+    assert previews.load_page(None, preview, "nb", 51)[-1]["source"]["text"] == f"plot({cells - 1})"
+    assert summarised == list(range(cells))
+    assert drive.api.calls == 0
+
+
+def test_empty_notebook_has_no_pages(tmp_path, monkeypatch):
+    cache, drive = _setup(tmp_path, monkeypatch, notebook=json.dumps({"cells": [], "metadata": {}}).encode())
+    preview = previews._load_preview(drive, "nb", "ipynb", cache)
+    assert (preview["pages"], preview["done"]) == (0, True)
+
+
+def test_evicted_image_is_extracted_again(tmp_path, monkeypatch):
+    # Too small to keep any image (or the notebook text) on disk
+    cache, drive = _setup(tmp_path, monkeypatch, disk_bytes=100,
+                          notebook=_notebook(CELLS_PER_PAGE * 3, image_every=CELLS_PER_PAGE))
+    preview = previews._load_preview(drive, "nb", "ipynb", cache)
+    previews.load_page(None, preview, "nb", 2)
+    preview = cache.get(cache.cache_key("nb", preview["revision"]))
+    ref = previews.load_page(None, preview, "nb", 3)[0]["outputs"][0]["ref"]
+    assert cache.get(previews._image_key(cache, "nb", preview["revision"], ref)) is None
+
+    summarised = _count_summaries(monkeypatch)
+    mime, b64 = previews.load_image(None, preview, "nb", ref)
+
+    assert mime == "image/png"
+    assert base64.b64decode(b64).startswith(b"\x89PNG")
+    # Only the image's page is parsed again
+    assert summarised == list(range(CELLS_PER_PAGE * 2, CELLS_PER_PAGE * 3))
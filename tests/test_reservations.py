@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+from membership import MembershipIndex
+from reservations import DuplicateGroupName, GroupReservations, MembersAlreadyGrouped, idempotency_key
+
+
+class FakeRoster:
+    """Just the part of ``Roster`` the reservations use, plus a log of appended rows."""
+
+    def __init__(self):
+        self.groups_index = MembershipIndex()
+        self.appended = []
+
+    def writer(self, course, group_name, members, delay=0.05):
+        def write():
+            time.sleep(delay)       # a slow Sheets append widens the race
+            row = {"course": course, "group_name": group_name, "members": ", ".join(members),
+                   "member_names": "", "created_by": members[0]}
+            self.appended.append(row)
+            self.groups_index.add(row)
+            return row
+        return write
+
+
+def _race(reservations, roster, attempts):
+    """Runs every ``(course, group_name, members)`` commit at once; returns the outcome of each."""
+    start = threading.Barrier(len(attempts))
+    outcomes = [None] * len(attempts)
+
+    def run(i, course, group_name, members):
+        key = idempotency_key(members[0], course, group_name, members)
+        start.wait()
+        try:
+            outcomes[i] = reservations.commit(key, course, group_name, members, roster,
+                                              roster.writer(course, group_name, members))[1]
+        except (DuplicateGroupName, MembersAlreadyGrouped) as e:
+            outcomes[i] = type(e)
+
+    threads = [threading.Thread(target=run, args=(i, *a)) for i, a in enumerate(attempts)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    return outcomes
+
+
+def test_overlapping_members_in_one_course_only_one_wins():
+    roster = FakeRoster()
+    outcomes = _race(GroupReservations(), roster, [
+        ("CSC 101", "Team A", ["a@x.edu", "b@x.edu"]),
+        ("CSC 101", "Team B", ["b@x.edu", "c@x.edu"]),
+    ])
+    assert sorted(outcomes, key=str) == sorted([True, MembersAlreadyGrouped], key=str)
+    assert len(roster.appended) == 1
+
+
+def test_same_group_name_in_two_courses_only_one_wins():
+    roster = FakeRoster()
+    outcomes = _race(GroupReservations(), roster, [
+        ("CSC 101", "Team A", ["a@x.edu", "b@x.edu"]),
+        ("MTH 101", "team a ", ["c@x.edu", "d@x.edu"]),
+    ])
+    assert sorted(outcomes, key=str) == sorted([True, DuplicateGroupName], key=str)
+    assert len(roster.appended) == 1
+
+
+def test_replayed_key_returns_the_first_row_and_appends_nothing():
+    roster = FakeRoster()
+    reservations = GroupReservations()
+    members = ["a@x.edu", "b@x.edu"]
+    key = idempotency_key("a@x.edu", "CSC 101", "Team A", members)
+    write = roster.writer("CSC 101", "Team A", members, delay=0)
+
+    row, created = reservations.commit(key, "CSC 101", "Team A", members, roster, write)
+    again, created_again = reservations.commit(key, "CSC 101", "Team A", members, roster, write)
+    assert created and not created_again
+    assert again is row
+    assert len(roster.appended) == 1
+
+
+def test_bulk_commit_is_all_or_nothing_and_idempotent():
+    roster = FakeRoster()
+    reservations = GroupReservations()
+    reservations.commit("single", "CSC 101", "Team A", ["a@x.edu"], roster,
+                        roster.writer("CSC 101", "Team A", ["a@x.edu"], delay=0))
+    groups = [("CSC 101", "Team B", ["b@x.edu"]), ("MTH 101", "Team C", ["c@x.edu"])]
+
+    def write():
+        return [roster.writer(c, n, m, delay=0)() for c, n, m in groups]
+
+    with pytest.raises(MembersAlreadyGrouped):
+        reservations.commit_bulk("clash", groups + [("CSC 101", "Team D", ["a@x.edu"])], roster, write)
+    assert len(roster.appended) == 1
+
+    rows, created = reservations.commit_bulk("bulk", groups, roster, write)
+    assert created and len(rows) == 2
+    assert reservations.commit_bulk("bulk", groups, roster, write) == (rows, False)
+    assert len(roster.appended) == 3
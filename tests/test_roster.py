@@ -0,0 +1,89 @@
+import threading
+
+import pandas as pd
+
+from benchmarks.fakes import FakeGspreadClient
+from benchmarks.run import build_roster
+from benchmarks.synthetic import GROUP_LOG_SHEET, Dataset
+from roster import CredentialIndex
+from scheduler import RequestScheduler
+from storage import SheetsStorage
+
+
+def test_sync_groups_fetches_outside_the_roster_lock():
+    data = Dataset(students=50, grouped=0.4, seed=3)
+    client = FakeGspreadClient()
+    data.load_into(client)
+    storage = SheetsStorage(client, scheduler=RequestScheduler(10 ** 6, 10 ** 6))
+    roster = build_roster(storage, data)
+    course = data.course
+
+    # Another process appends a group, then this one's sync stalls on the read
+    other = list(data.groups[1])
+    other[1], other[5] = "Elsewhere", "late@bench.example.edu"
+    client.spreadsheets[GROUP_LOG_SHEET].sheets["groups"].append_row(other)
+    fetching, release = threading.Event(), threading.Event()
+    read_values_from = storage.read_values_from
+
+    def slow_read_values_from(*args, **kwargs):
+        fetching.set()
+        release.wait(5)
+        return read_values_from(*args, **kwargs)
+    storage.read_values_from = slow_read_values_from
+
+    syncer = threading.Thread(target=roster.sync_groups)
+    syncer.start()
+    assert fetching.wait(5)
+
+    # Other sessions' lookups don't wait for the read in flight
+    done = threading.Event()
+
+    def session():
+        roster.groups_df
+        roster.groups_index.is_grouped(course, data.groups[1][7])
+        done.set()
+    threading.Thread(target=session).start()
+    assert done.wait(2)
+
+    release.set()
+    syncer.join(5)
+    assert not syncer.is_alive()
+    assert roster.groups_index.is_grouped(course, "late@bench.example.edu")
+    assert "Elsewhere" in set(roster.groups_df["group_name"])
+
+
+# ========== CredentialIndex ==========
+def _credentials():
+    students = pd.DataFrame([
+        {"email": " Ana@X.edu ", "student_id": " 1001 ", "first_name": "Ana"},
+        {"email": "ana@x.edu", "student_id": "1001", "first_name": "Duplicate"},
+        {"email": "ana@x.edu", "student_id": "2002", "first_name": "Second id"},
+        {"email": "both@x.edu", "student_id": "3003", "first_name": "Both"},
+    ])
+    login = pd.DataFrame({"Email": ["ADMIN@x.edu ", "both@x.edu"], "Password": [" secret", "3003"]})
+    return CredentialIndex(students, login)
+
+
+def test_credentials_normalise_case_and_whitespace():
+    credentials = _credentials()
+    assert credentials.lookup("  ANA@x.EDU", "1001 ")[0] == "student"
+    assert credentials.lookup("admin@X.EDU", "secret ") == ("admin", None)
+
+
+def test_first_student_row_wins_per_email_and_id():
+    credentials = _credentials()
+    assert credentials.lookup("ana@x.edu", "1001")[1]["first_name"] == "Ana"
+    assert credentials.lookup("ana@x.edu", "2002")[1]["first_name"] == "Second id"
+
+
+def test_students_are_checked_before_admins():
+    role, record = _credentials().lookup("both@x.edu", "3003")
+    assert (role, record["first_name"]) == ("student", "Both")
+
+
+def test_wrong_password_or_email_is_rejected():
+    credentials = _credentials()
+    assert credentials.lookup("ana@x.edu", "9999") is None
+    assert credentials.lookup("admin@x.edu", "1001") is None
+    assert credentials.lookup("nobody@x.edu", "secret") is None
+    assert credentials.lookup("ana@x.edu", "") is None
@@ -0,0 +1,112 @@
+import threading
+
+import gspread
+import pytest
+import requests
+
+import scheduler
+from benchmarks.fakes import FakeGspreadClient
+from scheduler import RequestScheduler, TokenBucket
+from storage import SheetsStorage
+
+
+def _api_error(code):
+    response = requests.Response()
+    response.status_code = code
+    response._content = b'{"error": {"code": %d, "message": "failed"}}' % code
+    return gspread.exceptions.APIError(response)
+
+
+class FakeClock:
+    """``clock`` / ``sleep`` pair where sleeping just moves the clock on."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+def _flaky(failures):
+    """A call that raises each of ``failures`` in turn, then returns "ok"; ``calls`` counts attempts."""
+    failures = list(failures)
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+    return fn, calls
+
+
+def test_concurrent_identical_reads_share_one_call():
+    client = FakeGspreadClient(latency=0.2)
+    client.load("sheet", "groups", [["group_name"], ["Team A"]])
+    storage = SheetsStorage(client, scheduler=RequestScheduler(10 ** 6, 10 ** 6))
+    storage.worksheet("sheet", "groups")        # warm the handle cache
+    client.api.reset()
+
+    start = threading.Barrier(8)
+    results = []
+
+    def read():
+        start.wait()
+        results.append(storage.read_values("sheet", "groups"))
+    threads = [threading.Thread(target=read) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+
+    assert results == [[["group_name"], ["Team A"]]] * 8
+    assert client.api.by_method == {"get_all_values": 1}
+    assert storage.scheduler.coalesced == 7
+
+
+def test_token_bucket_paces_calls_after_the_burst():
+    clock = FakeClock()
+    bucket = TokenBucket(per_minute=60, burst=2, clock=clock.clock, sleep=clock.sleep)
+    for _ in range(5):
+        bucket.acquire()
+    # Two from the burst, then one per second at 60/min
+    assert clock.now == pytest.approx(3.0)
+
+
+def test_429s_are_retried_with_growing_jittered_backoff(monkeypatch):
+    clock = FakeClock()
+    sched = RequestScheduler(10 ** 6, 10 ** 6, base_delay=1.0, max_delay=3.0, sleep=clock.sleep)
+    bounds = []
+    monkeypatch.setattr(scheduler.random, "uniform", lambda low, high: bounds.append((low, high)) or high / 2)
+    fn, calls = _flaky([_api_error(429)] * 3)
+
+    assert sched.call("read", fn) == "ok"
+    assert len(calls) == 4
+    # Full jitter: a random wait up to base * 2^attempt, capped at max_delay
+    assert bounds == [(0, 1.0), (0, 2.0), (0, 3.0)]
+    assert clock.slept == [0.5, 1.0, 1.5]
+
+
+def test_retries_stop_after_max_retries():
+    sched = RequestScheduler(10 ** 6, 10 ** 6, max_retries=2, base_delay=0, sleep=lambda s: None)
+    fn, calls = _flaky([_api_error(503)] * 5)
+    with pytest.raises(gspread.exceptions.APIError):
+        sched.call("read", fn)
+    assert len(calls) == 3
+
+
+def test_non_idempotent_writes_retry_429_but_not_5xx():
+    sched = RequestScheduler(10 ** 6, 10 ** 6, base_delay=0, sleep=lambda s: None)
+    fn, calls = _flaky([_api_error(429)])
+    assert sched.call("write", fn, idempotent=False) == "ok"
+    assert len(calls) == 2
+
+    fn, calls = _flaky([_api_error(503)])
+    with pytest.raises(gspread.exceptions.APIError):
+        sched.call("write", fn, idempotent=False)
+    assert len(calls) == 1
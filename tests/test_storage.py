@@ -0,0 +1,98 @@
+import gspread
+import requests
+
+from benchmarks.fakes import FakeGspreadClient
+from scheduler import RequestScheduler
+from storage import SheetsStorage, SQLiteStorage
+
+
+def _api_error(code):
+    response = requests.Response()
+    response.status_code = code
+    response._content = b'{"error": {"code": %d, "message": "failed"}}' % code
+    return gspread.exceptions.APIError(response)
+
+
+def _storage():
+    client = FakeGspreadClient()
+    client.load("sheet", "groups", [["group_name"], ["Team A"]])
+    scheduler = RequestScheduler(10 ** 6, 10 ** 6, base_delay=0, max_delay=0, sleep=lambda s: None)
+    return client, SheetsStorage(client, scheduler=scheduler)
+
+
+def _fail_first(client, code, times=2):
+    ws = client.spreadsheets["sheet"].sheets["groups"]
+    real = ws.get_all_values
+    failures = [code] * times
+
+    def get_all_values():
+        if failures:
+            failures.pop()
+            raise _api_error(code)
+        return real()
+    ws.get_all_values = get_all_values
+
+
+def test_429_retry_keeps_the_worksheet_handle():
+    client, storage = _storage()
+    storage.read_values("sheet", "groups")          # warms the handle cache
+    client.api.reset()
+    _fail_first(client, 429)
+
+    assert storage.read_values("sheet", "groups") == [["group_name"], ["Team A"]]
+    assert "open_by_key" not in client.api.by_method
+    assert "worksheet" not in client.api.by_method
+
+
+def test_404_refetches_the_worksheet_handle():
+    client, storage = _storage()
+    storage.read_values("sheet", "groups")
+    client.api.reset()
+    _fail_first(client, 404, times=1)
+
+    try:
+        storage.read_values("sheet", "groups")
+    except gspread.exceptions.APIError:
+        pass
+    storage.read_values("sheet", "groups")
+    assert client.api.by_method.get("worksheet") == 1
+
+
+def test_sqlite_primary_imports_missing_tables_from_sheets(tmp_path):
+    client, sheets = _storage()
+    sqlite = SQLiteStorage(str(tmp_path / "app.sqlite3"), seed=sheets)
+
+    assert sqlite.find_rows("sheet", "groups", group_name="team a")["group_name"].tolist() == ["Team A"]
+    sqlite.append_row("sheet", "groups", ["Team B"])
+    assert client.spreadsheets["sheet"].sheets["groups"].get_all_values() == [["group_name"], ["Team A"]]
+
+    # Imported once; a table missing from the Sheets too starts empty
+    client.api.reset()
+    assert sqlite.read_values("sheet", "groups") == [["group_name"], ["Team A"], ["Team B"]]
+    sqlite.ensure_table("sheet", "Submissions", header=["Timestamp"])
+    assert sqlite.read_values("sheet", "Submissions") == [["Timestamp"]]
+    assert "get_all_values" not in client.api.by_method
+
+
+def test_sqlite_primary_retries_a_failed_import(tmp_path):
+    client, sheets = _storage()
+    sheets.scheduler.max_retries = 0
+    sqlite = SQLiteStorage(str(tmp_path / "app.sqlite3"), seed=sheets)
+    _fail_first(client, 503, times=1)
+
+    try:
+        sqlite.read_values("sheet", "groups")
+        assert False, "the 503 should reach the caller"
+    except gspread.exceptions.APIError:
+        pass
+    # Nothing half-imported is left behind, and the next use imports for real
+    assert not sqlite._lookup("sheet", "groups")
+    sqlite.ensure_table("sheet", "groups", header=["group_name"])
+    assert sqlite.read_values("sheet", "groups") == [["group_name"], ["Team A"]]
+
+
+def test_sqlite_replace_values_keeps_the_rows_above_start_row(tmp_path):
+    sqlite = SQLiteStorage(str(tmp_path / "app.sqlite3"))
+    sqlite.replace_table("sheet", "t", [["name"], ["a"], ["b"], ["c"], ["d"]])
+    sqlite.replace_values("sheet", "t", [["d"]], old_rows=5, start_row=3)
+    assert sqlite.read_values("sheet", "t") == [["name"], ["a"], ["d"]]
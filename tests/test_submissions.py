@@ -0,0 +1,142 @@
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import student_submission_page
+from benchmarks.fakes import FakeGspreadClient
+from config import secret_flag
+from scheduler import RequestScheduler
+from storage import SheetsStorage, SQLiteStorage
+from submissions import SUBMISSION_COLUMNS, SubmissionsTable
+
+GROUP_LOG = "group-log-sheet"
+STUDENTS = "student-sheet"
+
+
+def _student_page():
+    import streamlit as st
+    from student_submission_page import student_submission_page
+    student_submission_page({"group_name": "Team A"}, "CSC 101", "a@x.edu",
+                            st.session_state.storage, st.session_state.group_log_sheet_id, None)
+
+
+def _grading_page():
+    from grading_page import grading_page
+    grading_page()
+
+
+def _app(script, storage, tmp_path):
+    at = AppTest.from_function(script)
+    at.secrets["google_service_account"] = {
+        "drive_folder_id": "folder", "preview_cache_dir": str(tmp_path / "previews"),
+    }
+    at.session_state["storage"] = storage
+    at.session_state["student_sheet_id"] = STUDENTS
+    at.session_state["group_log_sheet_id"] = GROUP_LOG
+    return at
+
+
+def test_grading_page_sees_submissions_from_the_student_page(tmp_path, monkeypatch):
+    st.cache_resource.clear()
+    storage = SQLiteStorage(str(tmp_path / "app.db"))
+    storage.replace_table(GROUP_LOG, "Labs", [["Course", "Lab Name"], ["CSC 101", "Lab 1"]])
+    monkeypatch.setattr(student_submission_page, "upload_file",
+                        lambda *args, **kwargs: "https://drive.google.com/file/d/abc/view?usp=sharing")
+
+    upload = tmp_path / "lab1.pdf"
+    upload.write_bytes(b"%PDF")
+    student = _app(_student_page, storage, tmp_path)
+    student.session_state["uploaded_file_path"] = str(upload)
+    student.session_state["uploaded_file_name"] = "lab1.pdf"
+    student.session_state["uploaded_file_id"] = "upload-1"
+    student.run()
+    student.button[0].click().run()
+    assert not student.exception
+    assert any("Submission already made" in s.value for s in student.success)
+
+    grading = _app(_grading_page, storage, tmp_path).run()
+    assert not grading.exception
+    assert any("Team A" in m.value for m in grading.markdown)
+    # Nothing was created in the roster spreadsheet
+    assert not storage.has_table(STUDENTS, "Submissions")
+
+
+# ========== SubmissionsTable ==========
+def _submission(n, lab="Lab 1"):
+    return [f"2024-01-0{n % 9 + 1} 10:00:00", f"Team {n}", "CSC 101", lab, f"s{n}@x.edu",
+            "lab.ipynb", f"https://drive.google.com/file/d/f{n}/view?usp=sharing", "No", "", ""]
+
+
+def _table(rows=5, **kwargs):
+    client = FakeGspreadClient()
+    client.load(GROUP_LOG, "Submissions", [SUBMISSION_COLUMNS] + [_submission(n) for n in range(rows)])
+    storage = SheetsStorage(client, scheduler=RequestScheduler(10 ** 6, 10 ** 6))
+    return client.spreadsheets[GROUP_LOG].sheets["Submissions"], SubmissionsTable(storage, GROUP_LOG, **kwargs)
+
+
+def test_delete_writes_a_tombstone_and_keeps_row_numbers():
+    sheet, table = _table()
+    assert table.locate("Team 3", "CSC 101", "Lab 1") == 5
+    assert table.delete("team 1", "csc 101", "lab 1")
+
+    assert table.find("Team 1", "CSC 101", "Lab 1") is None
+    assert sheet.values[2][SUBMISSION_COLUMNS.index("deleted_at")]     # the row stays, tombstoned
+    assert len(sheet.values) == 6
+    assert table.locate("Team 3", "CSC 101", "Lab 1") == 5
+
+
+def test_resubmitting_after_a_delete_is_the_live_row():
+    sheet, table = _table()
+    table.delete("Team 1", "CSC 101", "Lab 1")
+    table.add(_submission(1)[:-1] + [""])
+    assert table.locate("Team 1", "CSC 101", "Lab 1") == 7
+    assert table.set_grade("Team 1", "CSC 101", "Lab 1", "85")
+    assert sheet.values[6][SUBMISSION_COLUMNS.index("grade")] == "85"
+    assert sheet.values[2][SUBMISSION_COLUMNS.index("grade")] == ""
+
+    table.refresh()
+    assert table.find("Team 1", "CSC 101", "Lab 1")["grade"] == "85"
+
+
+def test_compaction_rewrites_from_the_first_tombstone():
+    sheet, table = _table(rows=6, compact_after=2)
+    table.delete("Team 2", "CSC 101", "Lab 1")
+    table.delete("Team 4", "CSC 101", "Lab 1")      # second tombstone – compacts
+
+    names = [r[1] for r in sheet.values[1:]]
+    assert names == ["Team 0", "Team 1", "Team 3", "Team 5"]
+    assert sheet.last_value_input_option == "USER_ENTERED"
+    assert table.locate("Team 5", "CSC 101", "Lab 1") == 5
+    assert table.set_grade("Team 5", "CSC 101", "Lab 1", "70")
+    assert sheet.values[4][SUBMISSION_COLUMNS.index("grade")] == "70"
+
+
+def test_compaction_rereads_when_a_row_was_appended_meanwhile():
+    sheet, table = _table(rows=4)
+    table.delete("Team 1", "CSC 101", "Lab 1")
+    read_values_from = table.storage.read_values_from
+    appended = []
+
+    def append_first(*args, **kwargs):
+        # Another process appends between compaction's read and its write
+        if not appended:
+            appended.append(sheet.append_row(_submission(9, lab="Lab 2")))
+        return read_values_from(*args, **kwargs)
+    table.storage.read_values_from = append_first
+
+    assert table.compact() == 1
+    assert [r[1] for r in sheet.values[1:]] == ["Team 0", "Team 2", "Team 3", "Team 9"]
+    assert table.locate("Team 9", "CSC 101", "Lab 2") == 5
+
+
+@pytest.mark.parametrize("value, expected", [
+    (True, True), (False, False), ("false", False), ("False ", False), ("0", False),
+    ("no", False), ("true", True), ("yes", True), ("1", True),
+])
+def test_secret_flag_parses_strings(value, expected):
+    assert secret_flag({"submissions_soft_delete": value}, "submissions_soft_delete", True) is expected
+
+
+def test_secret_flag_rejects_anything_else():
+    with pytest.raises(ValueError):
+        secret_flag({"flag": "maybe"}, "flag")
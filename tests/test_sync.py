@@ -0,0 +1,74 @@
+import pandas as pd
+
+from benchmarks.fakes import FakeGspreadClient
+from roster import GROUP_COLUMNS, Roster
+from scheduler import RequestScheduler
+from storage import SheetsStorage
+from sync import IncrementalTable
+
+
+def _group(n, course="CSC 101"):
+    email = f"s{n}@x.edu"
+    return [f"2024-01-01 00:00:{n:02d}", f"Team {n}", "Computing", "Computer Science", course, email, f"S {n}", email]
+
+
+def _setup(groups=3):
+    client = FakeGspreadClient()
+    client.load("sheet", "groups", [list(GROUP_COLUMNS)] + [_group(n) for n in range(groups)])
+    storage = SheetsStorage(client, scheduler=RequestScheduler(10 ** 6, 10 ** 6))
+    table = IncrementalTable(storage, "sheet", "groups")
+    table.seed(storage.read_values("sheet", "groups"))
+    return client.spreadsheets["sheet"].sheets["groups"], storage, table
+
+
+def _roster(table):
+    students = pd.DataFrame(columns=["first_name", "last_name", "email", "student_id", "faculty", "program"])
+    return Roster(students, pd.DataFrame(columns=["Email", "Password"]), table.frame(), ["CSC 101"], groups_sync=table)
+
+
+def test_sync_reads_only_the_appended_rows():
+    sheet, _, table = _setup()
+    sheet.append_row(_group(3))
+    assert table.sync() == ([_group(3)], False)
+    assert table.sync() == ([], False)
+
+
+def test_anchor_mismatch_falls_back_to_a_full_resync():
+    sheet, _, table = _setup()
+    sheet.delete_rows(4)                    # the last row – our anchor – is gone
+    sheet.append_row(_group(7))
+    rows, full = table.sync()
+    assert full
+    assert rows == [_group(0), _group(1), _group(7)]
+    assert table.values == sheet.get_all_values()
+
+
+def test_row_fetched_by_a_sync_before_note_appended_is_kept_once():
+    sheet, storage, table = _setup()
+    roster = _roster(table)
+    mine = _group(3)
+    note_appended = table.note_appended
+
+    def sync_first(row):
+        # Another session's sync runs between our append and our note_appended
+        roster.sync_groups()
+        return note_appended(row)
+    table.note_appended = sync_first
+
+    storage.append_row("sheet", "groups", mine)
+    roster.add_group(mine)
+
+    assert roster.groups_df["group_name"].tolist() == ["Team 0", "Team 1", "Team 2", "Team 3"]
+    assert table.values == sheet.get_all_values()
+    assert table.sync() == ([], False)      # the anchor still matches – no full reload
+
+
+def test_add_group_after_a_full_resync_that_included_it():
+    sheet, storage, table = _setup()
+    roster = _roster(table)
+    sheet.delete_rows(2)
+    storage.append_row("sheet", "groups", _group(3))
+    roster.sync_groups()                    # anchor mismatch → full reload, already has Team 3
+    roster.add_group(_group(3))
+    assert roster.groups_df["group_name"].tolist() == ["Team 1", "Team 2", "Team 3"]
+    assert roster.groups_index.is_grouped("CSC 101", "s3@x.edu")
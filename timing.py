@@ -0,0 +1,49 @@
+"""
+Startup / rerun timing.
+
+``RunTimer`` is created at the top of every script run and ``mark``-ed
+after each phase (imports, login form, roster, page).  The first run in a
+process is logged as the cold-start report, so the time from a container
+restart to the first painted login page shows up in the logs; admins also
+see the current run's breakdown in the sidebar.  Pages keep their own
+timer with a ``prefix``; every mark is also a ``tracing`` section.
+"""
+
+import logging
+import threading
+import time
+
+import tracing
+
+_lock = threading.Lock()
+_first_run_logged = False
+
+
+class RunTimer:
+    def __init__(self, started=None, prefix=""):
+        self.started = started if started is not None else time.perf_counter()
+        self.prefix = prefix
+        self.marks = []         # (phase, seconds since the previous mark)
+        self._last = self.started
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.marks.append((phase, now - self._last))
+        tracing.section(self.prefix + phase, now - self._last)
+        self._last = now
+
+    @property
+    def total(self):
+        return self._last - self.started
+
+    def summary(self):
+        parts = [f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in self.marks]
+        return " · ".join(parts + [f"total {self.total * 1000:.0f} ms"])
+
+    def report(self, label):
+        """Logs the breakdown – at INFO for the process's first run (the cold start), DEBUG after."""
+        global _first_run_logged
+        with _lock:
+            first, _first_run_logged = not _first_run_logged, True
+        logging.log(logging.INFO if first else logging.DEBUG, "%s%s: %s",
+                    "cold start – " if first else "", label, self.summary())
@@ -0,0 +1,346 @@
+"""
+Per-rerun tracing of external calls and page sections.
+
+Every Sheets, Drive and SMTP call goes through ``call`` and every
+``RunTimer.mark`` through ``section``; each is counted with its latency,
+payload size (bytes sent + received, estimated from the values) and
+whether it failed.  Numbers are kept for the current script run, for
+each session and for the whole process:
+
+* the admin "Metrics" tab shows all three,
+* finished runs are appended as one JSON object per line to ``log_path``,
+* process totals are written to ``prometheus_path`` in the Prometheus
+  text format (at most every ``prometheus_interval`` seconds).
+
+Tracing is off unless ``tracing_enabled`` is set in the secrets; off,
+``call`` is one flag check in front of the real call and nothing is stored.
+
+A run ends when its session starts the next one (Streamlit has no
+end-of-script hook, and ``st.stop`` / ``st.rerun`` leave by exception),
+or after ``idle_timeout`` seconds without activity.  Work started from a
+run on other threads is attributed to it when the thread runs inside a
+copy of the run's context (``contextvars.copy_context``) or ``attach``.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+from email.message import Message
+from itertools import chain
+
+from config import secret_flag
+
+log = logging.getLogger(__name__)
+
+# Latency histogram buckets (seconds) for the Prometheus output
+BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_enabled = False
+_current = contextvars.ContextVar("tracing_run", default=None)
+
+
+# ========== Aggregates ==========
+class Stat:
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "bytes", "buckets")
+
+    def __init__(self, histogram=False):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.bytes = 0
+        self.buckets = [0] * len(BUCKETS) if histogram else None
+
+    def add(self, seconds, size, error):
+        self.calls += 1
+        self.errors += bool(error)
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.bytes += size
+        if self.buckets is not None:
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    self.buckets[i] += 1
+                    break
+
+    def as_dict(self):
+        return {"calls": self.calls, "errors": self.errors, "ms": round(self.seconds * 1000, 2),
+                "max_ms": round(self.max_seconds * 1000, 2), "bytes": self.bytes}
+
+
+def _rows(stats):
+    """``{(kind, op): Stat}`` → list of flat dicts, slowest first."""
+    return [
+        {"kind": kind, "op": op, **stat.as_dict()}
+        for (kind, op), stat in sorted(stats.items(), key=lambda item: -item[1].seconds)
+    ]
+
+
+class Run:
+    """One script run of one session."""
+
+    def __init__(self, session_id, started=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.session_id = session_id
+        self.started_at = time.time()
+        self.started = started if started is not None else time.perf_counter()
+        self.last_activity = time.perf_counter()
+        self.stats = {}         # (kind, op) -> Stat
+        self.sections = []      # (name, seconds) in order
+        self.finished = False
+
+    def as_dict(self):
+        return {
+            "run": self.id,
+            "session": self.session_id,
+            "started": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="milliseconds"),
+            "ms": round((self.last_activity - self.started) * 1000, 2),
+            "sections": [{"name": name, "ms": round(seconds * 1000, 2)} for name, seconds in self.sections],
+            "calls": _rows({k: v for k, v in self.stats.items() if k[0] != "section"}),
+        }
+
+
+class Tracer:
+    def __init__(self, keep_sessions=1000, keep_runs=200, idle_timeout=300):
+        self.keep_sessions = keep_sessions
+        self.idle_timeout = idle_timeout
+        self.log_path = None
+        self.prometheus_path = None
+        self.prometheus_interval = 15
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._totals = {}                   # (kind, op) -> Stat with histogram
+        self._sessions = OrderedDict()      # session id -> {(kind, op): Stat}
+        self._open = {}                     # session id -> its current Run
+        self._recent = deque(maxlen=keep_runs)
+        self._prometheus_written = 0.0
+
+    # ---------- recording ----------
+    def record(self, run, kind, op, seconds, size=0, error=False):
+        key = (kind, op)
+        with self._lock:
+            total = self._totals.get(key)
+            if total is None:
+                total = self._totals[key] = Stat(histogram=True)
+            total.add(seconds, size, error)
+            if run is None:
+                return
+            session = self._session_locked(run.session_id)
+            session.setdefault(key, Stat()).add(seconds, size, error)
+            if not run.finished:
+                run.stats.setdefault(key, Stat()).add(seconds, size, error)
+                run.last_activity = time.perf_counter()
+                if kind == "section":
+                    run.sections.append((op, seconds))
+
+    def _session_locked(self, session_id):
+        session = self._sessions.get(session_id)
+        if session is None:
+            session = self._sessions[session_id] = {}
+            while len(self._sessions) > self.keep_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    # ---------- run lifecycle ----------
+    def begin_run(self, session_id, started=None):
+        run = Run(session_id, started)
+        now = time.perf_counter()
+        with self._lock:
+            ended = [r for r in self._open.values()
+                     if r.session_id == session_id or now - r.last_activity > self.idle_timeout]
+            for r in ended:
+                r.finished = True
+                del self._open[r.session_id]
+                self._recent.append(r)
+            self._open[session_id] = run
+            self._session_locked(session_id)
+            write_prometheus = (self.prometheus_path
+                                and time.monotonic() - self._prometheus_written >= self.prometheus_interval)
+            if write_prometheus:
+                self._prometheus_written = time.monotonic()
+        for r in ended:
+            self._log_run(r)
+        if write_prometheus:
+            self.write_prometheus(self.prometheus_path)
+        return run
+
+    def _log_run(self, run):
+        line = json.dumps(run.as_dict(), separators=(",", ":"))
+        log.debug("%s", line)
+        if self.log_path:
+            try:
+                with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+            except OSError as e:
+                log.warning("Could not write trace log %s: %s", self.log_path, e)
+
+    # ---------- views ----------
+    def snapshot(self, run):
+        """``run.as_dict()`` taken under the lock (the run may still be recording)."""
+        with self._lock:
+            return run.as_dict()
+
+    def totals(self):
+        with self._lock:
+            return _rows(self._totals)
+
+    def session_totals(self, session_id):
+        with self._lock:
+            return _rows(self._sessions.get(session_id, {}))
+
+    def recent_runs(self, session_id=None):
+        """Finished runs, newest first (only ``session_id``'s if given)."""
+        with self._lock:
+            runs = [r for r in reversed(self._recent) if session_id is None or r.session_id == session_id]
+            return [r.as_dict() for r in runs]
+
+    def session_count(self):
+        with self._lock:
+            return len(self._sessions)
+
+    def prometheus_text(self):
+        """Process totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = sorted(self._totals.items())
+            sessions = len(self._sessions)
+        lines = [
+            "# HELP app_calls_total External calls and page sections, by kind and operation.",
+            "# TYPE app_calls_total counter",
+        ]
+        lines += [f'app_calls_total{{kind="{k}",op="{_label(o)}"}} {s.calls}' for (k, o), s in totals]
+        lines += ["# HELP app_call_errors_total Calls that raised.", "# TYPE app_call_errors_total counter"]
+        lines += [f'app_call_errors_total{{kind="{k}",op="{_label(o)}"}} {s.errors}' for (k, o), s in totals]
+        lines += ["# HELP app_call_bytes_total Estimated payload bytes sent + received.",
+                  "# TYPE app_call_bytes_total counter"]
+        lines += [f'app_call_bytes_total{{kind="{k}",op="{_label(o)}"}} {s.bytes}' for (k, o), s in totals]
+        lines += ["# HELP app_call_seconds Call / section latency.", "# TYPE app_call_seconds histogram"]
+        for (kind, op), stat in totals:
+            labels = f'kind="{kind}",op="{_label(op)}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, stat.buckets):
+                cumulative += count
+                lines.append(f'app_call_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'app_call_seconds_bucket{{{labels},le="+Inf"}} {stat.calls}')
+            lines.append(f"app_call_seconds_sum{{{labels}}} {stat.seconds:.6f}")
+            lines.append(f"app_call_seconds_count{{{labels}}} {stat.calls}")
+        lines += ["# HELP app_sessions Sessions seen by this process (capped).", "# TYPE app_sessions gauge",
+                  f"app_sessions {sessions}"]
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Atomically replaces ``path`` (for node_exporter's textfile collector or similar)."""
+        tmp = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(self.prometheus_text())
+            os.replace(tmp, path)
+        except OSError as e:
+            log.warning("Could not write metrics file %s: %s", path, e)
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", " ")
+
+
+tracer = Tracer()
+
+
+# ========== Module API ==========
+def configure_from_secrets(secrets):
+    """Reads ``tracing_enabled``, ``tracing_log_path``, ``tracing_prometheus_path`` and ``tracing_prometheus_interval``."""
+    global _enabled
+    _enabled = secret_flag(secrets, "tracing_enabled", False)
+    tracer.log_path = secrets.get("tracing_log_path") or None
+    tracer.prometheus_path = secrets.get("tracing_prometheus_path") or None
+    tracer.prometheus_interval = float(secrets.get("tracing_prometheus_interval", 15))
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(value):
+    global _enabled
+    _enabled = bool(value)
+
+
+def begin_run(session_id, started=None):
+    """Starts the calling thread's run for ``session_id`` (ending that session's previous one)."""
+    run = tracer.begin_run(session_id, started) if _enabled else None
+    _current.set(run)
+    return run
+
+
+def current_run():
+    return _current.get()
+
+
+class attach:
+    """``with attach(run):`` – calls made inside count towards ``run`` (used by worker threads)."""
+
+    def __init__(self, run):
+        self.run = run
+
+    def __enter__(self):
+        self._token = _current.set(self.run)
+        return self.run
+
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+
+
+def payload_size(value):
+    """Rough byte size of call arguments / results: strings, bytes and nested rows."""
+    if value is None:
+        return 0
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, Message):
+        return len(value.as_bytes())
+    if isinstance(value, dict):
+        return sum(payload_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        if value and isinstance(value[0], list):
+            # The common case – rows of (usually string) cells
+            cells = chain.from_iterable(value)
+            try:
+                return sum(map(len, cells))
+            except TypeError:
+                return sum(len(str(cell)) for row in value for cell in row)
+        return sum(payload_size(v) for v in value)
+    return len(str(value))
+
+
+def call(kind, op, fn, *args, sent=None, **kwargs):
+    """
+    ``fn(*args, **kwargs)``, recorded as one ``kind`` / ``op`` call of the
+    current run.  The payload is ``sent`` plus the result.
+    """
+    if not _enabled:
+        return fn(*args, **kwargs)
+    started = time.perf_counter()
+    result, error = None, True
+    try:
+        result = fn(*args, **kwargs)
+        error = False
+        return result
+    finally:
+        seconds = time.perf_counter() - started
+        size = payload_size(sent) + (0 if error else payload_size(result))
+        tracer.record(_current.get(), kind, op, seconds, size, error)
+
+
+def section(name, seconds):
+    """Records a page section that took ``seconds`` (fed by ``timing.RunTimer.mark``)."""
+    if _enabled:
+        tracer.record(_current.get(), "section", name, seconds)